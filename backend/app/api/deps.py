@@ -0,0 +1,84 @@
+"""
+Request dependencies for the signed-in user.
+
+current_user reads the bearer token, if any. While AUTH_REQUIRED is off,
+requests without a token still work with the identity in their query
+parameters; a token that is sent must be valid. With a token, those query
+parameters may be left out, and must name the token's user if given.
+"""
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.core.config import settings
+from app.core.security import InvalidTokenError, TokenClaims, verify_access_token
+from app.models.domain import ChatRoom, Order
+from app.models.enums import UserRole
+from app.repositories.order_repository import OrderRepository
+from typing import Optional
+import hmac
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> Optional[TokenClaims]:
+    """Claims of the request's bearer token; None without one (unless AUTH_REQUIRED)"""
+    if credentials is None:
+        if settings.AUTH_REQUIRED:
+            raise _unauthorized("Not authenticated")
+        return None
+    try:
+        return verify_access_token(credentials.credentials)
+    except InvalidTokenError:
+        raise _unauthorized("Invalid or expired token")
+
+
+def resolve_email(user: Optional[TokenClaims], email: Optional[str], param: str = "user_email") -> str:
+    """The caller's email: from the token, else from the query parameter"""
+    if user is None:
+        if not email:
+            raise HTTPException(status_code=400, detail=f"{param} parameter is required")
+        return email
+    if email and email.lower() != user.email.lower():
+        raise HTTPException(status_code=403, detail=f"{param} does not match the signed-in user")
+    return user.email
+
+
+def resolve_role(user: Optional[TokenClaims], role: Optional[str], param: str = "user_role") -> UserRole:
+    """The caller's role: from the token, else from the query parameter"""
+    if role:
+        try:
+            requested = UserRole[role.upper()]
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Invalid {param}: {role}")
+    else:
+        requested = None
+    if user is None:
+        if requested is None:
+            raise HTTPException(status_code=400, detail=f"{param} parameter is required")
+        return requested
+    if requested is not None and requested != user.role:
+        raise HTTPException(status_code=403, detail=f"{param} does not match the signed-in user")
+    return user.role
+
+
+def check_admin_secret(secret: Optional[str]):
+    """Admin access is only possible when PROFILING_SECRET is configured"""
+    if not settings.PROFILING_SECRET:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secret or not hmac.compare_digest(secret, settings.PROFILING_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid admin secret")
+
+
+def require_order_participant(order: Order, email: str, role: UserRole):
+    """403 unless email is the order's participant in role"""
+    if OrderRepository.participants(order).get(role) != email:
+        raise HTTPException(status_code=403, detail="You are not a participant of this order")
+
+
+def require_chat_participant(chat_room: ChatRoom, email: str):
+    """403 unless email is a participant of the chat room"""
+    if not any(p.email == email for p in chat_room.participants):
+        raise HTTPException(status_code=403, detail="User is not a participant in this chat room")
@@ -0,0 +1,20 @@
+"""
+Response classes shared by the API routes.
+"""
+from fastapi.responses import StreamingResponse
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is still being read
+
+    StreamingResponse normally runs a task that reads from `receive` to notice
+    client disconnects. That task competes with request.stream() for the
+    request body messages, so an iterator that consumes the upload would lose
+    chunks. Here only the body iterator reads from `receive`; a disconnect
+    surfaces as ClientDisconnect from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
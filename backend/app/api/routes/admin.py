@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.api.deps import check_admin_secret
+from app.api.routing import InstrumentedRoute
+from app.core.profiling import profiler
+from app.core.singleflight import reads
+from app.services.archive_service import ArchiveService
+from typing import Optional
+
+router = APIRouter(prefix="/admin", tags=["admin"], route_class=InstrumentedRoute)
+
+
+@router.get("/profiles")
+def get_profiles(x_admin_secret: Optional[str] = Header(None)):
+    """Requests and samples captured per route"""
+    check_admin_secret(x_admin_secret)
+    return profiler.summary()
+
+
+@router.get("/profiles/collapsed", response_class=PlainTextResponse)
+def get_collapsed_profile(route: Optional[str] = None, x_admin_secret: Optional[str] = Header(None)):
+    """Collapsed stacks (flamegraph.pl / speedscope input) for one route or all routes"""
+    check_admin_secret(x_admin_secret)
+    return PlainTextResponse(profiler.collapsed(route))
+
+
+@router.delete("/profiles", status_code=204)
+def reset_profiles(x_admin_secret: Optional[str] = Header(None)):
+    """Discard all captured profiles"""
+    check_admin_secret(x_admin_secret)
+    profiler.reset()
+    return None
+
+
+@router.get("/singleflight")
+def get_singleflight_stats(limit: int = 50, x_admin_secret: Optional[str] = Header(None)):
+    """Keys whose reads were most often served by another request's DynamoDB call"""
+    check_admin_secret(x_admin_secret)
+    return reads.stats(limit)
+
+
+@router.delete("/singleflight", status_code=204)
+def reset_singleflight_stats(x_admin_secret: Optional[str] = Header(None)):
+    """Discard per-key single-flight statistics"""
+    check_admin_secret(x_admin_secret)
+    reads.reset()
+    return None
+
+
+@router.post("/archive", status_code=202)
+def start_archive(
+    older_than_days: Optional[int] = None,
+    limit: Optional[int] = None,
+    x_admin_secret: Optional[str] = Header(None)
+):
+    """Start archiving completed orders not updated for older_than_days (default ARCHIVE_AFTER_DAYS)"""
+    check_admin_secret(x_admin_secret)
+    if older_than_days is not None and older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must not be negative")
+    if not ArchiveService.start_background_run(older_than_days=older_than_days, limit=limit):
+        raise HTTPException(status_code=409, detail="An archive run is already in progress")
+    return ArchiveService.background_run_status()
+
+
+@router.get("/archive")
+def get_archive_status(x_admin_secret: Optional[str] = Header(None)):
+    """State and counts of the last archive run started through the API"""
+    check_admin_secret(x_admin_secret)
+    return ArchiveService.background_run_status()
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, HTTPException
+from app.api.routing import InstrumentedRoute
 from app.schemas.user import LoginRequest, LoginResponse, UserResponse, UserCreate
+from app.core.security import create_access_token
 from app.services.user_service import UserService
 from app.repositories.user_repository import UserRepository
 from typing import List
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], route_class=InstrumentedRoute)
 
 
 @router.post("/login", response_model=LoginResponse)
 def login(request: LoginRequest):
-    """Login with email only (role is optional for backward compatibility)"""
+    """Login with email only (role is optional for backward compatibility); returns a signed access token"""
     try:
         from app.models.enums import UserRole
         
@@ -23,9 +25,11 @@ def login(request: LoginRequest):
             # Login by email only
             user = UserService.login_by_email(request.email)
         
+        access_token, expires_in = create_access_token(user)
         return LoginResponse(
             user=UserResponse.model_validate(user),
-            access_token=None
+            access_token=access_token,
+            expires_in=expires_in
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
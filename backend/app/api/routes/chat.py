@@ -1,26 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.chat import ChatRoomResponse, ChatMessageCreate, ChatMessageResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from app.api.routing import InstrumentedRoute
+from app.api.deps import current_user, require_chat_participant, resolve_email, resolve_role
+from app.core.security import TokenClaims
+from app.core import idempotency, stale_cache
+from app.core.config import settings
+from app.schemas.chat import (
+    ChatRoomResponse, ChatRoomSummaryResponse, ChatMessageCreate, ChatMessageResponse, ChatSearchResponse
+)
+from app.services.archive_service import ArchiveService
 from app.services.chat_service import ChatService
+from app.services.chat_search_service import ChatSearchService
 from app.repositories.chat_repository import ChatRepository
 from app.repositories.order_repository import OrderRepository
-from app.models.enums import UserRole
-from typing import List
+from app.utils.transactions import VersionConflictError
+from typing import List, Optional
 
-router = APIRouter(prefix="/api/chat", tags=["chat"])
+router = APIRouter(prefix="/api/chat", tags=["chat"], route_class=InstrumentedRoute)
 
 
 @router.get("/rooms/{order_id}", response_model=ChatRoomResponse)
-def get_chat_room(order_id: str):
-    """Get chat room for an order"""
-    try:
+def get_chat_room(
+    order_id: str,
+    response: Response,
+    user_email: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Get chat room for an order (the last one read, marked X-Stale, while storage is unavailable)
+
+    Only the room's participants may read it.
+    """
+    user_email = resolve_email(user, user_email)
+    def load():
         # Verify order exists
         order = OrderRepository.find_by_id(order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
-        
-        chat_room = ChatRepository.find_by_order_id(order_id)
+        if order.archived_at:
+            return ArchiveService.load_archived(order).chat_room
+        return ChatRepository.find_by_order_id(order_id)
+    
+    try:
+        chat_room = stale_cache.serve(('chat_room', order_id), load, response)
         if not chat_room:
             raise HTTPException(status_code=404, detail="Chat room not found for this order")
+        require_chat_participant(chat_room, user_email)
         
         return ChatRoomResponse.model_validate(chat_room)
     except HTTPException:
@@ -31,11 +54,13 @@ def get_chat_room(order_id: str):
 
 @router.get("/rooms", response_model=List[ChatRoomResponse])
 def get_user_chat_rooms(
-    user_email: str,
+    user_email: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    user: Optional[TokenClaims] = Depends(current_user)
 ):
     """Get all chat rooms for a user"""
+    user_email = resolve_email(user, user_email)
     try:
         chat_rooms = ChatService.get_user_chat_rooms(user_email)
         return [ChatRoomResponse.model_validate(room) for room in chat_rooms[skip:skip+limit]]
@@ -43,16 +68,94 @@ def get_user_chat_rooms(
         raise HTTPException(status_code=500, detail=f"Error fetching chat rooms: {str(e)}")
 
 
+@router.get("/summaries", response_model=List[ChatRoomSummaryResponse])
+def get_user_chat_room_summaries(
+    response: Response,
+    user_email: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Chat rooms of a user with message and unread counts, without message bodies"""
+    user_email = resolve_email(user, user_email)
+    
+    def load():
+        return [
+            ChatService.summary(room, user_email)
+            for room in ChatService.get_user_chat_room_summaries(user_email)
+        ]
+    
+    try:
+        return stale_cache.serve(('chat_summaries', user_email), load, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching chat room summaries: {str(e)}")
+
+
+@router.get("/search", response_model=ChatSearchResponse)
+def search_messages(
+    q: str,
+    user_email: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Messages matching q in the user's chat rooms, best match first"""
+    user_email = resolve_email(user, user_email)
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    limit = settings.CHAT_SEARCH_PAGE_SIZE if limit is None else limit
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    try:
+        return ChatSearchService.search(q, user_email, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching messages: {str(e)}")
+
+
+@router.post("/rooms/{order_id}/read", response_model=ChatRoomSummaryResponse)
+def mark_chat_room_read(
+    order_id: str,
+    user_email: Optional[str] = None,
+    count: Optional[int] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Mark the first count messages (default: all) of a chat room read for a participant"""
+    user_email = resolve_email(user, user_email)
+    try:
+        chat_room = ChatService.mark_read(order_id, user_email, count)
+        return ChatService.summary(chat_room, user_email)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error marking chat room read: {str(e)}")
+
+
 @router.post("/rooms/{order_id}/messages", response_model=ChatMessageResponse, status_code=201)
 def create_message(
     order_id: str,
     message: ChatMessageCreate,
-    sender_email: str,
-    sender_role: str,
-    sender_name: str
+    response: Response,
+    sender_email: Optional[str] = None,
+    sender_role: Optional[str] = None,
+    sender_name: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+    user: Optional[TokenClaims] = Depends(current_user)
 ):
-    """Create a new message in a chat room"""
-    try:
+    """Create a new message in a chat room (the sender comes from the token, or the sender parameters)
+
+    Retries with the same Idempotency-Key get the first response instead of
+    posting the message again.
+    """
+    sender_email = resolve_email(user, sender_email, "sender_email")
+    role = resolve_role(user, sender_role, "sender_role")
+    if user is not None:
+        sender_name = user.name
+    elif not sender_name:
+        raise HTTPException(status_code=400, detail="sender_name parameter is required")
+    
+    def create():
         # Verify order exists
         order = OrderRepository.find_by_id(order_id)
         if not order:
@@ -61,27 +164,44 @@ def create_message(
         new_message = ChatService.add_message(
             order_id=order_id,
             sender_email=sender_email,
-            sender_role=UserRole[sender_role.upper()],
+            sender_role=role,
             sender_name=sender_name,
             text=message.text
         )
         
-        return ChatMessageResponse.model_validate(new_message)
+        return ChatMessageResponse.model_validate(new_message).model_dump(mode='json')
+    
+    try:
+        request = {'message': message.model_dump(mode='json'), 'sender_role': role.value, 'sender_name': sender_name}
+        return idempotency.run(
+            f"messages#{order_id}#{sender_email}", idempotency_key, request, create, response
+        )
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating message: {str(e)}")
 
 
 @router.get("/rooms/{order_id}/messages", response_model=List[ChatMessageResponse])
-def get_messages(order_id: str):
-    """Get all messages for a chat room"""
+def get_messages(
+    order_id: str,
+    response: Response,
+    user_email: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Get all messages for a chat room (served stale like the chat room itself); participants only"""
+    user_email = resolve_email(user, user_email)
     try:
-        chat_room = ChatRepository.find_by_order_id(order_id)
+        chat_room = stale_cache.serve(('chat_room', order_id), lambda: ArchiveService.find_chat_room(order_id), response)
         if not chat_room:
             raise HTTPException(status_code=404, detail="Chat room not found")
+        require_chat_participant(chat_room, user_email)
         
         return [ChatMessageResponse.model_validate(msg) for msg in chat_room.messages]
     except HTTPException:
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.api.routing import InstrumentedRoute
+from app.core.metrics import render_prometheus
+
+router = APIRouter(tags=["metrics"], route_class=InstrumentedRoute)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Expose request and DynamoDB metrics in the Prometheus text format"""
+    return PlainTextResponse(
+        render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.api.routing import InstrumentedRoute
+from app.api.deps import current_user, resolve_email, resolve_role
+from app.core.config import settings
+from app.core.security import TokenClaims
+from app.schemas.notification import NotificationPageResponse, UnreadCountResponse
+from app.services.notification_service import NotificationService
+from typing import Optional
+
+router = APIRouter(prefix="/api/notifications", tags=["notifications"], route_class=InstrumentedRoute)
+
+
+@router.get("", response_model=NotificationPageResponse)
+def get_notifications(
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Newest notifications of a user with the unread count; pass next_cursor as before for older ones"""
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
+    limit = settings.NOTIFICATIONS_PAGE_SIZE if limit is None else limit
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    try:
+        return NotificationService.get_inbox(user_email, role, limit, before)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching notifications: {str(e)}")
+
+
+@router.post("/read", response_model=UnreadCountResponse)
+def mark_notifications_read(
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Mark all notifications of a user as read"""
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
+    try:
+        return {'unread': NotificationService.mark_all_read(user_email, role)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error marking notifications read: {str(e)}")
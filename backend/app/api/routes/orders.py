@@ -1,21 +1,51 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from app.api.responses import RequestStreamingResponse
+from app.core import idempotency, stale_cache
+from app.core.config import settings
+from app.api.routing import InstrumentedRoute
+from app.api.deps import check_admin_secret, current_user, require_order_participant, resolve_email, resolve_role
+from app.core.security import TokenClaims
+from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, OrderCountsResponse, OrderSearchResponse
+from app.services.archive_service import ArchiveService
 from app.services.order_service import OrderService
-from app.repositories.order_repository import OrderRepository
-from app.utils.dynamodb import format_datetime
-from datetime import datetime
+from app.services.order_search_service import OrderSearchService
+from app.services.order_import_service import OrderImportService, ImportFormatError, detect_format
+from starlette.concurrency import run_in_threadpool
+from app.repositories.order_repository import OrderRepository, VersionConflictError
+from app.models.domain import Order
+from app.models.enums import OrderStatus, UserRole
+from app.utils.dynamodb import decimal_default, decompress_attributes, parse_datetime
 from typing import List, Optional
+import json
+import logging
 
-router = APIRouter(prefix="/api/orders", tags=["orders"])
+logger = logging.getLogger(__name__)
+
+# What renters and landlords may change on their orders (stage approvals)
+PARTICIPANT_UPDATE_FIELDS = {'status', 'progress_stages'}
+
+router = APIRouter(prefix="/api/orders", tags=["orders"], route_class=InstrumentedRoute)
 
 
 @router.post("", response_model=OrderResponse, status_code=201)
-def create_order(order: OrderCreate, created_by: str = None):
-    """Create a new order"""
-    if not created_by:
-        raise HTTPException(status_code=400, detail="created_by parameter is required")
+def create_order(
+    order: OrderCreate,
+    response: Response,
+    created_by: str = None,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Create a new order (the creator comes from the token, or the created_by parameter)
+
+    Retries with the same Idempotency-Key get the first response instead of
+    creating another order.
+    """
+    created_by = resolve_email(user, created_by, "created_by")
+    if user is not None and user.role != UserRole.AGENT:
+        raise HTTPException(status_code=403, detail="Only agents can create orders")
     
-    try:
+    def create():
         new_order = OrderService.create_order(
             title=order.title,
             renter_email=order.renter_email,
@@ -23,59 +53,248 @@ def create_order(order: OrderCreate, created_by: str = None):
             property_address=order.property_address,
             deposit_amount=order.deposit_amount,
             description=order.description,
-            created_by=created_by
+            created_by=created_by,
+            creator_name=user.name if user is not None else None
         )
-        return new_order
+        return OrderResponse.model_validate(new_order).model_dump(mode='json')
+    
+    try:
+        return idempotency.run(
+            f"orders#{created_by}", idempotency_key, order.model_dump(mode='json'), create, response
+        )
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating order: {str(e)}")
 
 
+@router.post("/bulk")
+async def bulk_import_orders(
+    request: Request,
+    created_by: str = None,
+    format: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Import many orders from a streamed CSV or NDJSON upload
+
+    Rows use the OrderCreate fields (CSV needs a header line). The response is
+    NDJSON with one result line per row as it is written, then a summary line.
+    """
+    created_by = resolve_email(user, created_by, "created_by")
+    if user is not None and user.role != UserRole.AGENT:
+        raise HTTPException(status_code=403, detail="Only agents can create orders")
+    
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    if user is None:
+        try:
+            await run_in_threadpool(OrderImportService.verify_creator, created_by)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error importing orders: {str(e)}")
+    
+    importer = OrderImportService(created_by, creator_name=user.name if user is not None else None)
+    return RequestStreamingResponse(
+        importer.run(request.stream(), fmt),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("", response_model=List[OrderResponse])
 def get_orders(
+    response: Response,
     user_email: Optional[str] = None,
     user_role: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    include_messages: bool = True,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    user: Optional[TokenClaims] = Depends(current_user),
+    x_admin_secret: Optional[str] = Header(None)
 ):
-    """Get orders filtered by user email and role"""
-    try:
-        if user_email and user_role:
-            from app.models.enums import UserRole
-            orders = OrderService.get_orders_for_user(
-                user_email,
-                UserRole[user_role.upper()]
-            )
+    """Get orders filtered by user email and role (and optionally status)
+
+    With a token the orders are those of the signed-in user. All orders,
+    unfiltered, need the admin secret. With
+    include_messages=false the chat rooms come without their message
+    history; unread_messages still tells the user what is new. While
+    storage is unavailable the last list returned is served with X-Stale.
+    """
+    role = None
+    if user is not None or (user_email and user_role):
+        user_email = resolve_email(user, user_email)
+        role = resolve_role(user, user_role)
+    elif status is not None:
+        raise HTTPException(status_code=400, detail="status filter requires user_email and user_role")
+    else:
+        check_admin_secret(x_admin_secret)
+    
+    def load():
+        if role is not None:
+            # Only the newest skip + limit orders are read
+            wanted = skip + limit if skip >= 0 and limit >= 0 else None
+            orders = OrderService.get_orders_for_user(user_email, role, status, limit=wanted)
         else:
             orders = OrderRepository.find_all()
         
-        # Load chat rooms for all orders
+        # Apply skip and limit
+        orders = orders[skip:skip+limit]
+        
+        # Load chat rooms for the returned orders; archived ones have theirs in the cold store
         from app.repositories.chat_repository import ChatRepository
-        for order in orders:
-            chat_room = ChatRepository.find_by_order_id(order.id)
-            if chat_room:
-                order.chat_room = chat_room
+        active = [order for order in orders if not order.archived_at]
+        if include_messages:
+            for order in active:
+                chat_room = ChatRepository.find_by_order_id(order.id)
+                if chat_room:
+                    order.chat_room = chat_room
+        else:
+            summaries = ChatRepository.find_summaries(order.id for order in active)
+            for order in active:
+                if order.id in summaries:
+                    order.chat_room = summaries[order.id]
         
-        # Apply skip and limit
-        return orders[skip:skip+limit]
+        responses = []
+        for order in orders:
+            order_response = OrderResponse.model_validate(order)
+            if user_email and order.chat_room:
+                order_response.unread_messages = order.chat_room.unread_for(user_email)
+            responses.append(order_response)
+        return responses
+    
+    try:
+        key = ('orders', user_email, role, status, include_messages, skip, limit)
+        return stale_cache.serve(key, load, response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
 
+@router.get("/counts", response_model=OrderCountsResponse)
+def get_order_counts(
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Order counts per status and held deposits for a user (badge counts)"""
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
+    try:
+        return OrderService.get_order_counts(user_email, role)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching order counts: {str(e)}")
+
+
+@router.get("/search", response_model=OrderSearchResponse)
+def search_orders(
+    q: str,
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """The user's orders matching q in title, property address or participant emails, newest first"""
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    limit = settings.ORDER_SEARCH_PAGE_SIZE if limit is None else limit
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    try:
+        return OrderSearchService.search(q, user_email, role, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching orders: {str(e)}")
+
+
+@router.get("/export")
+def export_orders(
+    status: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    segments: Optional[int] = None,
+    x_admin_secret: Optional[str] = Header(None)
+):
+    """Export orders as NDJSON, one order per line, from a parallel scan (admin secret required)
+
+    status and the created_at range (ISO timestamps, inclusive) are applied
+    by DynamoDB as a FilterExpression. Lines come in no particular order.
+    """
+    check_admin_secret(x_admin_secret)
+    
+    if status is not None:
+        try:
+            status = OrderStatus(status.lower()).value
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    for name, value in (("created_from", created_from), ("created_to", created_to)):
+        if value is not None:
+            try:
+                parse_datetime(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    if segments is None:
+        segments = settings.EXPORT_SCAN_SEGMENTS
+    if not 1 <= segments <= 64:
+        raise HTTPException(status_code=400, detail="segments must be between 1 and 64")
+    
+    items = OrderRepository.scan_for_export(
+        status=status,
+        created_from=created_from,
+        created_to=created_to,
+        segments=segments,
+        page_size=settings.EXPORT_SCAN_PAGE_SIZE,
+        max_queued_pages=settings.EXPORT_MAX_QUEUED_PAGES
+    )
+    
+    def lines():
+        try:
+            for item in items:
+                item = decompress_attributes(item, Order.compressed_attributes)
+                yield json.dumps(item, default=decimal_default) + "\n"
+        except Exception as e:
+            # The status line is already sent; report the failure in-band
+            logger.error(f"Order export failed: {str(e)}")
+            yield json.dumps({"error": f"Error exporting orders: {str(e)}"}) + "\n"
+        finally:
+            items.close()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: str):
-    """Get a single order by ID"""
+def get_order(
+    order_id: str,
+    response: Response,
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Get a single order by ID (the last one read, marked X-Stale, while storage is unavailable)
+
+    Only the order's participants may read it (the caller comes from the
+    token, or user_email and user_role), since it carries the chat history.
+    """
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
     try:
-        order = OrderRepository.find_by_id(order_id)
+        # With its chat room; archived orders are read from the cold store
+        order = stale_cache.serve(('order', order_id), lambda: ArchiveService.find_order(order_id), response)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
-        
-        # Load chat room if it exists
-        from app.repositories.chat_repository import ChatRepository
-        chat_room = ChatRepository.find_by_order_id(order_id)
-        if chat_room:
-            order.chat_room = chat_room
+        require_order_participant(order, user_email, role)
         
         return order
     except HTTPException:
@@ -85,48 +304,47 @@ def get_order(order_id: str):
 
 
 @router.put("/{order_id}", response_model=OrderResponse)
-def update_order(order_id: str, order_update: OrderUpdate):
-    """Update an order"""
+def update_order(
+    order_id: str,
+    order_update: OrderUpdate,
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    user: Optional[TokenClaims] = Depends(current_user)
+):
+    """Update an order (the caller comes from the token, or user_email and user_role)
+
+    Only the order's participants may update it. Renters and landlords may
+    only change the status and progress stages (their approvals); the other
+    fields are up to the agent who created the order.
+    """
+    user_email = resolve_email(user, user_email)
+    role = resolve_role(user, user_role)
+    data = order_update.model_dump(exclude_unset=True)
     try:
-        order = OrderRepository.find_by_id(order_id)
-        if not order:
+        existing = OrderRepository.find_by_id(order_id)
+        if not existing:
             raise HTTPException(status_code=404, detail="Order not found")
+        require_order_participant(existing, user_email, role)
+        if role != UserRole.AGENT and set(data) - PARTICIPANT_UPDATE_FIELDS:
+            raise HTTPException(status_code=403, detail="Only the order's agent can change its details")
         
-        # Update fields
-        update_data = order_update.model_dump(exclude_unset=True)
-        
-        # Handle progress_stages separately - convert response models to domain models
-        if 'progress_stages' in update_data:
-            from app.models.domain import ProgressStage
-            progress_stages = [
-                ProgressStage(
-                    stage=ps['stage'],
-                    title=ps['title'],
-                    completed=ps['completed'],
-                    date=ps.get('date'),
-                    completed_by=ps.get('completed_by')
-                )
-                for ps in update_data['progress_stages']
-            ]
-            order.progress_stages = progress_stages
-            del update_data['progress_stages']
-        
-        # Update other fields
-        for field, value in update_data.items():
-            setattr(order, field, value)
-        
-        order.updated_at = format_datetime(datetime.utcnow())
-        OrderRepository.update(order)
+        order = OrderService.update_order(order_id, data)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
         
         return order
     except HTTPException:
         raise
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating order: {str(e)}")
 
 
 @router.delete("/{order_id}", status_code=204)
-def delete_order(order_id: str, created_by: str = None):
+def delete_order(order_id: str, created_by: str = None, user: Optional[TokenClaims] = Depends(current_user)):
     """Delete an order - only agents who created it can delete"""
     try:
         order = OrderRepository.find_by_id(order_id)
@@ -134,35 +352,29 @@ def delete_order(order_id: str, created_by: str = None):
             raise HTTPException(status_code=404, detail="Order not found")
         
         # Check authorization: only agents who created the order can delete it
-        if not created_by:
-            raise HTTPException(status_code=400, detail="created_by parameter is required")
+        created_by = resolve_email(user, created_by, "created_by")
         
-        from app.models.enums import UserRole
-        from app.repositories.user_repository import UserRepository
-        
-        # Verify user is an agent
-        users = UserRepository.find_by_email(created_by)
-        user = next((u for u in users if u.role == UserRole.AGENT), None)
-        if not user:
+        # Verify user is an agent (the token says so; without one look it up)
+        if user is not None:
+            is_agent = user.role == UserRole.AGENT
+        else:
+            from app.repositories.user_repository import UserRepository
+            is_agent = any(u.role == UserRole.AGENT for u in UserRepository.find_by_email(created_by))
+        if not is_agent:
             raise HTTPException(status_code=403, detail="Only agents can delete orders")
         
         # Verify the agent created this order
         if order.created_by != created_by:
             raise HTTPException(status_code=403, detail="You can only delete orders you created")
         
-        # Delete order
-        OrderRepository.delete(order_id)
-        
-        # Delete associated chat room
-        from app.repositories.chat_repository import ChatRepository
-        try:
-            ChatRepository.delete(order_id)
-        except:
-            pass  # Chat room might not exist
+        # Delete order and its chat room
+        OrderService.delete_order(order)
         
         return None
     except HTTPException:
         raise
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting order: {str(e)}")
 
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+from app.api.routing import InstrumentedRoute
+from app.schemas.report import DepositReportResponse
+from app.services.report_service import ReportService, GROUP_BY
+from app.models.enums import OrderStatus
+from app.utils.dynamodb import parse_datetime
+from typing import Optional
+
+router = APIRouter(prefix="/api/reports", tags=["reports"], route_class=InstrumentedRoute)
+
+
+@router.get("/deposits", response_model=DepositReportResponse)
+def get_deposit_report(
+    group_by: str = "status",
+    status: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    percentiles: str = "50,90,99",
+    limit: int = 100
+):
+    """Deposit totals and percentiles grouped by status, landlord, agent or month, plus the stage funnel"""
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_BY)}")
+    if status is not None:
+        try:
+            status = OrderStatus(status.lower()).value
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    for name, value in (("created_from", created_from), ("created_to", created_to)):
+        if value is not None:
+            try:
+                parse_datetime(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    try:
+        quantiles = tuple(float(p) for p in percentiles.split(",") if p.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    if any(not 0 <= p <= 100 for p in quantiles):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    
+    try:
+        return ReportService.deposit_report(group_by, status, created_from, created_to, quantiles, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building deposit report: {str(e)}")
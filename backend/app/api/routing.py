@@ -0,0 +1,138 @@
+"""
+Shared APIRoute subclass used by all routers.
+
+Endpoints are wrapped so per-request instrumentation that must run on the
+handler's own thread (sync handlers execute in the threadpool, not on the
+event loop) has a hook there. The wrapper also ends the request's deadline
+when the handler returns, answers a passed deadline with 504 and unavailable
+storage with 503.
+
+FastAPI validates the handler's result against the response model and
+serializes it after the endpoint returned: validation on another threadpool
+thread for sync handlers, serialization on the event loop thread. The
+response field's methods are wrapped too, so profiled requests show that
+cost (e.g. for GET /api/orders) as "[response validation]" and
+"[serialization]" stacks.
+"""
+from fastapi import HTTPException, routing
+from fastapi.routing import APIRoute
+from app.core.circuit_breaker import StorageUnavailable, storage_breaker
+from app.core.deadlines import DeadlineExceeded
+from app.core.profiling import profiler
+from app.core.request_context import get_request_context
+from contextlib import contextmanager
+import functools
+import inspect
+
+
+def _unavailable(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Storage is temporarily unavailable, please retry",
+        headers={"Retry-After": str(int(retry_after + 0.999))}
+    )
+
+
+@contextmanager
+def _storage_errors(context):
+    """Report a passed deadline as 504 and unavailable storage as 503; streaming bodies run without a deadline"""
+    try:
+        yield
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except StorageUnavailable as e:
+        raise _unavailable(e.retry_after)
+    except HTTPException as e:
+        # Handlers turn unexpected errors into 500s; tell the client when those were storage trouble
+        if e.status_code == 500 and context is not None:
+            if context.storage_unavailable:
+                raise _unavailable(storage_breaker.retry_after()) from e
+            if context.deadline_exceeded:
+                raise HTTPException(status_code=504, detail="Request deadline exceeded") from e
+        raise
+    finally:
+        if context is not None:
+            context.deadline = None
+
+
+def _instrument_endpoint(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            context = get_request_context()
+            with _storage_errors(context):
+                if context is None or not context.profiled:
+                    return await endpoint(*args, **kwargs)
+                with profiler.profile_thread(context.route):
+                    return await endpoint(*args, **kwargs)
+
+        profiler.add_root(async_wrapper.__code__)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        context = get_request_context()
+        with _storage_errors(context):
+            if context is None or not context.profiled:
+                return endpoint(*args, **kwargs)
+            with profiler.profile_thread(context.route):
+                return endpoint(*args, **kwargs)
+
+    profiler.add_root(wrapper.__code__)
+    return wrapper
+
+
+# Response field methods FastAPI calls after the endpoint -> profiling phase
+RESPONSE_PHASES = {
+    'validate': 'response validation',
+    'serialize': 'serialization',
+    'serialize_json': 'serialization',
+}
+
+
+def _instrument_step(step, phase: str):
+    @functools.wraps(step)
+    def wrapper(*args, **kwargs):
+        context = get_request_context()
+        if context is None or not context.profiled:
+            return step(*args, **kwargs)
+        with profiler.profile_thread(context.route, phase):
+            return step(*args, **kwargs)
+
+    profiler.add_root(wrapper.__code__)
+    return wrapper
+
+
+def _instrument_response_field(field):
+    if getattr(field, '_instrumented', False):
+        return
+    for name, phase in RESPONSE_PHASES.items():
+        step = getattr(field, name, None)
+        if step is not None:
+            setattr(field, name, _instrument_step(step, phase))
+    field._instrumented = True
+
+
+def _handler_state(route: APIRoute):
+    """The route state get_route_handler() builds from
+
+    Newer FastAPI versions build included routes' handlers from a per-inclusion
+    copy with its own response field, set in a context variable meanwhile;
+    older ones copy the route itself.
+    """
+    context_var = getattr(routing, '_effective_route_context_var', None)
+    context = context_var.get() if context_var is not None else None
+    if context is not None and getattr(context, 'original_route', None) is route:
+        return context
+    return route
+
+
+class InstrumentedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _instrument_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        field = _handler_state(self).response_field
+        if field is not None:
+            _instrument_response_field(field)
+        return super().get_route_handler()
@@ -0,0 +1,143 @@
+"""
+Circuit breaker around DynamoDB.
+
+The DynamoDB client hooks report the outcome of every call. Throttling,
+5xx responses, timeouts and connection errors count as storage failures;
+any other answer, including a failed condition check, shows that storage is
+up. After BREAKER_FAILURE_THRESHOLD failures in a row the breaker opens and
+calls fail right away with StorageUnavailable instead of queueing up on a
+struggling table. After BREAKER_OPEN_SECONDS one call is let through as a
+probe: if it succeeds the breaker closes, otherwise it stays open for
+another period.
+
+Routes answer StorageUnavailable (and storage failures) with 503 and a
+Retry-After header; reads with a last-known-good copy serve that instead
+(app.core.stale_cache).
+"""
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, HTTPClientError
+from typing import Optional
+import threading
+import time
+
+# Error codes of throttled requests
+THROTTLING_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'LimitExceededException',
+}
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class StorageUnavailable(Exception):
+    """Storage is failing; the call was not attempted"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_storage_failure(error: Optional[BaseException]) -> bool:
+    """Whether an exception means storage is unavailable or overloaded (not that the request was wrong)"""
+    if error is None:
+        return False
+    if isinstance(error, (StorageUnavailable, BotocoreConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        return is_failed_response(error.response)
+    return False
+
+
+def is_failed_response(response: Optional[dict]) -> bool:
+    response = response or {}
+    status = (response.get('ResponseMetadata') or {}).get('HTTPStatusCode') or 0
+    return status >= 500 or (response.get('Error') or {}).get('Code') in THROTTLING_CODES
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to storage now"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= settings.BREAKER_OPEN_SECONDS:
+                self.state = HALF_OPEN
+                self.probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced after a period
+                if self.probe_started is None or now - self.probe_started >= settings.BREAKER_OPEN_SECONDS:
+                    self.probe_started = now
+                    return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            # Calls started before the breaker opened do not close it; only the probe does
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= settings.BREAKER_FAILURE_THRESHOLD):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+                BREAKER_OPENED.inc(breaker=self.name)
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may run"""
+        if self.state != OPEN:
+            return 1.0
+        return max(1.0, settings.BREAKER_OPEN_SECONDS - (time.monotonic() - self.opened_at))
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probe_started = None
+
+
+storage_breaker = CircuitBreaker("dynamodb")
+
+BREAKER_STATE = Gauge(
+    "kaution_circuit_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half open, 2 open",
+    ("breaker",),
+    callback=lambda: {(storage_breaker.name,): _STATE_VALUES[storage_breaker.state]}
+)
+BREAKER_OPENED = Counter(
+    "kaution_circuit_breaker_opened_total",
+    "Times the circuit breaker opened",
+    ("breaker",)
+)
+BREAKER_REJECTED = Counter(
+    "kaution_circuit_breaker_rejected_total",
+    "Calls failed fast while the circuit breaker was open, by operation and table",
+    ("breaker", "operation", "table")
+)
+
+
+def guard(operation: str, table: str):
+    """Raise StorageUnavailable if the breaker does not let a call through"""
+    if not settings.BREAKER_ENABLED or storage_breaker.allow():
+        return
+    BREAKER_REJECTED.inc(breaker=storage_breaker.name, operation=operation, table=table)
+    raise StorageUnavailable("Storage is temporarily unavailable", storage_breaker.retry_after())
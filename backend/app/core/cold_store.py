@@ -0,0 +1,128 @@
+"""
+Cold store for archived data.
+
+A small blob interface (put/get/delete bytes by key) over a local directory
+or an S3 bucket, chosen by COLD_STORE_URL:
+
+    file://cold_store                 # relative to the working directory
+    s3://kaution-archive/production   # bucket and key prefix
+
+Keys are "/"-separated paths such as "orders/42/1042.kz". Blobs are written
+whole and never modified in place: the file store writes to a temporary file
+and renames it, S3 puts are atomic. What goes into a blob (and its format)
+is up to the caller; see app.repositories.archive_repository.
+"""
+from app.core.config import settings
+from typing import Optional
+import os
+import tempfile
+import threading
+
+
+class ColdStore:
+    """Blobs by key"""
+
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The blob, or None if there is none under key"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove a blob; no error if it does not exist"""
+        raise NotImplementedError
+
+
+class FileColdStore(ColdStore):
+    """One file per key below a root directory"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split('/')))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid cold store key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ColdStore(ColdStore):
+    """One object per key below a prefix of a bucket"""
+
+    def __init__(self, bucket: str, prefix: str = ''):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        kwargs = {'region_name': settings.AWS_REGION}
+        if settings.COLD_STORE_ENDPOINT_URL:
+            kwargs['endpoint_url'] = settings.COLD_STORE_ENDPOINT_URL
+        self.client = boto3.session.Session().client('s3', **kwargs)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+_store: Optional[ColdStore] = None
+_store_lock = threading.Lock()
+
+
+def open_cold_store(url: str) -> ColdStore:
+    if url.startswith('file://'):
+        return FileColdStore(url[len('file://'):])
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3ColdStore(bucket, prefix)
+    raise ValueError(f"Unsupported cold store URL: {url}")
+
+
+def get_cold_store() -> ColdStore:
+    """The cold store configured by COLD_STORE_URL (created once)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_cold_store(settings.COLD_STORE_URL)
+    return _store
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -19,7 +19,108 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_REQUIRED: bool = False  # Reject requests without a bearer token (otherwise identity query params still work)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # Verified tokens kept per process
     
+    # DynamoDB client: a slow call must not hold a request (and a worker) for long
+    DYNAMODB_CONNECT_TIMEOUT: float = 2.0  # Seconds
+    DYNAMODB_READ_TIMEOUT: float = 5.0  # Seconds per attempt
+    DYNAMODB_MAX_ATTEMPTS: int = 3  # Including the first attempt
+    DYNAMODB_RETRY_MODE: str = "adaptive"  # botocore retry mode: "adaptive" (backoff with jitter plus client-side rate limiting), "standard" or "legacy"
+    REQUEST_DEADLINE_SECONDS: float = 10.0  # Budget of a request's DynamoDB calls; 0 disables (504 once exceeded)
+
+    # Admission control (app/middleware/admission.py): rate limits and load shedding with 429
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: int = 32  # Requests in flight; keep below the threadpool size (40)
+    ADMISSION_READ_SHARE: float = 0.75  # Share of ADMISSION_MAX_CONCURRENT reads may take; the rest is kept for writes
+    ADMISSION_WRITE_WAIT_MS: int = 2000  # How long a write may queue for a slot
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_USER_RPS: float = 10.0  # Per client over all routes
+    RATE_LIMIT_USER_BURST: float = 40.0
+    RATE_LIMIT_ROUTE_RPS: float = 2.0  # Per client and route (method and path)
+    RATE_LIMIT_ROUTE_BURST: float = 10.0
+
+    # Storage circuit breaker: fail fast (503) after repeated throttling/timeouts/5xx
+    BREAKER_ENABLED: bool = True
+    BREAKER_FAILURE_THRESHOLD: int = 5  # Storage failures in a row that open the breaker
+    BREAKER_OPEN_SECONDS: float = 10.0  # Then one probe call is let through
+
+    # Last-known-good order lists, orders and chat rooms, served marked stale while storage is unavailable
+    STALE_CACHE_ENABLED: bool = True
+    STALE_CACHE_SIZE: int = 5000  # Entries per process
+    STALE_CACHE_MAX_AGE_SECONDS: int = 3600  # Older copies are not served
+
+    # Hedged GetItem/Query: resend a read still unanswered after the recent p95 latency
+    HEDGED_READS_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_MIN_DELAY_MS: float = 5.0  # Never hedge earlier than this
+    HEDGE_MIN_SAMPLES: int = 100  # Calls of an operation and table to see before hedging it
+    HEDGE_MAX_IN_FLIGHT: int = 32  # Worker threads for hedged reads; reads run unhedged when all are busy
+
+    # Identical concurrent reads (same table, key, projection) share one DynamoDB call
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Large order descriptions, embedded chat rooms and chat histories are stored zlib-compressed (app.utils.dynamodb)
+    STORAGE_COMPRESSION_ENABLED: bool = True  # Reading compressed attributes works either way
+    STORAGE_COMPRESSION_MIN_BYTES: int = 256  # Smaller attributes (as JSON) are stored as they are
+
+    # Archive: completed orders and their chat rooms move to the cold store, a stub stays in the orders table
+    ARCHIVE_AFTER_DAYS: int = 180  # Completed orders not updated for this long are archived
+    COLD_STORE_URL: str = "file://cold_store"  # file://<directory> or s3://<bucket>/<prefix>
+    COLD_STORE_ENDPOINT_URL: Optional[str] = None  # S3-compatible endpoint (e.g. MinIO); None uses AWS
+
+    # Write sharding of the participant indexes for users with very many orders (e.g. large agencies)
+    PARTICIPANT_INDEX_SHARDS: str = ""  # "<email>=<shards>,..."; unlisted users have one. Raise counts freely; before lowering one, run app.scripts.rekey_shards with the new count
+    PARTICIPANT_QUERY_WORKERS: int = 16  # Threads that query the shards of a participant in parallel
+
+    # Idempotency-Key support on order creation and message posting (app/core/idempotency.py)
+    IDEMPOTENCY_TTL_HOURS: int = 24  # Responses are replayed for retries with the same key this long (DynamoDB TTL)
+    IDEMPOTENCY_LEASE_SECONDS: float = 30.0  # A key whose original request never finished can be claimed again after this
+    IDEMPOTENCY_WAIT_SECONDS: float = 5.0  # How long a duplicate waits for the original's response before 409
+
+    # Observability
+    DYNAMODB_RETURN_CONSUMED_CAPACITY: bool = True  # Ask DynamoDB to report capacity per call
+    SLOW_REQUEST_THRESHOLD_MS: int = 1000  # Requests slower than this are logged with a call breakdown
+
+    # Request profiling (off unless a secret or a sample rate is set)
+    PROFILING_SECRET: Optional[str] = None  # "X-Profile: <secret>" profiles a request; also guards /admin/profiles
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of all requests to profile, e.g. 0.01
+    PROFILING_INTERVAL_MS: float = 5.0  # Stack sampling interval for profiled requests
+
+    # Bulk order import
+    BULK_IMPORT_WORKERS: int = 8  # Parallel BatchWriteItem workers per import
+    BULK_IMPORT_MAX_ROWS: int = 50000  # Rows accepted per upload
+
+    # Order export
+    EXPORT_SCAN_SEGMENTS: int = 4  # Parallel Scan segments (TotalSegments)
+    EXPORT_SCAN_PAGE_SIZE: int = 500  # Items per Scan page
+    EXPORT_MAX_QUEUED_PAGES: int = 8  # Pages buffered between the scan and the response
+
+    # Reports
+    REPORTS_REFRESH_SECONDS: int = 300  # Full reload of the report projection (catches other processes' writes)
+
+    # Change events (outbox)
+    OUTBOX_SHARDS: int = 4  # Outbox partitions per entity type; events of one entity stay in one, in order
+    OUTBOX_RETENTION_DAYS: int = 7  # Events expire (DynamoDB TTL) after this
+    OUTBOX_SETTLE_SECONDS: float = 5.0  # Consumers stay this far behind, so in-flight transactions land first
+    OUTBOX_BATCH_SIZE: int = 100  # Events per consumer batch
+    OUTBOX_POLL_SECONDS: float = 1.0  # Consumer poll interval when caught up
+    OUTBOX_CONSUMERS_ENABLED: bool = True  # Run the registered outbox consumers in the API process
+
+    # Notifications
+    NOTIFICATIONS_RETENTION_DAYS: int = 90  # Inbox entries expire (DynamoDB TTL) after this
+    NOTIFICATIONS_PAGE_SIZE: int = 20  # Default page size of GET /api/notifications
+
+    # Chat search
+    CHAT_SEARCH_ENABLED: bool = True  # Keep an in-memory message index per API process
+    CHAT_SEARCH_SNAPSHOT_PATH: Optional[str] = "chat_search_index.npz"  # Saved index, loaded at startup (None = rebuild every start)
+    CHAT_SEARCH_SNAPSHOT_SECONDS: int = 60  # Minimum interval between snapshot writes
+    CHAT_SEARCH_PAGE_SIZE: int = 20  # Default page size of GET /api/chat/search
+
+    # Order search
+    ORDER_SEARCH_ENABLED: bool = True  # Keep an in-memory trigram index of orders per API process
+    ORDER_SEARCH_PAGE_SIZE: int = 20  # Default page size of GET /api/orders/search
+
     # CORS (comma-separated string in env, converted to list)
     CORS_ORIGINS: str = "http://localhost:8088,http://localhost:5173"
     
@@ -28,6 +129,16 @@ class Settings(BaseSettings):
         """Convert CORS_ORIGINS string to list"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
     
+    @property
+    def participant_index_shards(self) -> Dict[str, int]:
+        """Convert PARTICIPANT_INDEX_SHARDS to {email: shards}"""
+        shards = {}
+        for entry in self.PARTICIPANT_INDEX_SHARDS.split(","):
+            if entry.strip():
+                email, _, count = entry.partition("=")
+                shards[email.strip()] = max(int(count), 1)
+        return shards
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
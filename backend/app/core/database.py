@@ -2,62 +2,72 @@ import boto3
 from botocore.exceptions import ClientError
 from botocore.config import Config
 from app.core.config import settings
+from app.core.instrumentation import instrument_client
 from typing import Optional
+import threading
 import time
 
 
-# Configure boto3 with longer timeouts for local DynamoDB
+# Short timeouts and adaptive retries; requests also stop retrying at their deadline (app.core.deadlines)
 boto_config = Config(
-    connect_timeout=10,
-    read_timeout=30,
-    retries={'max_attempts': 3, 'mode': 'standard'}
+    connect_timeout=settings.DYNAMODB_CONNECT_TIMEOUT,
+    read_timeout=settings.DYNAMODB_READ_TIMEOUT,
+    retries={'total_max_attempts': settings.DYNAMODB_MAX_ATTEMPTS, 'mode': settings.DYNAMODB_RETRY_MODE}
 )
 
 
-def get_dynamodb_client():
-    """Get or create DynamoDB client"""
+_session = None
+_client = None
+_client_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def _connection_kwargs() -> dict:
+    kwargs = {
+        'region_name': settings.AWS_REGION,
+        'aws_access_key_id': settings.AWS_ACCESS_KEY_ID,
+        'aws_secret_access_key': settings.AWS_SECRET_ACCESS_KEY,
+        'config': boto_config
+    }
     if settings.DYNAMODB_ENDPOINT_URL:
         # Local DynamoDB
-        return boto3.client(
-            'dynamodb',
-            endpoint_url=settings.DYNAMODB_ENDPOINT_URL,
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=boto_config
-        )
-    else:
-        # AWS DynamoDB
-        return boto3.client(
-            'dynamodb',
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=boto_config
-        )
+        kwargs['endpoint_url'] = settings.DYNAMODB_ENDPOINT_URL
+    return kwargs
+
+
+def _get_session():
+    """Shared boto3 session; callers must hold _client_lock while using it"""
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_dynamodb_client():
+    """Get the shared DynamoDB client (clients are thread-safe)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = _get_session().client('dynamodb', **_connection_kwargs())
+                _client = instrument_client(client)
+    return _client
 
 
 def get_dynamodb_resource():
-    """Get or create DynamoDB resource"""
-    if settings.DYNAMODB_ENDPOINT_URL:
-        # Local DynamoDB
-        return boto3.resource(
-            'dynamodb',
-            endpoint_url=settings.DYNAMODB_ENDPOINT_URL,
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=boto_config
-        )
-    else:
-        # AWS DynamoDB
-        return boto3.resource(
-            'dynamodb',
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=boto_config
-        )
+    """Get the DynamoDB resource for the current thread
+
+    Resources are not thread-safe, so each thread gets its own, created once
+    and reused for every later call on that thread. They are built from the
+    shared session so service models are only loaded once per process.
+    """
+    resource = getattr(_thread_local, 'resource', None)
+    if resource is None:
+        with _client_lock:
+            resource = _get_session().resource('dynamodb', **_connection_kwargs())
+        instrument_client(resource.meta.client)
+        _thread_local.resource = resource
+    return resource
 
 
 def init_tables():
@@ -97,30 +107,63 @@ def init_tables():
             ],
             'AttributeDefinitions': [
                 {'AttributeName': 'id', 'AttributeType': 'S'},
-                {'AttributeName': 'created_by', 'AttributeType': 'S'},
-                {'AttributeName': 'renter_email', 'AttributeType': 'S'},
-                {'AttributeName': 'landlord_email', 'AttributeType': 'S'}
+                {'AttributeName': 'agent_status_key', 'AttributeType': 'S'},
+                {'AttributeName': 'renter_status_key', 'AttributeType': 'S'},
+                {'AttributeName': 'landlord_status_key', 'AttributeType': 'S'},
+                {'AttributeName': 'agent_shard_key', 'AttributeType': 'S'},
+                {'AttributeName': 'renter_shard_key', 'AttributeType': 'S'},
+                {'AttributeName': 'landlord_shard_key', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'S'}
             ],
             'BillingMode': 'PAY_PER_REQUEST',
             'GlobalSecondaryIndexes': [
+                # Sparse: only open orders carry the "<email>#<status>" keys
                 {
-                    'IndexName': 'created-by-index',
+                    'IndexName': 'agent-status-index',
                     'KeySchema': [
-                        {'AttributeName': 'created_by', 'KeyType': 'HASH'}
+                        {'AttributeName': 'agent_status_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
                     ],
                     'Projection': {'ProjectionType': 'ALL'}
                 },
                 {
-                    'IndexName': 'renter-email-index',
+                    'IndexName': 'renter-status-index',
                     'KeySchema': [
-                        {'AttributeName': 'renter_email', 'KeyType': 'HASH'}
+                        {'AttributeName': 'renter_status_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
                     ],
                     'Projection': {'ProjectionType': 'ALL'}
                 },
                 {
-                    'IndexName': 'landlord-email-index',
+                    'IndexName': 'landlord-status-index',
                     'KeySchema': [
-                        {'AttributeName': 'landlord_email', 'KeyType': 'HASH'}
+                        {'AttributeName': 'landlord_status_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                },
+                # Participant keys "<email>", or "<email>#<shard>" for users with several shards
+                {
+                    'IndexName': 'agent-shard-index',
+                    'KeySchema': [
+                        {'AttributeName': 'agent_shard_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                },
+                {
+                    'IndexName': 'renter-shard-index',
+                    'KeySchema': [
+                        {'AttributeName': 'renter_shard_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                },
+                {
+                    'IndexName': 'landlord-shard-index',
+                    'KeySchema': [
+                        {'AttributeName': 'landlord_shard_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
                     ],
                     'Projection': {'ProjectionType': 'ALL'}
                 }
@@ -134,9 +177,80 @@ def init_tables():
                 {'AttributeName': 'order_id', 'AttributeType': 'S'}
             ],
             'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Materialized order counters per user and role
+        'user_counters': {
+            'KeySchema': [
+                {'AttributeName': 'email', 'KeyType': 'HASH'},
+                {'AttributeName': 'role', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'email', 'AttributeType': 'S'},
+                {'AttributeName': 'role', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Per-user notification inboxes: entries "n#<id>" and a "~meta" item with the unread count
+        'notifications': {
+            'KeySchema': [
+                {'AttributeName': 'recipient', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'recipient', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Change events written with every repository write (see app/core/events.py)
+        'outbox': {
+            'KeySchema': [
+                {'AttributeName': 'shard', 'KeyType': 'HASH'},
+                {'AttributeName': 'seq', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'shard', 'AttributeType': 'S'},
+                {'AttributeName': 'seq', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Position of each outbox consumer per shard
+        'outbox_checkpoints': {
+            'KeySchema': [
+                {'AttributeName': 'consumer', 'KeyType': 'HASH'},
+                {'AttributeName': 'shard', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'consumer', 'AttributeType': 'S'},
+                {'AttributeName': 'shard', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Idempotency keys of order creation and message posting with their responses (see app/core/idempotency.py)
+        'idempotency_keys': {
+            'KeySchema': [
+                {'AttributeName': 'key', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'key', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        },
+        # Applied migrations, backfill checkpoints and the migration lock (see app/migrations)
+        'schema_migrations': {
+            'KeySchema': [
+                {'AttributeName': 'id', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'id', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
         }
     }
     
+    # Items expire once this (epoch seconds) attribute is in the past
+    ttl_attributes = {'outbox': 'expires_at', 'notifications': 'expires_at', 'idempotency_keys': 'expires_at'}
+    
     for table_name, table_config in tables.items():
         try:
             client.describe_table(TableName=table_name)
@@ -146,6 +260,12 @@ def init_tables():
                 try:
                     client.create_table(TableName=table_name, **table_config)
                     print(f"Created table {table_name}")
+                    if table_name in ttl_attributes:
+                        client.get_waiter('table_exists').wait(TableName=table_name)
+                        client.update_time_to_live(
+                            TableName=table_name,
+                            TimeToLiveSpecification={'Enabled': True, 'AttributeName': ttl_attributes[table_name]}
+                        )
                 except Exception as create_error:
                     print(f"Error creating table {table_name}: {create_error}")
             else:
@@ -0,0 +1,60 @@
+"""
+Per-request deadline budgets.
+
+Every HTTP request gets a deadline of REQUEST_DEADLINE_SECONDS from its
+arrival (a caller can ask for less with the X-Request-Timeout header, in
+seconds). It is kept on the RequestContext, so it reaches every repository
+call the handler makes, including calls on hedging threads. The DynamoDB
+client hooks check it before each attempt, retries included, and raise
+DeadlineExceeded once it has passed; the route layer turns that into a 504.
+
+The deadline only covers the handler: a streaming response, once started,
+is not cut off. Calls outside a request (outbox consumers, migrations, the
+index loaders) have no deadline.
+"""
+from app.core.config import settings
+from app.core.metrics import DEADLINE_EXCEEDED
+from app.core.request_context import RequestContext, get_request_context
+from typing import Optional
+import time
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before a DynamoDB call could be made"""
+
+
+def start(context: RequestContext, headers) -> None:
+    """Set the deadline of a new request"""
+    budget = settings.REQUEST_DEADLINE_SECONDS
+    for name, value in headers:
+        if name.lower() == TIMEOUT_HEADER:
+            try:
+                requested = float(value)
+            except ValueError:
+                break
+            if requested > 0:
+                budget = min(budget, requested) if budget > 0 else requested
+            break
+    if budget > 0:
+        context.deadline = context.started_at + budget
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request; None without a deadline"""
+    context = get_request_context()
+    if context is None or context.deadline is None:
+        return None
+    return context.deadline - time.perf_counter()
+
+
+def check(operation: str, table: str):
+    """Raise DeadlineExceeded if the current request's deadline has passed"""
+    left = remaining()
+    if left is None or left > 0:
+        return
+    context = get_request_context()
+    context.deadline_exceeded = True
+    DEADLINE_EXCEEDED.inc(operation=operation, table=table, route=context.route)
+    raise DeadlineExceeded(f"Request deadline exceeded before {operation} on {table}")
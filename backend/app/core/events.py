@@ -0,0 +1,150 @@
+"""
+Change events for orders, users and chat rooms.
+
+Repository writes describe what they changed as ChangeEvents. The events are
+stored in the outbox table by the same TransactWriteItems call as the change
+itself (see app.utils.transactions.transact_write) and, once that committed,
+handed to in-process subscribers. Other processes and durable derived data
+read the outbox with an OutboxConsumer (app.services.outbox_consumer), which
+delivers every event at least once.
+
+Outbox items are partitioned by entity type and a hash of the entity key, so
+the events of one order (or user, or chat room) are read back in the order
+they were written.
+"""
+from app.core.config import settings
+from app.models.enums import ChangeType, EntityType
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = 'outbox'
+
+
+class ChangeEvent(BaseModel):
+    event_id: str
+    seq: str  # Outbox sort key: write time in ns plus a random suffix
+    entity: EntityType
+    key: str
+    change: ChangeType
+    before_version: Optional[int] = None
+    after_version: Optional[int] = None
+    before: Optional[Dict[str, Any]] = None
+    after: Optional[Dict[str, Any]] = None
+    details: Dict[str, Any] = {}  # Entity specific, e.g. the messages added to a chat room
+    occurred_at: float  # Unix time
+
+    @property
+    def shard(self) -> str:
+        return shard_for(self.entity, self.key)
+
+
+def shard_for(entity: EntityType, key: str) -> str:
+    return f"{EntityType(entity).value}#{zlib.crc32(key.encode()) % settings.OUTBOX_SHARDS}"
+
+
+def shards(entities: Optional[List[EntityType]] = None) -> List[str]:
+    """All outbox partitions holding events of these entity types (default: all)"""
+    return [
+        f"{EntityType(entity).value}#{n}"
+        for entity in (entities or list(EntityType))
+        for n in range(settings.OUTBOX_SHARDS)
+    ]
+
+
+def new_seq(now_ns: Optional[int] = None) -> str:
+    return f"{now_ns or time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+
+def seq_cutoff(seconds_ago: float) -> str:
+    """Upper bound for sequence numbers written at least seconds_ago"""
+    return f"{time.time_ns() - int(seconds_ago * 1e9):020d}-~"
+
+
+def _image(entity: EntityType, model: Any) -> Dict[str, Any]:
+    if entity == EntityType.ORDER:
+        # The embedded chat room has its own events
+        return model.model_dump(mode='json', exclude={'chat_room'}, exclude_none=True)
+    if entity == EntityType.CHAT_ROOM:
+        image = model.model_dump(mode='json', exclude={'messages'}, exclude_none=True)
+        image['message_count'] = model.message_count
+        return image
+    return model.model_dump(mode='json', exclude_none=True)
+
+
+def change(entity: EntityType, key: str, before: Any = None, after: Any = None) -> ChangeEvent:
+    """Describe replacing before with after (None = absent) as a ChangeEvent"""
+    if before is None and after is None:
+        raise ValueError("A change needs a before or an after state")
+    details = {}
+    if entity == EntityType.CHAT_ROOM and after is not None:
+        # Chat room images leave out the history; carry the new messages instead
+        known = before.message_count if before is not None else 0
+        added = after.messages[known:]
+        if added:
+            details['messages_added'] = [message.model_dump(mode='json') for message in added]
+    return ChangeEvent(
+        event_id=uuid.uuid4().hex,
+        seq=new_seq(),
+        entity=entity,
+        key=key,
+        change=ChangeType.CREATED if before is None else ChangeType.DELETED if after is None else ChangeType.UPDATED,
+        before_version=getattr(before, 'version', None),
+        after_version=getattr(after, 'version', None),
+        before=_image(entity, before) if before is not None else None,
+        after=_image(entity, after) if after is not None else None,
+        details=details,
+        occurred_at=time.time(),
+    )
+
+
+def to_outbox_item(event: ChangeEvent) -> Dict[str, Any]:
+    # The event is stored as JSON so images keep their float values
+    return {
+        'shard': event.shard,
+        'seq': event.seq,
+        'event': event.model_dump_json(),
+        'expires_at': int(event.occurred_at) + settings.OUTBOX_RETENTION_DAYS * 86400,
+    }
+
+
+def from_outbox_item(item: Dict[str, Any]) -> ChangeEvent:
+    return ChangeEvent(**json.loads(item['event']))
+
+
+# In-process delivery
+
+Handler = Callable[[ChangeEvent], None]
+
+_subscribers: Dict[Optional[EntityType], List[Handler]] = {}
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(handler: Handler, entity: Optional[EntityType] = None):
+    """Call handler for every committed change in this process (of one entity type, or all)"""
+    with _subscribers_lock:
+        _subscribers.setdefault(entity, []).append(handler)
+
+
+def unsubscribe(handler: Handler, entity: Optional[EntityType] = None):
+    with _subscribers_lock:
+        if handler in _subscribers.get(entity, []):
+            _subscribers[entity].remove(handler)
+
+
+def publish(events: List[ChangeEvent]):
+    """Hand committed events to subscribers; a failing subscriber does not affect the write"""
+    for event in events:
+        for handler in _subscribers.get(event.entity, []) + _subscribers.get(None, []):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Change event handler {getattr(handler, '__qualname__', handler)} failed for "
+                             f"{event.entity.value} {event.key}: {e}")
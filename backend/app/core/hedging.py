@@ -0,0 +1,137 @@
+"""
+Hedged DynamoDB reads.
+
+A read that has not answered after the usual p95 latency of its operation
+and table is most likely stuck behind a slow node or connection; a second,
+identical request usually answers faster. hedged(operation, table, fn) runs
+fn on a worker thread and, once HEDGE_PERCENTILE of the recent latency has
+passed, starts it a second time and returns whichever finishes first. Only
+use it for idempotent reads (GetItem, Query): both requests may complete,
+and the loser's capacity is spent anyway.
+
+Latencies come from the DynamoDB client hooks (observe). Until
+HEDGE_MIN_SAMPLES calls of an operation and table were seen, or when the
+request's deadline leaves no time for a second attempt, or when all
+HEDGE_MAX_IN_FLIGHT workers are busy, fn simply runs on the caller's thread.
+"""
+from app.core import deadlines
+from app.core.config import settings
+from app.core.metrics import Counter
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, Tuple, TypeVar
+import contextvars
+import threading
+
+T = TypeVar('T')
+
+# Latencies kept per (operation, table), and how often the percentile is recomputed
+WINDOW_SIZE = 1000
+RECOMPUTE_EVERY = 50
+
+HEDGED_READS = Counter(
+    "kaution_hedged_reads_total",
+    "Hedged reads by operation and table; winner=primary|hedge tells which request answered first",
+    ("operation", "table", "winner")
+)
+
+
+class _LatencyWindow:
+    __slots__ = ('samples', 'pending', 'delay')
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=WINDOW_SIZE)
+        self.pending = 0
+        self.delay: Optional[float] = None
+
+
+class LatencyTracker:
+    """Recent call latencies and the resulting hedge delay per (operation, table)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str], _LatencyWindow] = {}
+
+    def observe(self, operation: str, table: str, seconds: float):
+        with self._lock:
+            window = self._windows.get((operation, table))
+            if window is None:
+                window = self._windows[(operation, table)] = _LatencyWindow()
+            window.samples.append(seconds)
+            window.pending += 1
+            if window.pending >= RECOMPUTE_EVERY and len(window.samples) >= settings.HEDGE_MIN_SAMPLES:
+                ordered = sorted(window.samples)
+                window.delay = ordered[min(len(ordered) - 1, int(len(ordered) * settings.HEDGE_PERCENTILE))]
+                window.pending = 0
+
+    def delay(self, operation: str, table: str) -> Optional[float]:
+        """Seconds to wait before hedging; None while there are too few samples"""
+        window = self._windows.get((operation, table))
+        if window is None or window.delay is None:
+            return None
+        return max(window.delay, settings.HEDGE_MIN_DELAY_MS / 1000)
+
+
+latencies = LatencyTracker()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.HEDGE_MAX_IN_FLIGHT, thread_name_prefix="hedge")
+    return _executor
+
+
+def _reserve(slots: int) -> bool:
+    global _in_flight
+    with _executor_lock:
+        if _in_flight + slots > settings.HEDGE_MAX_IN_FLIGHT:
+            return False
+        _in_flight += slots
+        return True
+
+
+def _release(future=None):
+    global _in_flight
+    with _executor_lock:
+        _in_flight -= 1
+
+
+def _submit(fn: Callable[[], T]):
+    # Each attempt runs in its own copy of the request's context (deadline, call accounting)
+    future = _get_executor().submit(contextvars.copy_context().run, fn)
+    future.add_done_callback(_release)
+    return future
+
+
+def hedged(operation: str, table: str, fn: Callable[[], T]) -> T:
+    """fn(), sent a second time if the first attempt is slower than usual"""
+    if not settings.HEDGED_READS_ENABLED:
+        return fn()
+    delay = latencies.delay(operation, table)
+    left = deadlines.remaining()
+    if delay is None or (left is not None and left <= delay) or not _reserve(2):
+        return fn()
+    primary = _submit(fn)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        _release()  # The hedge slot was not needed
+        return primary.result()
+    hedge = _submit(fn)
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                winner = 'primary' if future is primary else 'hedge'
+                HEDGED_READS.inc(operation=operation, table=table, winner=winner)
+                return future.result()
+            error = error or future.exception()
+    raise error
@@ -0,0 +1,155 @@
+"""
+Idempotency keys for requests that create something.
+
+POST /api/orders and POST /api/chat/rooms/{id}/messages accept an
+Idempotency-Key header (any unique string from the client, e.g. a UUID,
+reused for every retry of the same request). With a key, run():
+
+1. claims the key in the idempotency_keys table with a conditional put,
+   together with a fingerprint of the request;
+2. runs the handler and stores its response under the key, compressed
+   (app.utils.dynamodb.pack), for IDEMPOTENCY_TTL_HOURS;
+3. answers a retry with that response and "Idempotent-Replayed: true",
+   without running the handler again.
+
+A retry that arrives while the original is still running waits for its
+response. It waits on an event when the original runs in the same process
+and polls the table otherwise, for up to IDEMPOTENCY_WAIT_SECONDS (within
+the request deadline), then gives up with 409. If the original fails, the
+key is released and the retry does the work. Only successful responses are
+stored. A process that dies mid-request leaves the key claimed until its
+lease (IDEMPOTENCY_LEASE_SECONDS) runs out.
+
+Keys are scoped by the caller and the kind of request. Reusing a key for a
+different request (another body or parameters) is rejected with 422.
+Requests without a key behave as before.
+"""
+from app.core import deadlines
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.repositories.idempotency_repository import COMPLETED, IdempotencyRepository
+from app.utils.dynamodb import decimal_default, pack, unpack
+from fastapi import Response
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_REQUESTS = Counter(
+    "kaution_idempotent_requests_total",
+    "Requests with an Idempotency-Key by result (executed, replayed, waited, in_progress, mismatch)",
+    ("result",)
+)
+
+
+class IdempotencyError(Exception):
+    """A request with an Idempotency-Key that cannot be answered; status_code is the HTTP status"""
+
+    status_code = 409
+
+
+class RequestInProgress(IdempotencyError):
+    """The original request with the same key is still running"""
+
+    status_code = 409
+
+
+class KeyReused(IdempotencyError):
+    """The key was used before for a different request"""
+
+    status_code = 422
+
+
+# Events of the requests this process is running, so local duplicates need not poll
+_in_flight: Dict[str, threading.Event] = {}
+_in_flight_lock = threading.Lock()
+
+
+def fingerprint(request: Any) -> str:
+    data = json.dumps(request, sort_keys=True, default=decimal_default)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _wait(record_key: str, timeout: float):
+    with _in_flight_lock:
+        event = _in_flight.get(record_key)
+    if event is not None:
+        event.wait(timeout)
+    else:
+        time.sleep(timeout)
+
+
+def _execute(record_key: str, owner: str, handler: Callable[[], Any]) -> Any:
+    event = threading.Event()
+    with _in_flight_lock:
+        _in_flight[record_key] = event
+    try:
+        try:
+            result = handler()
+        except BaseException:
+            try:
+                IdempotencyRepository.release(record_key, owner)
+            except Exception as e:
+                # The key stays claimed until its lease runs out; the handler's error is what matters
+                logger.warning(f"Could not release idempotency key {record_key}: {e}")
+            raise
+        if not IdempotencyRepository.complete(record_key, owner, pack(result)):
+            logger.warning(f"Idempotency key {record_key} was taken over before its request finished")
+        return result
+    finally:
+        with _in_flight_lock:
+            if _in_flight.get(record_key) is event:
+                del _in_flight[record_key]
+        event.set()
+
+
+def run(scope: str, key: Optional[str], request: Any, handler: Callable[[], Any], response: Response) -> Any:
+    """handler() once per idempotency key; retries get the stored result
+
+    scope names the caller and kind of request (e.g. "orders#<email>"),
+    request holds everything the handler depends on (body and parameters).
+    The handler's result must be JSON serializable; without a key it just runs.
+    """
+    if key is None:
+        return handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters")
+
+    record_key = f"{scope}#{key}"
+    request_fingerprint = fingerprint(request)
+    wait_until = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    remaining = deadlines.remaining()
+    if remaining is not None:
+        # Leave time to answer before the request deadline
+        wait_until = min(wait_until, time.monotonic() + remaining * 0.8)
+    delay, waited = 0.05, False
+    while True:
+        owner = uuid.uuid4().hex
+        record = IdempotencyRepository.claim(record_key, request_fingerprint, owner)
+        if record is None:
+            IDEMPOTENT_REQUESTS.inc(result='executed')
+            return _execute(record_key, owner, handler)
+        if record:
+            if record['fingerprint'] != request_fingerprint:
+                IDEMPOTENT_REQUESTS.inc(result='mismatch')
+                raise KeyReused(f"{HEADER} was already used for a different request")
+            if record['state'] == COMPLETED:
+                IDEMPOTENT_REQUESTS.inc(result='waited' if waited else 'replayed')
+                response.headers[REPLAYED_HEADER] = "true"
+                stored = record['response']
+                return unpack(getattr(stored, 'value', stored))  # boto3 returns Binary
+            left = wait_until - time.monotonic()
+            if left <= 0:
+                IDEMPOTENT_REQUESTS.inc(result='in_progress')
+                raise RequestInProgress(f"A request with this {HEADER} is still in progress; retry later")
+            _wait(record_key, min(delay, left))
+            delay, waited = min(delay * 2, 0.5), True
@@ -0,0 +1,142 @@
+"""
+botocore event hooks that account every DynamoDB call.
+
+Each call is counted with its latency (including retries) and the capacity
+reported through ReturnConsumedCapacity, per operation, table and route. The
+numbers go to the process-wide metrics and to the active RequestContext so
+the middleware can log a per-request breakdown. Latencies also feed the
+hedge delays (app.core.hedging), and every attempt first checks the
+request's deadline (app.core.deadlines). Outcomes drive the storage circuit
+breaker (app.core.circuit_breaker), which is checked before every call.
+"""
+from app.core import deadlines
+from app.core.circuit_breaker import StorageUnavailable, guard, is_failed_response, is_storage_failure, storage_breaker
+from app.core.config import settings
+from app.core.hedging import latencies
+from app.core.metrics import (
+    DYNAMODB_CALLS,
+    DYNAMODB_ERRORS,
+    DYNAMODB_CALL_DURATION,
+    DYNAMODB_CONSUMED_CAPACITY,
+    DYNAMODB_RETRIES,
+)
+from app.core.request_context import get_request_context
+from typing import Any, Dict
+import time
+
+_CONTEXT_KEY = "kaution_call"
+
+
+def _table_label(params: Dict[str, Any]) -> str:
+    """Best-effort table name for a call's parameters"""
+    if "TableName" in params:
+        return params["TableName"]
+    if "RequestItems" in params:
+        return ",".join(sorted(params["RequestItems"]))
+    if "TransactItems" in params:
+        tables = set()
+        for item in params["TransactItems"]:
+            for action in item.values():
+                if isinstance(action, dict) and "TableName" in action:
+                    tables.add(action["TableName"])
+        return ",".join(sorted(tables))
+    return "-"
+
+
+def _capacity_units(parsed: Dict[str, Any]) -> float:
+    consumed = parsed.get("ConsumedCapacity")
+    if not consumed:
+        return 0.0
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return float(sum(entry.get("CapacityUnits", 0) or 0 for entry in consumed))
+
+
+def _on_provide_client_params(params, model, context, **kwargs):
+    if (
+        settings.DYNAMODB_RETURN_CONSUMED_CAPACITY
+        and "ReturnConsumedCapacity" not in params
+        and model.input_shape is not None
+        and "ReturnConsumedCapacity" in model.input_shape.members
+    ):
+        params["ReturnConsumedCapacity"] = "TOTAL"
+    context[_CONTEXT_KEY] = {"table": _table_label(params)}
+
+
+def _storage_unavailable():
+    request_context = get_request_context()
+    if request_context is not None:
+        request_context.storage_unavailable = True
+
+
+def _on_before_call(model, context, **kwargs):
+    call = context.setdefault(_CONTEXT_KEY, {"table": "-"})
+    try:
+        guard(model.name, call["table"])
+    except StorageUnavailable:
+        _storage_unavailable()
+        raise
+    call["started_at"] = time.perf_counter()
+
+
+def _on_before_send(request, context=None, event_name="", **kwargs):
+    # Emitted per attempt, so a retry does not start once the deadline passed
+    call = (request.context or {}).get(_CONTEXT_KEY) or {}
+    deadlines.check(event_name.rsplit(".", 1)[-1], call.get("table", "-"))
+
+
+def _record(model_name: str, context, parsed=None, error: bool = False, retries: int = 0):
+    call = context.get(_CONTEXT_KEY)
+    if not call or "started_at" not in call:
+        return
+    latency = time.perf_counter() - call.pop("started_at")
+    table = call["table"]
+    capacity = _capacity_units(parsed) if parsed else 0.0
+    if retries:
+        DYNAMODB_RETRIES.inc(retries, operation=model_name, table=table)
+    if not error:
+        latencies.observe(model_name, table, latency)
+
+    request_context = get_request_context()
+    route = request_context.route if request_context else "background"
+
+    DYNAMODB_CALLS.inc(operation=model_name, table=table, route=route)
+    DYNAMODB_CALL_DURATION.observe(latency, operation=model_name, table=table)
+    if capacity:
+        DYNAMODB_CONSUMED_CAPACITY.inc(capacity, operation=model_name, table=table, route=route)
+    if error:
+        DYNAMODB_ERRORS.inc(operation=model_name, table=table, route=route)
+    if request_context is not None:
+        request_context.record_dynamodb_call(model_name, table, latency, capacity, error)
+
+
+def _retry_attempts(parsed) -> int:
+    return ((parsed or {}).get("ResponseMetadata") or {}).get("RetryAttempts") or 0
+
+
+def _on_after_call(http_response, parsed, model, context, **kwargs):
+    _record(model.name, context, parsed, error=http_response.status_code >= 300, retries=_retry_attempts(parsed))
+    if is_failed_response(parsed):
+        storage_breaker.record_failure()
+        _storage_unavailable()
+    else:
+        storage_breaker.record_success()
+
+
+def _on_after_call_error(exception, context, event_name, **kwargs):
+    response = getattr(exception, "response", None)
+    _record(event_name.rsplit(".", 1)[-1], context, error=True, retries=_retry_attempts(response))
+    if is_storage_failure(exception):
+        storage_breaker.record_failure()
+        _storage_unavailable()
+
+
+def instrument_client(client):
+    """Register the accounting hooks on a DynamoDB client"""
+    events = client.meta.events
+    events.register("provide-client-params.dynamodb", _on_provide_client_params)
+    events.register("before-call.dynamodb", _on_before_call)
+    events.register("before-send.dynamodb", _on_before_send)
+    events.register("after-call.dynamodb", _on_after_call)
+    events.register("after-call-error.dynamodb", _on_after_call_error)
+    return client
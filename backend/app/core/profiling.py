@@ -0,0 +1,141 @@
+"""
+Statistical stack profiler for individual requests.
+
+Profiled requests register the thread running their handler; a single
+background sampler thread then reads that thread's Python stack every
+PROFILING_INTERVAL_MS and aggregates the collapsed stacks per route. Steps
+that run after the handler (response validation on a threadpool thread and
+JSON serialization on the event loop thread) register their threads the same
+way; their stacks start with a "[phase]" frame. The sampler only runs while
+at least one profiled request is in flight, so the cost is zero when
+profiling is off.
+
+Output uses the collapsed-stack format ("frame;frame;frame count") consumed
+by flamegraph.pl, speedscope and most other flame-graph tools.
+"""
+from app.core.config import settings
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import os
+import sys
+import threading
+import time
+
+MAX_STACKS_PER_ROUTE = 5000
+_TRUNCATED_STACK = "[other stacks]"
+
+
+class RouteProfile:
+    def __init__(self):
+        self.requests = 0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+
+
+class SamplingProfiler:
+    def __init__(self, interval_seconds: float = 0.005, max_depth: int = 128):
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._active: Dict[int, Tuple[str, Optional[str]]] = {}  # thread id -> (route, phase)
+        self._profiles: Dict[str, RouteProfile] = {}
+        self._sampler: Optional[threading.Thread] = None
+        # Frames at or above these code objects are request plumbing, not handler work
+        self._root_codes = set()
+
+    def add_root(self, code):
+        """Cut sampled stacks at this code object (e.g. the endpoint wrapper)"""
+        self._root_codes.add(code)
+
+    @contextmanager
+    def profile_thread(self, route: str, phase: Optional[str] = None):
+        """Sample the calling thread until the block exits
+
+        phase names a step of a request already counted (e.g. "serialization");
+        its stacks are prefixed with "[phase]".
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = (route, phase)
+            profile = self._profiles.setdefault(route, RouteProfile())
+            if phase is None:
+                profile.requests += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._run, name="request-profiler", daemon=True
+                )
+                self._sampler.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = dict(self._active)
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, (route, phase) in active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples.append((route, self._collapse(frame, phase)))
+            del frames
+            with self._lock:
+                for route, stack in samples:
+                    profile = self._profiles.setdefault(route, RouteProfile())
+                    profile.samples += 1
+                    if stack in profile.stacks or len(profile.stacks) < MAX_STACKS_PER_ROUTE:
+                        profile.stacks[stack] += 1
+                    else:
+                        profile.stacks[_TRUNCATED_STACK] += 1
+
+    def _collapse(self, frame, phase: Optional[str] = None) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            if code in self._root_codes:
+                break
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if phase is not None:
+            names.append(f"[{phase}]")
+        names.reverse()
+        return ";".join(names) or "[endpoint]"
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                route: {
+                    "requests": profile.requests,
+                    "samples": profile.samples,
+                    "distinct_stacks": len(profile.stacks),
+                }
+                for route, profile in self._profiles.items()
+            }
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Collapsed stacks for one route, or for all routes prefixed by route"""
+        with self._lock:
+            if route is not None:
+                profile = self._profiles.get(route)
+                stacks = Counter(profile.stacks) if profile else Counter()
+            else:
+                stacks = Counter()
+                for name, profile in self._profiles.items():
+                    for stack, count in profile.stacks.items():
+                        stacks[f"{name};{stack}"] += count
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def reset(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profiler = SamplingProfiler(interval_seconds=settings.PROFILING_INTERVAL_MS / 1000)
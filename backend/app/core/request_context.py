@@ -0,0 +1,103 @@
+"""
+Per-request context shared between the HTTP layer and the storage layer.
+
+The middleware opens a context for every request; the DynamoDB client hooks
+record each call on whatever context is active. Sync route handlers run in
+the threadpool with a copy of the caller's contextvars, so they see (and
+mutate) the same RequestContext object as the middleware.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+
+
+@dataclass
+class DynamoDBCallStats:
+    """Aggregated DynamoDB calls for one (operation, table) pair"""
+    calls: int = 0
+    errors: int = 0
+    latency_seconds: float = 0.0
+    consumed_capacity: float = 0.0
+
+
+@dataclass
+class RequestContext:
+    method: str
+    path: str
+    scope: Dict[str, Any] = field(default_factory=dict, repr=False)
+    started_at: float = field(default_factory=time.perf_counter)
+    profiled: bool = False
+    deadline: Optional[float] = None  # perf_counter time; see app.core.deadlines
+    deadline_exceeded: bool = False
+    storage_unavailable: bool = False  # A DynamoDB call failed fast or failed for storage reasons
+    dynamodb: Dict[Tuple[str, str], DynamoDBCallStats] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_dynamodb_call(
+        self,
+        operation: str,
+        table: str,
+        latency_seconds: float,
+        consumed_capacity: float = 0.0,
+        error: bool = False
+    ):
+        """Add one DynamoDB call to this request's breakdown"""
+        with self._lock:
+            stats = self.dynamodb.get((operation, table))
+            if stats is None:
+                stats = self.dynamodb[(operation, table)] = DynamoDBCallStats()
+            stats.calls += 1
+            stats.latency_seconds += latency_seconds
+            stats.consumed_capacity += consumed_capacity
+            if error:
+                stats.errors += 1
+
+    @property
+    def route(self) -> str:
+        """Route template (e.g. /api/orders/{order_id}) once the router matched"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    @property
+    def dynamodb_calls(self) -> int:
+        return sum(stats.calls for stats in self.dynamodb.values())
+
+    @property
+    def consumed_capacity(self) -> float:
+        return sum(stats.consumed_capacity for stats in self.dynamodb.values())
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def breakdown(self) -> str:
+        """Human readable call breakdown, e.g. for the slow-request log"""
+        parts = [
+            f"{operation}({table}) x{stats.calls} "
+            f"{stats.latency_seconds * 1000:.1f}ms {stats.consumed_capacity:g}cu"
+            + (f" {stats.errors} errors" if stats.errors else "")
+            for (operation, table), stats in sorted(
+                self.dynamodb.items(),
+                key=lambda kv: kv[1].latency_seconds,
+                reverse=True
+            )
+        ]
+        return ", ".join(parts) or "no DynamoDB calls"
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("kaution_request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Return the context of the request being served, if any"""
+    return _current.get()
+
+
+def set_request_context(context: Optional[RequestContext]):
+    """Activate a context; returns a token for reset_request_context"""
+    return _current.set(context)
+
+
+def reset_request_context(token):
+    _current.reset(token)
@@ -0,0 +1,103 @@
+"""
+Signed access tokens.
+
+Login issues a JWT signed with SECRET_KEY (ALGORITHM) that carries the user's
+email, role and display name and expires after ACCESS_TOKEN_EXPIRE_MINUTES.
+Routes take the caller from the token instead of trusting query parameters,
+so authorization needs no user lookup.
+
+Verified tokens are kept in a small LRU cache until they expire: a client
+polling with the same token has its signature checked once.
+"""
+from app.core.config import settings
+from app.models.domain import User
+from app.models.enums import UserRole
+from collections import OrderedDict
+from pydantic import BaseModel
+from typing import Tuple
+import threading
+import time
+
+import jwt
+
+
+class InvalidTokenError(Exception):
+    """Raised for malformed, forged or expired access tokens"""
+
+
+class TokenClaims(BaseModel):
+    email: str
+    role: UserRole
+    name: str
+    expires_at: int  # Unix time
+
+
+def create_access_token(user: User) -> Tuple[str, int]:
+    """Signed token for a user and its lifetime in seconds"""
+    now = int(time.time())
+    expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    payload = {
+        'sub': user.email,
+        'role': UserRole(user.role).value,
+        'name': user.name,
+        'iat': now,
+        'exp': now + expires_in,
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM), expires_in
+
+
+class _VerifiedTokens:
+    """Thread-safe LRU of verified tokens; entries are dropped once expired"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, TokenClaims]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is None:
+                return None
+            if claims.expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: TokenClaims):
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_verified = _VerifiedTokens()
+
+
+def verify_access_token(token: str) -> TokenClaims:
+    """Claims of a valid token; raises InvalidTokenError otherwise"""
+    claims = _verified.get(token)
+    if claims is not None:
+        return claims
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            options={'require': ['sub', 'role', 'exp']}
+        )
+        claims = TokenClaims(
+            email=payload['sub'],
+            role=UserRole(payload['role']),
+            name=payload.get('name') or payload['sub'].split('@')[0],
+            expires_at=payload['exp']
+        )
+    except (jwt.PyJWTError, ValueError) as e:
+        raise InvalidTokenError(str(e)) from e
+    _verified.put(token, claims)
+    return claims
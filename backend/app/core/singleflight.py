@@ -0,0 +1,123 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When the agent, renter and landlord of an order poll at the same moment,
+their requests read the same order and chat room. SingleFlight.do lets the
+first of those reads (the leader) go to DynamoDB and hands its result, or its
+exception, to every identical read that arrives while it is in flight.
+Reads are identical if table, key and projection match. Nothing is cached:
+once the leader's call returns, the next read starts a new call.
+
+The result is shared, so callers must not modify it; the repositories share
+the raw item and build their own models from it. Committed writes forget the
+key's in-flight read (see forget), so a read that starts after a write of
+this process never gets a result fetched before it.
+
+Calls and shared results are counted per table in Prometheus
+(kaution_singleflight_calls_total) and per key, for the most shared keys, in
+GET /admin/singleflight.
+"""
+from app.core.config import settings
+from app.core.metrics import Counter as MetricCounter
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+import threading
+
+T = TypeVar('T')
+
+# Per-key statistics kept for at most this many keys; the least shared are dropped
+MAX_TRACKED_KEYS = 10000
+
+SINGLE_FLIGHT_CALLS = MetricCounter(
+    "kaution_singleflight_calls_total",
+    "Coalescable reads by table; result=leader went to DynamoDB, result=shared got a leader's result",
+    ("table", "result")
+)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one call per (table, key, projection) at a time and shares its outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, Hashable, Optional[str]], _Flight] = {}
+        self._calls: Counter = Counter()  # (table, key, projection) -> leader calls
+        self._shared: Counter = Counter()  # (table, key, projection) -> reads served by a leader's call
+
+    def do(self, table: str, key: Hashable, fn: Callable[[], T], projection: Optional[str] = None) -> T:
+        """fn(), or the result of an identical call already in flight"""
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn()
+        flight_key = (table, key, projection)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            self._count(flight_key, shared=True)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # forget() may already have replaced the flight
+                if self._flights.get(flight_key) is flight:
+                    del self._flights[flight_key]
+            flight.done.set()
+            self._count(flight_key, shared=False)
+
+    def forget(self, table: str, key: Hashable):
+        """Let later reads of a key start a new call instead of joining the one in flight"""
+        with self._lock:
+            for flight_key in [k for k in self._flights if k[0] == table and k[1] == key]:
+                del self._flights[flight_key]
+
+    def _count(self, flight_key, shared: bool):
+        SINGLE_FLIGHT_CALLS.inc(table=flight_key[0], result='shared' if shared else 'leader')
+        with self._lock:
+            (self._shared if shared else self._calls)[flight_key] += 1
+            if len(self._calls) > MAX_TRACKED_KEYS:
+                keep = {k for k, _ in self._shared.most_common(MAX_TRACKED_KEYS // 2)}
+                self._calls = Counter({k: n for k, n in self._calls.items() if k in keep})
+                self._shared = Counter({k: n for k, n in self._shared.items() if k in keep})
+
+    def stats(self, limit: int = 50) -> Dict[str, Any]:
+        """Keys with the most shared reads"""
+        with self._lock:
+            top = self._shared.most_common(limit)
+            keys: List[Dict[str, Any]] = [
+                {
+                    'table': table,
+                    'key': str(key),
+                    'projection': projection,
+                    'calls': self._calls[(table, key, projection)],
+                    'shared': shared,
+                }
+                for (table, key, projection), shared in top
+            ]
+            return {'in_flight': len(self._flights), 'keys': keys}
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._shared.clear()
+
+
+reads = SingleFlight()
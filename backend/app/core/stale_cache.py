@@ -0,0 +1,131 @@
+"""
+Last-known-good responses for reads during storage brownouts.
+
+Reads that the polling UI depends on (order lists, single orders, chat
+rooms) go through serve(): every successful result is remembered under its
+key. When the read fails because storage is unavailable (an open circuit
+breaker, throttling, timeouts, a passed deadline) and a previous result
+exists, that result is returned instead, marked with "X-Stale: true" and an
+Age header, and the read is repeated on a background thread so the copy is
+fresh once storage recovers. Without a previous result the error stands.
+
+Entries are kept in an LRU of STALE_CACHE_SIZE and are not served once
+older than STALE_CACHE_MAX_AGE_SECONDS. Nothing is served from here while
+storage works; this is not a cache for the normal path.
+"""
+from app.core.circuit_breaker import is_storage_failure
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded
+from app.core.metrics import Counter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Response
+from typing import Any, Callable, Hashable, Optional, Set, Tuple, TypeVar
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+STALE_RESPONSES = Counter(
+    "kaution_stale_responses_total",
+    "Reads answered with a last-known-good copy because storage was unavailable, by kind",
+    ("kind",)
+)
+STALE_REFRESHES = Counter(
+    "kaution_stale_refreshes_total",
+    "Background refreshes of last-known-good copies by kind and result",
+    ("kind", "result")
+)
+
+
+class LastKnownGood:
+    """LRU of the latest successful result per read"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing: Set[Hashable] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.STALE_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """The remembered value and its age in seconds"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.time() - entry[1]
+        if age > settings.STALE_CACHE_MAX_AGE_SECONDS:
+            return None
+        return entry[0], age
+
+    def refresh(self, key: Hashable, read: Callable[[], Any]):
+        """Repeat a read in the background (once per key at a time)"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stale-refresh")
+        self._executor.submit(self._refresh, key, read)
+
+    def _refresh(self, key: Hashable, read: Callable[[], Any]):
+        kind = _kind(key)
+        try:
+            value = read()
+            if value is not None:
+                self.put(key, value)
+            STALE_REFRESHES.inc(kind=kind, result='ok')
+        except Exception as e:
+            STALE_REFRESHES.inc(kind=kind, result='failed')
+            logger.debug(f"Background refresh of {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+last_known_good = LastKnownGood()
+
+
+def _kind(key: Hashable) -> str:
+    return str(key[0]) if isinstance(key, tuple) and key else str(key)
+
+
+def serve(key: Hashable, read: Callable[[], T], response: Response) -> T:
+    """read(), or its last-known-good result (marked stale) if storage is unavailable
+
+    key starts with the kind of read, e.g. ('order', order_id). None results
+    (not found) are not remembered.
+    """
+    if not settings.STALE_CACHE_ENABLED:
+        return read()
+    try:
+        value = read()
+    except Exception as e:
+        if not (is_storage_failure(e) or isinstance(e, DeadlineExceeded)):
+            raise
+        entry = last_known_good.get(key)
+        if entry is None:
+            raise
+        value, age = entry
+        response.headers["X-Stale"] = "true"
+        response.headers["Age"] = str(int(age))
+        STALE_RESPONSES.inc(kind=_kind(key))
+        last_known_good.refresh(key, read)
+        return value
+    if value is not None:
+        last_known_good.put(key, value)
+    return value
@@ -2,7 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import init_tables
-from app.api.routes import auth, orders, chat
+from app.api.routes import auth, orders, chat, metrics, admin, reports, notifications
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.metrics import RequestMetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
 import logging
 
 # Configure logging
@@ -19,6 +22,16 @@ def init_data_async():
         # Initialize static data after tables are ready
         from app.scripts.init_static_data import init_static_data
         init_static_data()
+        
+        # Outbox consumers read tables, so they start once those exist
+        from app.services.outbox_consumer import start_consumers
+        start_consumers()
+        
+        # Per-process search indexes: loaded (or rebuilt), then follow the outbox
+        from app.services.chat_search_service import ChatSearchService
+        from app.services.order_search_service import OrderSearchService
+        ChatSearchService.start()
+        OrderSearchService.start()
     except Exception as e:
         logger.warning(f"Error initializing data (they may already exist): {e}")
 
@@ -32,6 +45,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Rate limits and load shedding (inside CORS, so browsers can read the 429s)
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -39,12 +55,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stale", "Age", "Retry-After", "Idempotent-Replayed"],
 )
 
+# On-demand / sampled request profiling (needs the request context, so it sits inside metrics)
+app.add_middleware(ProfilingMiddleware)
+
+# Per-request latency and DynamoDB call accounting (outermost, so it times everything)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(orders.router)
 app.include_router(chat.router)
+app.include_router(reports.router)
+app.include_router(notifications.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 
 @app.get("/")
@@ -0,0 +1,238 @@
+"""
+Admission control middleware.
+
+Every API request passes three checks before it reaches a route (and a
+threadpool worker):
+
+1. A token bucket per client: RATE_LIMIT_USER_RPS with bursts up to
+   RATE_LIMIT_USER_BURST, over all routes.
+2. A token bucket per client and route (method and path):
+   RATE_LIMIT_ROUTE_RPS / RATE_LIMIT_ROUTE_BURST, so one polling loop cannot
+   use up the client's whole budget.
+3. A concurrency limit of ADMISSION_MAX_CONCURRENT requests in flight, with
+   two lanes. Reads (GET) may only fill ADMISSION_READ_SHARE of it and are
+   shed at once when their lane or the whole limit is full. Writes (POST,
+   PUT, DELETE) may use the whole limit and, when it is full, queue for up to
+   ADMISSION_WRITE_WAIT_MS; a freed slot goes to a queued write before any
+   new read. Order creation and message posting therefore stay fast while
+   polling reads are being shed.
+
+Rejected requests get 429 with Retry-After. The client is the user of a
+valid bearer token, else the peer address. Identity query parameters are
+not used: a caller could change them on every request to get a fresh
+bucket. Behind a proxy, run uvicorn with --proxy-headers (and
+--forwarded-allow-ips) so the peer address is the real client's.
+
+All state lives on the event loop thread and is only touched between
+awaits, so it needs no locks. Counts are exported as
+kaution_admission_* metrics.
+"""
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.core.security import InvalidTokenError, verify_access_token
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+import asyncio
+import json
+import math
+import time
+
+READ, WRITE = 'read', 'write'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# Not limited at all
+EXEMPT_PREFIXES = ('/health', '/metrics', '/admin', '/docs', '/openapi.json', '/redoc')
+# Long-running streams would hold a slot for their whole duration; they are only rate limited
+UNLIMITED_CONCURRENCY_PATHS = ('/api/orders/export', '/api/orders/bulk')
+
+# Drop idle buckets once this many clients/routes are tracked
+MAX_BUCKETS = 50000
+
+ADMITTED = Counter(
+    "kaution_admission_admitted_total",
+    "Requests admitted by lane",
+    ("lane",)
+)
+REJECTED = Counter(
+    "kaution_admission_rejected_total",
+    "Requests rejected with 429 by lane and reason (user_rate, route_rate, overload)",
+    ("lane", "reason")
+)
+# Lanes of the app's middleware instance, for the gauge
+_lanes: list = [None]
+IN_FLIGHT = Gauge(
+    "kaution_admission_in_flight",
+    "Admitted requests in flight by lane",
+    ("lane",),
+    callback=lambda: {(lane,): count for lane, count in _lanes[0].in_flight.items()} if _lanes[0] else {}
+)
+WRITE_WAIT = Histogram(
+    "kaution_admission_write_wait_seconds",
+    "Time writes waited for a concurrency slot",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+class TokenBuckets:
+    """Token buckets by key; tokens refill continuously at rate up to burst"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Tuple, list] = {}  # key -> [tokens, last refill]
+
+    def take(self, key: Tuple, now: float) -> float:
+        """Take a token; 0 if there was one, else the seconds until there is"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to be full again carries no state
+        refill = self.burst / self.rate
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < refill}
+
+
+class Lanes:
+    """In-flight requests per lane and the queue of writes waiting for a slot"""
+
+    def __init__(self, limit: int, read_share: float):
+        self.limit = limit
+        self.read_limit = max(1, int(limit * read_share))
+        self.in_flight = {READ: 0, WRITE: 0}
+        self.waiting: Deque[asyncio.Future] = deque()
+
+    @property
+    def total(self) -> int:
+        return self.in_flight[READ] + self.in_flight[WRITE]
+
+    def try_acquire(self, lane: str) -> bool:
+        if self.total >= self.limit:
+            return False
+        if lane == READ and (self.in_flight[READ] >= self.read_limit or self.waiting):
+            return False
+        self.in_flight[lane] += 1
+        return True
+
+    async def acquire_write(self, timeout: float) -> bool:
+        """Queue a write for a slot; False if none came free in time"""
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiting.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Client gone or shutting down: leave the queue, and give back a slot release() already granted
+            if waiter.done():
+                self.release(WRITE)
+            else:
+                waiter.cancel()
+                self.waiting.remove(waiter)
+            raise
+        if waiter.done():
+            return True  # release() counted the slot for us
+        waiter.cancel()
+        self.waiting.remove(waiter)
+        return False
+
+    def release(self, lane: str):
+        self.in_flight[lane] -= 1
+        # Hand the slot straight to the oldest queued write
+        while self.waiting and self.total < self.limit:
+            waiter = self.waiting.popleft()
+            if not waiter.done():
+                self.in_flight[WRITE] += 1
+                waiter.set_result(True)
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; sits inside CORS so 429s carry CORS headers"""
+
+    def __init__(self, app):
+        self.app = app
+        self.user_buckets = TokenBuckets(settings.RATE_LIMIT_USER_RPS, settings.RATE_LIMIT_USER_BURST)
+        self.route_buckets = TokenBuckets(settings.RATE_LIMIT_ROUTE_RPS, settings.RATE_LIMIT_ROUTE_BURST)
+        self.lanes = Lanes(settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_READ_SHARE)
+        _lanes[0] = self.lanes
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.ADMISSION_ENABLED
+            or scope["method"] == "OPTIONS"
+            or scope["path"].startswith(EXEMPT_PREFIXES)
+            or scope["path"] == "/"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        lane = WRITE if scope["method"] in WRITE_METHODS else READ
+        if settings.RATE_LIMIT_ENABLED:
+            now = time.monotonic()
+            client = _client(scope)
+            wait = self.user_buckets.take((client,), now)
+            if wait:
+                REJECTED.inc(lane=lane, reason="user_rate")
+                await _too_many(send, wait, "Too many requests, please slow down")
+                return
+            wait = self.route_buckets.take((client, scope["method"], scope["path"]), now)
+            if wait:
+                REJECTED.inc(lane=lane, reason="route_rate")
+                await _too_many(send, wait, "Too many requests for this resource, please slow down")
+                return
+
+        if scope["path"].startswith(UNLIMITED_CONCURRENCY_PATHS):
+            ADMITTED.inc(lane=lane)
+            await self.app(scope, receive, send)
+            return
+
+        admitted = self.lanes.try_acquire(lane)
+        if not admitted and lane == WRITE:
+            started = time.perf_counter()
+            admitted = await self.lanes.acquire_write(settings.ADMISSION_WRITE_WAIT_MS / 1000)
+            WRITE_WAIT.observe(time.perf_counter() - started)
+        if not admitted:
+            REJECTED.inc(lane=lane, reason="overload")
+            await _too_many(send, 1.0, "Server is busy, please retry")
+            return
+        ADMITTED.inc(lane=lane)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lanes.release(lane)
+
+
+def _client(scope) -> str:
+    """The user of a valid bearer token, else the peer address"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return verify_access_token(token.strip()).email.lower()
+                except InvalidTokenError:
+                    pass
+            break
+    peer = scope.get("client")
+    return peer[0] if peer else "-"
+
+
+async def _too_many(send, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,63 @@
+"""
+Request metrics middleware.
+
+Opens a RequestContext for every HTTP request (with its deadline), records
+per-route latency and DynamoDB call counts, and logs slow requests with their
+DynamoDB breakdown.
+"""
+from app.core import deadlines
+from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUEST_DYNAMODB_CALLS
+from app.core.request_context import (
+    RequestContext,
+    set_request_context,
+    reset_request_context,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware so streaming responses are not buffered"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestContext(method=scope["method"], path=scope["path"], scope=scope)
+        deadlines.start(context, scope.get("headers") or [])
+        token = set_request_context(context)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_context(token)
+            self._observe(context, status["code"])
+
+    @staticmethod
+    def _observe(context: RequestContext, status_code: int):
+        elapsed = context.elapsed()
+        route = context.route
+        HTTP_REQUEST_DURATION.observe(
+            elapsed, method=context.method, route=route, status=str(status_code)
+        )
+        HTTP_REQUEST_DYNAMODB_CALLS.observe(
+            context.dynamodb_calls, method=context.method, route=route
+        )
+        if elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            logger.warning(
+                f"Slow request {context.method} {context.path} ({route}) -> {status_code} "
+                f"in {elapsed * 1000:.0f}ms; {context.dynamodb_calls} DynamoDB calls, "
+                f"{context.consumed_capacity:g} capacity units: {context.breakdown()}"
+            )
@@ -0,0 +1,36 @@
+"""
+Profiling trigger middleware.
+
+Marks the current request for profiling when it carries the profiling secret
+in the X-Profile header, or when it falls into the sampled fraction of
+traffic. The actual sampling happens around the endpoint (see app.api.routing).
+"""
+from app.core.config import settings
+from app.core.request_context import get_request_context
+import hmac
+import random
+
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self._should_profile(scope):
+            context = get_request_context()
+            if context is not None:
+                context.profiled = True
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _should_profile(scope) -> bool:
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+        if not settings.PROFILING_SECRET:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, settings.PROFILING_SECRET.encode())
+        return False
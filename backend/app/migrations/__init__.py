@@ -0,0 +1 @@
+# Versioned schema and data migrations (run with python -m app.scripts.migrate)
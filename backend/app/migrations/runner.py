@@ -0,0 +1,252 @@
+"""
+Versioned migration runner.
+
+Migrations are applied in id order and recorded in the schema_migrations
+table. One item per migration holds its status and the checkpoints of its
+backfills. A lease-based lock item ('~lock') keeps two runners from
+working at the same time. A runner that died leaves the lock to expire, and
+the next run resumes the interrupted migration from its checkpoints.
+"""
+from app.core.database import get_dynamodb_resource
+from app.migrations.backfill import Backfill
+from app.utils.dynamodb import format_datetime
+from botocore.exceptions import ClientError
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = 'schema_migrations'
+LOCK_ID = '~lock'
+
+
+class MigrationError(Exception):
+    """Raised when migrations cannot run (lock held, unknown ids, ...)"""
+
+
+class Migration:
+    """Base class for migrations; subclasses set id/description and implement up()"""
+
+    id: str = ""
+    description: str = ""
+
+    def up(self, ctx: "MigrationContext"):
+        raise NotImplementedError
+
+
+class MigrationStore:
+    """Reads and writes the schema_migrations table"""
+
+    @property
+    def table(self):
+        # Resources are per thread; backfill workers save checkpoints concurrently
+        return get_dynamodb_resource().Table(TABLE_NAME)
+
+    def get(self, migration_id: str) -> Optional[Dict[str, Any]]:
+        return self.table.get_item(Key={'id': migration_id}, ConsistentRead=True).get('Item')
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        records, kwargs = {}, {'ConsistentRead': True}
+        while True:
+            response = self.table.scan(**kwargs)
+            for item in response.get('Items', []):
+                if item['id'] != LOCK_ID:
+                    records[item['id']] = item
+            if 'LastEvaluatedKey' not in response:
+                return records
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def mark_running(self, migration: Migration):
+        now = format_datetime(datetime.utcnow())
+        self.table.update_item(
+            Key={'id': migration.id},
+            UpdateExpression=(
+                'SET #status = :running, #description = :description, '
+                'started_at = if_not_exists(started_at, :now), checkpoints = if_not_exists(checkpoints, :empty) '
+                'REMOVE #error'
+            ),
+            ExpressionAttributeNames={'#status': 'status', '#description': 'description', '#error': 'error'},
+            ExpressionAttributeValues={
+                ':running': 'running', ':description': migration.description, ':now': now, ':empty': {}
+            }
+        )
+
+    def mark_applied(self, migration: Migration, duration: float):
+        self.table.update_item(
+            Key={'id': migration.id},
+            UpdateExpression='SET #status = :applied, applied_at = :now, duration_s = :duration',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':applied': 'applied',
+                ':now': format_datetime(datetime.utcnow()),
+                ':duration': str(round(duration, 3)),
+            }
+        )
+
+    def mark_failed(self, migration: Migration, error: BaseException):
+        self.table.update_item(
+            Key={'id': migration.id},
+            UpdateExpression='SET #status = :failed, #error = :error',
+            ExpressionAttributeNames={'#status': 'status', '#error': 'error'},
+            ExpressionAttributeValues={':failed': 'failed', ':error': str(error)[:1000]}
+        )
+
+    def start_backfill(self, migration_id: str, step: str, segments: int) -> Dict[str, Any]:
+        """Create the checkpoint of a backfill step unless it exists; returns it"""
+        initial = {
+            'total_segments': segments,
+            'segments': {str(segment): {'done': False} for segment in range(segments)},
+        }
+        try:
+            self.table.update_item(
+                Key={'id': migration_id},
+                UpdateExpression='SET checkpoints.#step = :initial',
+                ConditionExpression='attribute_not_exists(checkpoints.#step)',
+                ExpressionAttributeNames={'#step': step},
+                ExpressionAttributeValues={':initial': initial}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        state = self.get(migration_id)['checkpoints'][step]
+        state['total_segments'] = int(state['total_segments'])
+        return state
+
+    def save_position(self, migration_id: str, step: str, segment: int, last_key, done: bool = False):
+        position = {'done': done}
+        if last_key:
+            position['last_key'] = last_key
+        self.table.update_item(
+            Key={'id': migration_id},
+            UpdateExpression='SET checkpoints.#step.#segments.#segment = :position',
+            ExpressionAttributeNames={'#step': step, '#segments': 'segments', '#segment': str(segment)},
+            ExpressionAttributeValues={':position': position}
+        )
+
+    def acquire_lock(self, owner: str, lease_seconds: int) -> bool:
+        now = time.time()
+        try:
+            self.table.put_item(
+                Item={'id': LOCK_ID, 'owner': owner, 'expires_at': int(now + lease_seconds)},
+                ConditionExpression='attribute_not_exists(id) OR expires_at < :now OR #owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':now': int(now), ':owner': owner}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def release_lock(self, owner: str):
+        try:
+            self.table.delete_item(
+                Key={'id': LOCK_ID},
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':owner': owner}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+class MigrationContext:
+    """What a migration's up() can use"""
+
+    def __init__(self, store: MigrationStore, migration: Migration, segments: int, rate: float):
+        self.store = store
+        self.migration = migration
+        self.segments = segments
+        self.rate = rate
+
+    def backfill(
+        self,
+        step: str,
+        table_name: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        segments: Optional[int] = None,
+        rate: Optional[float] = None,
+        **scan_kwargs
+    ) -> int:
+        """Run fn on every (filtered) item of a table; resumable by step name"""
+        return Backfill(
+            self.store, self.migration.id, step, table_name, fn,
+            segments=segments or self.segments,
+            rate=self.rate if rate is None else rate,
+            **scan_kwargs
+        ).run()
+
+
+class MigrationRunner:
+    """Applies pending migrations in order"""
+
+    def __init__(self, migrations: List[Migration], segments: int = 4, rate: float = 100, lease_seconds: int = 60):
+        ids = [m.id for m in migrations]
+        if len(set(ids)) != len(ids):
+            raise MigrationError("Duplicate migration ids")
+        self.migrations = sorted(migrations, key=lambda m: m.id)
+        self.segments = segments
+        self.rate = rate
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.store = MigrationStore()
+
+    def status(self) -> List[Dict[str, Any]]:
+        records = self.store.all()
+        return [
+            {
+                'id': m.id,
+                'description': m.description,
+                'status': records.get(m.id, {}).get('status', 'pending'),
+                'applied_at': records.get(m.id, {}).get('applied_at'),
+            }
+            for m in self.migrations
+        ]
+
+    def pending(self) -> List[Migration]:
+        records = self.store.all()
+        return [m for m in self.migrations if records.get(m.id, {}).get('status') != 'applied']
+
+    def run(self, target: Optional[str] = None) -> List[str]:
+        """Apply pending migrations up to and including target; returns applied ids"""
+        if target and target not in {m.id for m in self.migrations}:
+            raise MigrationError(f"Unknown migration: {target}")
+        if not self.store.acquire_lock(self.owner, self.lease_seconds):
+            raise MigrationError("Another migration runner holds the lock")
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_lock, args=(stop,), daemon=True)
+        heartbeat.start()
+        applied = []
+        try:
+            for migration in self.pending():
+                if target and migration.id > target:
+                    break
+                logger.info(f"Applying migration {migration.id}: {migration.description}")
+                self.store.mark_running(migration)
+                started = time.perf_counter()
+                try:
+                    migration.up(MigrationContext(self.store, migration, self.segments, self.rate))
+                except Exception as e:
+                    logger.error(f"Migration {migration.id} failed: {e}")
+                    self.store.mark_failed(migration, e)
+                    raise
+                self.store.mark_applied(migration, time.perf_counter() - started)
+                applied.append(migration.id)
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.store.release_lock(self.owner)
+        return applied
+
+    def _renew_lock(self, stop: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.store.acquire_lock(self.owner, self.lease_seconds):
+                logger.error("Lost the migration lock")
+                return
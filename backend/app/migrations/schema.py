@@ -0,0 +1,103 @@
+"""
+Online schema changes: add and drop global secondary indexes of existing tables.
+
+Creating a GSI on a live table does not block reads or writes; DynamoDB
+backfills the index in the background. The helpers wait until the index is
+ACTIVE so a migration can rely on it afterwards. Dropping one only stops its
+storage and write costs; nothing may query it any more.
+"""
+from app.core.database import get_dynamodb_client
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_index(table_name: str, index_name: str, timeout: float = 3600, poll_interval: float = 5.0):
+    """Block until the index (and its backfill) is ACTIVE"""
+    client = get_dynamodb_client()
+    deadline = time.monotonic() + timeout
+    while True:
+        table = client.describe_table(TableName=table_name)['Table']
+        index = next(
+            (i for i in table.get('GlobalSecondaryIndexes', []) if i['IndexName'] == index_name), None
+        )
+        if index is None:
+            raise ValueError(f"Index {index_name} does not exist on {table_name}")
+        if index.get('IndexStatus', 'ACTIVE') == 'ACTIVE' and not index.get('Backfilling'):
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Index {index_name} on {table_name} is still {index.get('IndexStatus')}")
+        time.sleep(poll_interval)
+
+
+def ensure_gsi(
+    table_name: str,
+    index_name: str,
+    key_schema: List[Dict[str, str]],
+    attribute_definitions: List[Dict[str, str]],
+    projection: Optional[Dict[str, Any]] = None,
+    wait: bool = True
+) -> bool:
+    """Create a GSI unless it exists; returns True when it was created
+
+    key_schema/attribute_definitions use the CreateTable format, e.g.
+    [{'AttributeName': 'status_key', 'KeyType': 'HASH'}] and
+    [{'AttributeName': 'status_key', 'AttributeType': 'S'}].
+    """
+    client = get_dynamodb_client()
+    table = client.describe_table(TableName=table_name)['Table']
+    existing = {i['IndexName'] for i in table.get('GlobalSecondaryIndexes', [])}
+    created = index_name not in existing
+    if created:
+        create = {
+            'IndexName': index_name,
+            'KeySchema': key_schema,
+            'Projection': projection or {'ProjectionType': 'ALL'},
+        }
+        if table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+            throughput = table.get('ProvisionedThroughput', {})
+            create['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': throughput.get('ReadCapacityUnits') or 5,
+                'WriteCapacityUnits': throughput.get('WriteCapacityUnits') or 5,
+            }
+        logger.info(f"Creating index {index_name} on {table_name}")
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=attribute_definitions,
+            GlobalSecondaryIndexUpdates=[{'Create': create}]
+        )
+    if wait:
+        wait_for_index(table_name, index_name)
+    return created
+
+
+def drop_gsi(table_name: str, index_name: str, wait: bool = True) -> bool:
+    """Delete a GSI if it exists; returns True when it was deleted"""
+    client = get_dynamodb_client()
+    table = client.describe_table(TableName=table_name)['Table']
+    existing = {i['IndexName'] for i in table.get('GlobalSecondaryIndexes', [])}
+    if index_name not in existing:
+        return False
+    logger.info(f"Deleting index {index_name} on {table_name}")
+    client.update_table(
+        TableName=table_name,
+        GlobalSecondaryIndexUpdates=[{'Delete': {'IndexName': index_name}}]
+    )
+    if wait:
+        wait_for_index_deleted(table_name, index_name)
+    return True
+
+
+def wait_for_index_deleted(table_name: str, index_name: str, timeout: float = 3600, poll_interval: float = 5.0):
+    """Block until the index is gone (DynamoDB allows one GSI deletion per update at a time)"""
+    client = get_dynamodb_client()
+    deadline = time.monotonic() + timeout
+    while True:
+        table = client.describe_table(TableName=table_name)['Table']
+        if all(i['IndexName'] != index_name for i in table.get('GlobalSecondaryIndexes', [])):
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Index {index_name} on {table_name} is still being deleted")
+        time.sleep(poll_interval)
@@ -0,0 +1,16 @@
+# Registered migrations, applied in id order
+from app.migrations.versions import (
+    m0001_order_version,
+    m0002_status_indexes,
+    m0003_chat_read_cursors,
+    m0004_participant_shard_indexes,
+    m0005_drop_participant_indexes,
+)
+
+MIGRATIONS = [
+    m0001_order_version.migration,
+    m0002_status_indexes.migration,
+    m0003_chat_read_cursors.migration,
+    m0004_participant_shard_indexes.migration,
+    m0005_drop_participant_indexes.migration,
+]
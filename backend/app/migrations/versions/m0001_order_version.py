@@ -0,0 +1,39 @@
+"""
+Give every order a version attribute (orders written before it existed start at 1).
+"""
+from app.core.database import get_dynamodb_resource
+from app.migrations.runner import Migration
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+
+class AddOrderVersion(Migration):
+    id = "0001_order_version"
+    description = "Backfill version=1 on orders without a version"
+
+    def up(self, ctx):
+        ctx.backfill(
+            "orders",
+            "orders",
+            self.set_version,
+            FilterExpression=Attr('version').not_exists(),
+            ProjectionExpression='id'
+        )
+
+    @staticmethod
+    def set_version(item):
+        try:
+            get_dynamodb_resource().Table('orders').update_item(
+                Key={'id': item['id']},
+                UpdateExpression='SET #version = :one',
+                # Skip orders deleted or already versioned since the scan saw them
+                ConditionExpression='attribute_exists(id) AND attribute_not_exists(#version)',
+                ExpressionAttributeNames={'#version': 'version'},
+                ExpressionAttributeValues={':one': 1}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+migration = AddOrderVersion()
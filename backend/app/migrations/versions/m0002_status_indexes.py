@@ -0,0 +1,80 @@
+"""
+Sparse per-participant status indexes and the user_counters table contents.
+
+Open orders get "<email>#<status>" keys for each participant role; completed
+orders carry none, so they never enter the indexes. Counters are rebuilt from
+a full scan once the keys are in place.
+"""
+from app.core.database import get_dynamodb_resource
+from app.migrations.runner import Migration
+from app.migrations.schema import ensure_gsi
+from app.repositories.order_repository import (
+    OPEN_STATUSES,
+    PARTICIPANT_INDEXES,
+    STATUS_INDEXES,
+    STATUS_KEY_ATTRIBUTES,
+    status_key,
+)
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+
+class AddStatusIndexes(Migration):
+    id = "0002_status_indexes"
+    description = "Add sparse participant status indexes and recount user counters"
+
+    def up(self, ctx):
+        for role, index_name in STATUS_INDEXES.items():
+            attribute = STATUS_KEY_ATTRIBUTES[role]
+            ensure_gsi(
+                "orders",
+                index_name,
+                [
+                    {'AttributeName': attribute, 'KeyType': 'HASH'},
+                    {'AttributeName': 'created_at', 'KeyType': 'RANGE'},
+                ],
+                [
+                    {'AttributeName': attribute, 'AttributeType': 'S'},
+                    {'AttributeName': 'created_at', 'AttributeType': 'S'},
+                ],
+            )
+        ctx.backfill(
+            "status_keys",
+            "orders",
+            self.set_status_keys,
+            FilterExpression=(
+                Attr('status').is_in([status.value for status in OPEN_STATUSES])
+                & Attr('agent_status_key').not_exists()
+            ),
+            ProjectionExpression='id, #status, created_by, renter_email, landlord_email',
+            ExpressionAttributeNames={'#status': 'status'}
+        )
+        from app.services.order_service import OrderService
+        OrderService.recount_counters(segments=ctx.segments)
+
+    @staticmethod
+    def set_status_keys(item):
+        participants = {role: item[attribute] for role, (_, attribute) in PARTICIPANT_INDEXES.items()}
+        names = {'#status': 'status'}
+        values = {':status': item['status']}
+        assignments = []
+        for role, email in participants.items():
+            attribute = STATUS_KEY_ATTRIBUTES[role]
+            names[f'#{attribute}'] = attribute
+            values[f':{attribute}'] = status_key(email, item['status'])
+            assignments.append(f'#{attribute} = :{attribute}')
+        try:
+            get_dynamodb_resource().Table('orders').update_item(
+                Key={'id': item['id']},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                # Skip orders deleted or moved on since the scan saw them
+                ConditionExpression='attribute_exists(id) AND #status = :status',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+migration = AddStatusIndexes()
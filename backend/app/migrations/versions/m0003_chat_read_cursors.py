@@ -0,0 +1,45 @@
+"""
+Give every chat room a message_count, an empty read_cursors map and a version.
+
+Room summaries are read without the message history, so they need the stored
+count; read cursors are set as nested map entries, which needs the map.
+"""
+from app.core.database import get_dynamodb_resource
+from app.migrations.runner import Migration
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+
+class AddChatReadCursors(Migration):
+    id = "0003_chat_read_cursors"
+    description = "Backfill message_count, read_cursors and version on chat rooms"
+
+    def up(self, ctx):
+        ctx.backfill(
+            "chat_rooms",
+            "chat_rooms",
+            self.set_counts,
+            FilterExpression=Attr('message_count').not_exists(),
+            ProjectionExpression='order_id, messages'
+        )
+
+    @staticmethod
+    def set_counts(item):
+        try:
+            get_dynamodb_resource().Table('chat_rooms').update_item(
+                Key={'order_id': item['order_id']},
+                UpdateExpression=(
+                    'SET message_count = :count, read_cursors = if_not_exists(read_cursors, :empty), '
+                    '#version = if_not_exists(#version, :one)'
+                ),
+                # Rooms written since the scan already carry the fields
+                ConditionExpression='attribute_exists(order_id) AND attribute_not_exists(message_count)',
+                ExpressionAttributeNames={'#version': 'version'},
+                ExpressionAttributeValues={':count': len(item.get('messages', [])), ':empty': {}, ':one': 1}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+migration = AddChatReadCursors()
@@ -0,0 +1,75 @@
+"""
+Write-sharded participant indexes.
+
+Every order gets a "<email>" (or "<email>#<shard>") key per participant
+role, indexed with created_at as range key. Users listed in
+PARTICIPANT_INDEX_SHARDS spread their orders over several keys, so a large
+agency's writes and queries no longer land on one index partition.
+
+The unsharded participant indexes stay in place; nothing reads them any more.
+"""
+from app.core.database import get_dynamodb_resource
+from app.migrations.runner import Migration
+from app.migrations.schema import ensure_gsi
+from app.repositories.order_repository import (
+    PARTICIPANT_INDEXES,
+    SHARD_INDEXES,
+    SHARD_KEY_ATTRIBUTES,
+    shard_for,
+    sharded_key,
+)
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+
+class AddParticipantShardIndexes(Migration):
+    id = "0004_participant_shard_indexes"
+    description = "Add write-sharded participant indexes and backfill their keys"
+
+    def up(self, ctx):
+        for role, index_name in SHARD_INDEXES.items():
+            attribute = SHARD_KEY_ATTRIBUTES[role]
+            ensure_gsi(
+                "orders",
+                index_name,
+                [
+                    {'AttributeName': attribute, 'KeyType': 'HASH'},
+                    {'AttributeName': 'created_at', 'KeyType': 'RANGE'},
+                ],
+                [
+                    {'AttributeName': attribute, 'AttributeType': 'S'},
+                    {'AttributeName': 'created_at', 'AttributeType': 'S'},
+                ],
+            )
+        ctx.backfill(
+            "shard_keys",
+            "orders",
+            self.set_shard_keys,
+            FilterExpression=Attr('agent_shard_key').not_exists(),
+            ProjectionExpression='id, created_by, renter_email, landlord_email'
+        )
+
+    @staticmethod
+    def set_shard_keys(item):
+        names, values, assignments = {}, {}, []
+        for role, (_, email_attribute) in PARTICIPANT_INDEXES.items():
+            attribute = SHARD_KEY_ATTRIBUTES[role]
+            email = item[email_attribute]
+            names[f'#{attribute}'] = attribute
+            values[f':{attribute}'] = sharded_key(email, shard_for(item['id'], email))
+            assignments.append(f'#{attribute} = :{attribute}')
+        try:
+            get_dynamodb_resource().Table('orders').update_item(
+                Key={'id': item['id']},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                # Orders written since the scan already carry the keys
+                ConditionExpression='attribute_exists(id) AND attribute_not_exists(agent_shard_key)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+migration = AddParticipantShardIndexes()
@@ -0,0 +1,25 @@
+"""
+Drop the unsharded participant indexes.
+
+Since 0004 order lists read the write-sharded participant indexes, and
+nothing queries created-by-index, renter-email-index or
+landlord-email-index any more. They still cost storage and a write per
+order change, so they are deleted one after the other (DynamoDB runs one
+index deletion per table at a time). Deploy the code that reads the
+sharded indexes before running this.
+"""
+from app.migrations.runner import Migration
+from app.migrations.schema import drop_gsi
+from app.repositories.order_repository import PARTICIPANT_INDEXES
+
+
+class DropParticipantIndexes(Migration):
+    id = "0005_drop_participant_indexes"
+    description = "Drop the unsharded participant indexes that nothing reads"
+
+    def up(self, ctx):
+        for index_name, _ in PARTICIPANT_INDEXES.values():
+            drop_gsi("orders", index_name)
+
+
+migration = DropParticipantIndexes()
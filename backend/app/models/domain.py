@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from .enums import UserRole, OrderStatus, ProgressStageType
+from pydantic import BaseModel, EmailStr, PrivateAttr, TypeAdapter, model_validator
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple
+from app.utils.dynamodb import decompress_value
+from .enums import UserRole, OrderStatus, ProgressStageType, NotificationType
 
 
 # Embedded models (not separate tables)
@@ -26,13 +27,97 @@ class ChatMessage(BaseModel):
     timestamp: str  # ISO format string
 
 
-class ChatRoom(BaseModel):
+class LazyModel(BaseModel):
+    """Model whose heavy nested collections are parsed on first access
+
+    from_item() validates the scalar attributes of a stored item and keeps
+    the collections named in _lazy_parsers as raw attributes. Reading such a
+    field (or dumping the model) parses it once; a handler that never
+    touches it never pays for it (nor for decompressing it).
+    """
+    # Stored compressed when large (app.utils.dynamodb)
+    compressed_attributes: ClassVar[Tuple[str, ...]] = ()
+    _lazy_parsers: ClassVar[Dict[str, Callable[[Any], Any]]] = {}
+    _raw: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]):
+        raw = {name: item[name] for name in cls._lazy_parsers if item.get(name) is not None}
+        model = cls.model_validate({
+            key: decompress_value(value) if key in cls.compressed_attributes else value
+            for key, value in item.items() if key not in raw
+        })
+        for name in raw:
+            del model.__dict__[name]
+        model._raw = raw
+        return model
+
+    def __getattr__(self, name: str) -> Any:
+        private = object.__getattribute__(self, '__pydantic_private__')
+        raw = private.get('_raw') if private else None
+        if raw and name in raw:
+            return self._hydrate(name)
+        return super().__getattr__(name)
+
+    def _hydrate(self, name: str) -> Any:
+        raw = self._raw
+        value = self._lazy_parsers[name](decompress_value(raw[name]))
+        self.__dict__[name] = value
+        self.__pydantic_fields_set__.add(name)
+        # A new dict: shallow copies share the old one
+        self._raw = {key: item for key, item in raw.items() if key != name}
+        return value
+
+    def _hydrate_all(self, exclude: Any = None):
+        for name in list(self._raw):
+            if name in self.__dict__:
+                continue  # Assigned since; the raw value is outdated
+            if isinstance(exclude, dict) and exclude.get(name) is True or isinstance(exclude, (set, list, tuple)) and name in exclude:
+                continue  # Left out of the dump anyway
+            self._hydrate(name)
+
+    def model_dump(self, **kwargs) -> Dict[str, Any]:
+        self._hydrate_all(kwargs.get('exclude'))
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        self._hydrate_all(kwargs.get('exclude'))
+        return super().model_dump_json(**kwargs)
+
+
+_messages = TypeAdapter(List[ChatMessage])
+_progress_stages = TypeAdapter(List[ProgressStage])
+
+
+class ChatRoom(LazyModel):
+    compressed_attributes: ClassVar[Tuple[str, ...]] = ('messages',)
+
     order_id: str
     participants: List[ChatParticipant] = []
     messages: List[ChatMessage] = []
+    message_count: int = 0  # Kept with the messages, so summaries can be read without them
+    read_cursors: Dict[str, int] = {}  # Participant email -> number of messages read
+    version: int = 1  # Rooms written before versioning count as version 1
     created_at: str  # ISO format string
     updated_at: str  # ISO format string
 
+    @model_validator(mode='after')
+    def _count_messages(self):
+        # Rooms written before message_count existed
+        if len(self.messages) > self.message_count:
+            self.message_count = len(self.messages)
+        return self
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "ChatRoom":
+        room = super().from_item(item)
+        if isinstance(room._raw.get('messages'), list):
+            room.message_count = max(room.message_count, len(room._raw['messages']))
+        return room
+
+    def unread_for(self, email: str) -> int:
+        return max(self.message_count - self.read_cursors.get(email, 0), 0)
+
 
 # Main domain models
 class User(BaseModel):
@@ -43,7 +128,9 @@ class User(BaseModel):
     updated_at: str  # ISO format string
 
 
-class Order(BaseModel):
+class Order(LazyModel):
+    compressed_attributes: ClassVar[Tuple[str, ...]] = ('description', 'chat_room')
+
     id: str
     title: str
     renter_email: EmailStr
@@ -55,6 +142,22 @@ class Order(BaseModel):
     created_by: EmailStr
     progress_stages: List[ProgressStage] = []
     chat_room: Optional[ChatRoom] = None
+    version: int = 1  # Backfilled for older orders by migration 0001
     created_at: str  # ISO format string
     updated_at: str  # ISO format string
+    archived_at: Optional[str] = None  # Set on the stub left in the orders table; the full order is in the cold store
+
 
+ChatRoom._lazy_parsers = {'messages': _messages.validate_python}
+Order._lazy_parsers = {'progress_stages': _progress_stages.validate_python, 'chat_room': ChatRoom.from_item}
+
+
+class Notification(BaseModel):
+    id: str  # Time ordered; taken from the change event that caused it
+    recipient_email: EmailStr
+    recipient_role: UserRole
+    type: NotificationType
+    order_id: str
+    text: str
+    actor_email: Optional[str] = None
+    created_at: str  # ISO format string
@@ -20,3 +20,21 @@ class ProgressStageType(str, Enum):
     DEPOSIT_HELD = "deposit_held"
     COMPLETED = "completed"
 
+
+
+class EntityType(str, Enum):
+    ORDER = "order"
+    USER = "user"
+    CHAT_ROOM = "chat_room"
+
+
+class ChangeType(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+class NotificationType(str, Enum):
+    MESSAGE = "message"
+    STATUS_CHANGED = "status_changed"
+    STAGE_COMPLETED = "stage_completed"
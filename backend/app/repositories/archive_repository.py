@@ -0,0 +1,42 @@
+from app.core.cold_store import get_cold_store
+from app.models.domain import ChatRoom, Order
+from app.utils.dynamodb import pack, unpack
+from typing import Optional
+
+# Version of the archived document layout
+ARCHIVE_FORMAT = 1
+
+
+def archive_key(order_id: str) -> str:
+    # Spread over directories (or S3 key ranges) by the ID's last characters
+    return f"orders/{order_id[-2:]}/{order_id}.kz"
+
+
+class ArchiveRepository:
+    """Repository for archived orders in the cold store
+
+    One compressed blob per order (app.utils.dynamodb.pack) holding the full
+    order with its chat room, messages included, in place of the embedded copy.
+    """
+
+    @staticmethod
+    def put(order: Order, chat_room: Optional[ChatRoom]):
+        document = order.model_dump(mode='json', exclude={'chat_room'}, exclude_none=True)
+        if chat_room is not None:
+            document['chat_room'] = chat_room.model_dump(mode='json', exclude_none=True)
+        get_cold_store().put(archive_key(order.id), pack({'format': ARCHIVE_FORMAT, 'order': document}))
+
+    @staticmethod
+    def find(order_id: str) -> Optional[Order]:
+        """The archived order with its chat room, or None if it is not in the cold store"""
+        data = get_cold_store().get(archive_key(order_id))
+        if data is None:
+            return None
+        document = unpack(data)
+        if document.get('format') != ARCHIVE_FORMAT:
+            raise ValueError(f"Unknown archive format {document.get('format')} for order {order_id}")
+        return Order.from_item(document['order'])
+
+    @staticmethod
+    def delete(order_id: str):
+        get_cold_store().delete(archive_key(order_id))
@@ -1,7 +1,24 @@
+from app.core import events as change_events
+from app.core.config import settings
 from app.core.database import get_dynamodb_resource
-from app.models.domain import ChatRoom
-from app.utils.dynamodb import to_dynamodb_dict
-from typing import List, Optional
+from app.core.events import ChangeEvent
+from app.core.hedging import hedged
+from app.core.singleflight import reads
+from app.models.domain import ChatMessage, ChatRoom
+from app.models.enums import EntityType
+from app.utils import transactions
+from app.utils.dynamodb import decompress_value, to_dynamodb_dict
+from app.utils.parallel_scan import parallel_scan
+from app.utils.transactions import VersionConflictError
+from botocore.exceptions import ClientError
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import time
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+
+# Everything but the message history
+SUMMARY_FIELDS = ('order_id', 'participants', 'message_count', 'read_cursors', 'version', 'created_at', 'updated_at')
 
 
 class ChatRepository:
@@ -13,30 +30,174 @@ class ChatRepository:
     
     @staticmethod
     def find_by_order_id(order_id: str) -> Optional[ChatRoom]:
-        """Find chat room by order ID"""
-        table = ChatRepository.get_table()
-        response = table.get_item(Key={'order_id': order_id})
-        if 'Item' in response:
-            return ChatRoom(**response['Item'])
+        """Find chat room by order ID (concurrent reads of the same room share one call)"""
+        def read():
+            # Hedged reads run on other threads, so each attempt takes its own thread's table
+            return hedged(
+                'GetItem', 'chat_rooms',
+                lambda: ChatRepository.get_table().get_item(Key={'order_id': order_id})
+            ).get('Item')
+        item = reads.do('chat_rooms', order_id, read)
+        if item is not None:
+            return ChatRoom.from_item(item)
         return None
     
+    @staticmethod
+    def _batch_get(order_ids: List[str], projection: str, names: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        """Chat room items by order ID (BatchGetItem), retrying unprocessed keys"""
+        resource = get_dynamodb_resource()
+        for start in range(0, len(order_ids), BATCH_GET_LIMIT):
+            request = {
+                'chat_rooms': {
+                    'Keys': [{'order_id': order_id} for order_id in order_ids[start:start + BATCH_GET_LIMIT]],
+                    'ProjectionExpression': projection
+                }
+            }
+            if names:
+                request['chat_rooms']['ExpressionAttributeNames'] = names
+            attempt = 0
+            while request:
+                response = resource.batch_get_item(RequestItems=request)
+                yield from response.get('Responses', {}).get('chat_rooms', [])
+                request = response.get('UnprocessedKeys') or {}
+                if request:
+                    attempt += 1
+                    time.sleep(min(0.05 * (2 ** attempt), 2.0))
+    
+    @staticmethod
+    def find_summaries(order_ids: Iterable[str]) -> Dict[str, ChatRoom]:
+        """Chat rooms without their messages, by order ID (BatchGetItem)"""
+        names = {f'#{field}': field for field in SUMMARY_FIELDS}
+        return {
+            item['order_id']: ChatRoom.from_item(item)
+            for item in ChatRepository._batch_get(list(dict.fromkeys(order_ids)), ', '.join(names), names)
+        }
+    
+    @staticmethod
+    def find_messages(positions: Dict[str, Iterable[int]]) -> Dict[Tuple[str, int], ChatMessage]:
+        """Single messages by (order ID, position), all rooms in one BatchGetItem
+
+        List elements cannot be projected out of a compressed history, so
+        with STORAGE_COMPRESSION_ENABLED the whole messages attribute is read
+        and decompressed; long histories are the ones stored compressed and
+        are small then. Otherwise only the requested elements are read: the
+        projection applies to every key of the batch, so each room returns
+        its elements at all requested positions it has, in index order.
+        Rooms that miss a position they should have (e.g. compressed before
+        compression was turned off) are read whole in one more batch.
+        """
+        wanted = {order_id: set(indexes) for order_id, indexes in positions.items()}
+        if settings.STORAGE_COMPRESSION_ENABLED:
+            requested, projection = None, 'order_id, messages'
+        else:
+            requested = sorted(set().union(*wanted.values())) if wanted else []
+            projection = 'order_id, ' + ', '.join(f'messages[{index}]' for index in requested)
+        messages, incomplete = {}, []
+        
+        def collect(order_id: str, found: Dict[int, Any]):
+            for index in wanted[order_id] & found.keys():
+                message = found[index]
+                messages[(order_id, index)] = message if isinstance(message, ChatMessage) else ChatMessage(**message)
+        
+        for item in ChatRepository._batch_get(list(wanted), projection):
+            order_id = item['order_id']
+            stored = decompress_value(item.get('messages', []))
+            found = dict(enumerate(stored)) if requested is None else dict(zip(requested, stored))
+            if wanted[order_id] <= found.keys():
+                collect(order_id, found)
+            else:
+                incomplete.append(order_id)
+        if incomplete:
+            for item in ChatRepository._batch_get(incomplete, 'order_id, messages'):
+                collect(item['order_id'], dict(enumerate(decompress_value(item.get('messages', [])))))
+        return messages
+    
+    @staticmethod
+    def scan_for_search(segments: int = 4, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream raw chat room items (participants, version and messages) from a parallel scan"""
+        names = {f'#{field}': field for field in ('order_id', 'participants', 'messages', 'version')}
+        return parallel_scan(
+            'chat_rooms',
+            segments=segments,
+            page_size=page_size,
+            ProjectionExpression=', '.join(names),
+            ExpressionAttributeNames=names
+        )
+    
+    @staticmethod
+    def mark_read(order_id: str, email: str, count: int) -> bool:
+        """Move a participant's read cursor forward to count; False if it already was there
+
+        Bumps the version, so a concurrent message write re-reads the room
+        instead of putting back the old cursor. No change event is emitted.
+        """
+        try:
+            ChatRepository.get_table().update_item(
+                Key={'order_id': order_id},
+                UpdateExpression='SET read_cursors.#email = :count ADD #version :one',
+                ConditionExpression=(
+                    'attribute_exists(order_id) AND '
+                    '(attribute_not_exists(read_cursors.#email) OR read_cursors.#email < :count)'
+                ),
+                ExpressionAttributeNames={'#email': email, '#version': 'version'},
+                ExpressionAttributeValues={':count': count, ':one': 1}
+            )
+            reads.forget('chat_rooms', order_id)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+    
+    @staticmethod
+    def create_write(chat_room: ChatRoom) -> Tuple[Dict[str, Any], ChangeEvent]:
+        """Transaction action and change event creating a chat room (for writes spanning tables)
+
+        The put fails if the order already has a chat room.
+        """
+        return (
+            transactions.put('chat_rooms', to_dynamodb_dict(chat_room), 'attribute_not_exists(order_id)'),
+            change_events.change(EntityType.CHAT_ROOM, chat_room.order_id, None, chat_room)
+        )
+    
+    @staticmethod
+    def delete_write(chat_room: ChatRoom, check_version: bool = False) -> Tuple[Dict[str, Any], ChangeEvent]:
+        """Transaction action and change event deleting a chat room (only at its version, if check_version)"""
+        condition, names, values = transactions.version_condition(chat_room.version if check_version else None, 'order_id')
+        return (
+            transactions.delete('chat_rooms', {'order_id': chat_room.order_id}, condition, names, values),
+            change_events.change(EntityType.CHAT_ROOM, chat_room.order_id, chat_room, None)
+        )
+    
     @staticmethod
     def create(chat_room: ChatRoom) -> ChatRoom:
         """Create a new chat room"""
-        table = ChatRepository.get_table()
-        table.put_item(Item=to_dynamodb_dict(chat_room))
+        action, event = ChatRepository.create_write(chat_room)
+        transactions.transact_write([action], events=[event])
         return chat_room
     
     @staticmethod
-    def update(chat_room: ChatRoom) -> ChatRoom:
-        """Update a chat room"""
-        table = ChatRepository.get_table()
-        table.put_item(Item=to_dynamodb_dict(chat_room))
+    def update(chat_room: ChatRoom, previous: ChatRoom) -> ChatRoom:
+        """Replace previous with chat_room, unless the stored room changed since it was read"""
+        condition, names, values = transactions.version_condition(previous.version, 'order_id')
+        try:
+            transactions.transact_write(
+                [transactions.put('chat_rooms', to_dynamodb_dict(chat_room), condition, names, values)],
+                events=[change_events.change(EntityType.CHAT_ROOM, chat_room.order_id, previous, chat_room)]
+            )
+        except transactions.TransactionConflict as e:
+            raise VersionConflictError(f"Chat room {chat_room.order_id} was modified concurrently") from e
         return chat_room
     
     @staticmethod
-    def delete(order_id: str):
+    def delete(chat_room: ChatRoom):
         """Delete a chat room"""
-        table = ChatRepository.get_table()
-        table.delete_item(Key={'order_id': order_id})
+        action, event = ChatRepository.delete_write(chat_room)
+        transactions.transact_write([action], events=[event])
+
+
+def _forget_read(event: ChangeEvent):
+    reads.forget('chat_rooms', event.key)
+
 
+change_events.subscribe(_forget_read, EntityType.CHAT_ROOM)
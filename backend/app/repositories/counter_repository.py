@@ -0,0 +1,87 @@
+from app.core.database import get_dynamodb_resource
+from app.models.enums import OrderStatus, UserRole
+from app.utils import transactions
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+TABLE_NAME = 'user_counters'
+
+# Counter attributes: one count per order status, all orders, and the deposits of open orders
+COUNTER_FIELDS = [status.value for status in OrderStatus] + ['total', 'held_deposits']
+
+CounterKey = Tuple[str, UserRole]
+
+
+class CounterRepository:
+    """Repository for materialized per-user order counters"""
+
+    @staticmethod
+    def get_table():
+        return get_dynamodb_resource().Table(TABLE_NAME)
+
+    @staticmethod
+    def find(email: str, role: UserRole) -> Dict[str, Any]:
+        """Counters of one user in one role (zeros when the user has no orders)"""
+        table = CounterRepository.get_table()
+        response = table.get_item(Key={'email': email, 'role': role.value})
+        item = response.get('Item', {})
+        counters = {field: int(item.get(field, 0)) for field in COUNTER_FIELDS if field != 'held_deposits'}
+        counters['held_deposits'] = float(item.get('held_deposits', 0))
+        return counters
+
+    @staticmethod
+    def _update_expression(delta: Dict[str, Any]):
+        fields = [field for field in COUNTER_FIELDS if delta.get(field)]
+        expression = 'ADD ' + ', '.join(f'#{field} :{field}' for field in fields)
+        names = {f'#{field}': field for field in fields}
+        values = {f':{field}': Decimal(str(delta[field])) for field in fields}
+        return expression, names, values
+
+    @staticmethod
+    def transact_updates(deltas: Dict[CounterKey, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """TransactWriteItems actions applying counter deltas with ADD"""
+        actions = []
+        for (email, role), delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            expression, names, values = CounterRepository._update_expression(delta)
+            actions.append(transactions.update(
+                TABLE_NAME, {'email': email, 'role': role.value}, expression, names, values
+            ))
+        return actions
+
+    @staticmethod
+    def apply(deltas: Dict[CounterKey, Dict[str, Any]]):
+        """Apply counter deltas with one ADD update per user (not transactional)"""
+        table = CounterRepository.get_table()
+        for (email, role), delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            expression, names, values = CounterRepository._update_expression(delta)
+            table.update_item(
+                Key={'email': email, 'role': role.value},
+                UpdateExpression=expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+
+    @staticmethod
+    def find_all_keys() -> List[CounterKey]:
+        table = CounterRepository.get_table()
+        kwargs = {'ProjectionExpression': 'email, #role', 'ExpressionAttributeNames': {'#role': 'role'}}
+        keys = []
+        while True:
+            response = table.scan(**kwargs)
+            keys.extend((item['email'], UserRole(item['role'])) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return keys
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    @staticmethod
+    def replace_all(totals: Dict[CounterKey, Dict[str, Any]]):
+        """Overwrite counters with recounted values"""
+        with CounterRepository.get_table().batch_writer() as batch:
+            for (email, role), counters in totals.items():
+                item = {'email': email, 'role': role.value}
+                item.update({field: Decimal(str(counters.get(field, 0))) for field in COUNTER_FIELDS})
+                batch.put_item(Item=item)
@@ -0,0 +1,89 @@
+from app.core.config import settings
+from app.core.database import get_dynamodb_resource
+from botocore.exceptions import ClientError
+from typing import Any, Dict, Optional
+import time
+
+TABLE_NAME = 'idempotency_keys'
+
+IN_PROGRESS, COMPLETED = 'in_progress', 'completed'
+
+
+class IdempotencyRepository:
+    """Repository for idempotency key records
+
+    One item per key: the request fingerprint, the state and, once the
+    original request finished, its response. A request claims a key with a
+    conditional put and holds it for IDEMPOTENCY_LEASE_SECONDS.
+    """
+
+    @staticmethod
+    def get_table():
+        return get_dynamodb_resource().Table(TABLE_NAME)
+
+    @staticmethod
+    def claim(key: str, fingerprint: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Claim a key for a new request; None on success, else the existing record
+
+        A key is free when it was never used, when its record expired but TTL
+        has not removed it yet, or when the lease of an unfinished request ran out.
+        """
+        now = int(time.time() * 1000)
+        try:
+            IdempotencyRepository.get_table().put_item(
+                Item={
+                    'key': key,
+                    'fingerprint': fingerprint,
+                    'state': IN_PROGRESS,
+                    'owner': owner,
+                    'lease_until': now + int(settings.IDEMPOTENCY_LEASE_SECONDS * 1000),
+                    'expires_at': now // 1000 + settings.IDEMPOTENCY_TTL_HOURS * 3600,
+                },
+                ConditionExpression=(
+                    'attribute_not_exists(#key) OR expires_at < :now_seconds '
+                    'OR (#state = :in_progress AND lease_until < :now)'
+                ),
+                ExpressionAttributeNames={'#key': 'key', '#state': 'state'},
+                ExpressionAttributeValues={':now': now, ':now_seconds': now // 1000, ':in_progress': IN_PROGRESS}
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        # Released in the meantime: an empty record, so the caller tries again
+        return IdempotencyRepository.find(key) or {}
+
+    @staticmethod
+    def find(key: str) -> Optional[Dict[str, Any]]:
+        return IdempotencyRepository.get_table().get_item(Key={'key': key}, ConsistentRead=True).get('Item')
+
+    @staticmethod
+    def complete(key: str, owner: str, response: bytes) -> bool:
+        """Store the response of a claimed key; False if the claim was lost"""
+        try:
+            IdempotencyRepository.get_table().update_item(
+                Key={'key': key},
+                UpdateExpression='SET #state = :completed, #response = :response REMOVE lease_until',
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#state': 'state', '#response': 'response', '#owner': 'owner'},
+                ExpressionAttributeValues={':completed': COMPLETED, ':response': response, ':owner': owner}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    @staticmethod
+    def release(key: str, owner: str):
+        """Give up a claimed key (the request failed), so a retry runs it again"""
+        try:
+            IdempotencyRepository.get_table().delete_item(
+                Key={'key': key},
+                ConditionExpression='#owner = :owner AND #state = :in_progress',
+                ExpressionAttributeNames={'#owner': 'owner', '#state': 'state'},
+                ExpressionAttributeValues={':owner': owner, ':in_progress': IN_PROGRESS}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
@@ -0,0 +1,114 @@
+from app.core.config import settings
+from app.core.database import get_dynamodb_resource
+from app.models.domain import Notification
+from app.models.enums import UserRole
+from app.utils import transactions
+from app.utils.dynamodb import parse_datetime
+from boto3.dynamodb.conditions import Key
+from typing import List, Optional, Tuple
+
+TABLE_NAME = 'notifications'
+
+# One partition per recipient: entries "n#<id>" plus a meta item with the unread
+# count. "~meta" sorts after every entry, so a newest-first query returns it first.
+ENTRY_PREFIX = 'n#'
+META_KEY = '~meta'
+
+
+def recipient_key(email: str, role: UserRole) -> str:
+    return f"{email}#{UserRole(role).value}"
+
+
+class NotificationRepository:
+    """Repository for per-user notification inboxes"""
+
+    @staticmethod
+    def get_table():
+        return get_dynamodb_resource().Table(TABLE_NAME)
+
+    @staticmethod
+    def add(notification: Notification) -> bool:
+        """Store a notification and count it as unread; False if it was already stored
+
+        Entries older than what the recipient already marked read are stored
+        without raising the unread count.
+        """
+        recipient = recipient_key(notification.recipient_email, notification.recipient_role)
+        item = notification.model_dump(mode='json', exclude_none=True)
+        item.update({
+            'recipient': recipient,
+            'sk': ENTRY_PREFIX + notification.id,
+            'expires_at': int(parse_datetime(notification.created_at).timestamp())
+                          + settings.NOTIFICATIONS_RETENTION_DAYS * 86400,
+        })
+        put = transactions.put(TABLE_NAME, item, 'attribute_not_exists(sk)')
+        count = transactions.update(
+            TABLE_NAME,
+            {'recipient': recipient, 'sk': META_KEY},
+            'ADD unread :one',
+            values={':one': 1, ':id': notification.id},
+            condition='attribute_not_exists(read_up_to) OR read_up_to < :id'
+        )
+        try:
+            transactions.transact_write([put, count])
+            return True
+        except transactions.TransactionConflict as e:
+            codes = [reason.get('Code') for reason in e.reasons]
+            if codes[:1] == ['ConditionalCheckFailed']:
+                return False  # Delivered before
+            if codes[1:2] != ['ConditionalCheckFailed']:
+                raise
+        # Already read past this one
+        try:
+            transactions.transact_write([put])
+        except transactions.TransactionConflict:
+            return False
+        return True
+
+    @staticmethod
+    def find_page(
+        email: str,
+        role: UserRole,
+        limit: int = 20,
+        before: Optional[str] = None
+    ) -> Tuple[List[Notification], int, Optional[str], Optional[str]]:
+        """Newest notifications (older than the before id), unread count, read position and next cursor
+
+        The first page is a single query that also returns the meta item.
+        """
+        table = NotificationRepository.get_table()
+        recipient = recipient_key(email, role)
+        condition = Key('recipient').eq(recipient)
+        if before:
+            condition &= Key('sk').lt(ENTRY_PREFIX + before)
+        response = table.query(KeyConditionExpression=condition, ScanIndexForward=False, Limit=limit + 1)
+        items = response.get('Items', [])
+        if items and items[0]['sk'] == META_KEY:
+            meta = items.pop(0)
+        elif before:
+            meta = table.get_item(Key={'recipient': recipient, 'sk': META_KEY}).get('Item', {})
+        else:
+            meta = {}  # Nothing was ever delivered to this recipient
+        has_more = len(items) > limit or 'LastEvaluatedKey' in response
+        notifications = [
+            Notification(**{k: v for k, v in item.items() if k not in ('recipient', 'sk', 'expires_at')})
+            for item in items[:limit]
+        ]
+        next_cursor = notifications[-1].id if has_more and notifications else None
+        return notifications, max(int(meta.get('unread', 0)), 0), meta.get('read_up_to'), next_cursor
+
+    @staticmethod
+    def mark_read(email: str, role: UserRole, up_to: str, seen_unread: int) -> int:
+        """Mark everything up to the up_to id as read; returns the remaining unread count
+
+        Subtracts the unread count the caller saw instead of zeroing it, so
+        notifications delivered in the meantime stay unread.
+        """
+        response = NotificationRepository.get_table().update_item(
+            Key={'recipient': recipient_key(email, role), 'sk': META_KEY},
+            UpdateExpression='SET read_up_to = :id ADD unread :seen',
+            ConditionExpression='attribute_not_exists(read_up_to) OR read_up_to < :id',
+            ExpressionAttributeValues={':id': up_to, ':seen': -seen_unread},
+            ReturnValues='UPDATED_NEW'
+        )
+        return max(int(response['Attributes'].get('unread', 0)), 0)
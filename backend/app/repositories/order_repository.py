@@ -1,12 +1,83 @@
+from app.core import events as change_events
+from app.core.config import settings
 from app.core.database import get_dynamodb_resource, init_tables
+from app.core.events import ChangeEvent
+from app.core.hedging import hedged
+from app.core.singleflight import reads
 from app.models.domain import Order
+from app.models.enums import EntityType, OrderStatus, UserRole
+from app.utils import transactions
+from app.utils.transactions import VersionConflictError
 from app.utils.dynamodb import to_dynamodb_dict
 from botocore.exceptions import ClientError
-from typing import List, Optional
+from app.utils.parallel_scan import parallel_scan
+from app.utils.scatter_gather import scatter_query
+from boto3.dynamodb.conditions import Attr, Key
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
+# Orders in these statuses are in the sparse per-participant status indexes
+OPEN_STATUSES = (OrderStatus.PENDING, OrderStatus.IN_PROGRESS)
+
+# Sparse GSI per participant role: hash key "<email>#<status>" (plus "#<shard>", see below), range key created_at
+STATUS_KEY_ATTRIBUTES = {
+    UserRole.AGENT: 'agent_status_key',
+    UserRole.RENTER: 'renter_status_key',
+    UserRole.LANDLORD: 'landlord_status_key',
+}
+STATUS_INDEXES = {
+    UserRole.AGENT: 'agent-status-index',
+    UserRole.RENTER: 'renter-status-index',
+    UserRole.LANDLORD: 'landlord-status-index',
+}
+# The original unsharded participant GSIs (hash key: the participant's email
+# attribute); nothing reads them and migration 0005 drops them
+PARTICIPANT_INDEXES = {
+    UserRole.AGENT: ('created-by-index', 'created_by'),
+    UserRole.RENTER: ('renter-email-index', 'renter_email'),
+    UserRole.LANDLORD: ('landlord-email-index', 'landlord_email'),
+}
+
+# Write-sharded GSI per participant role: hash key "<email>" or "<email>#<shard>", range key created_at.
+# Users listed in PARTICIPANT_INDEX_SHARDS spread their orders over several
+# keys (and index partitions); reads query every shard and merge.
+SHARD_KEY_ATTRIBUTES = {
+    UserRole.AGENT: 'agent_shard_key',
+    UserRole.RENTER: 'renter_shard_key',
+    UserRole.LANDLORD: 'landlord_shard_key',
+}
+SHARD_INDEXES = {
+    UserRole.AGENT: 'agent-shard-index',
+    UserRole.RENTER: 'renter-shard-index',
+    UserRole.LANDLORD: 'landlord-shard-index',
+}
+
+
+class OrderIdTakenError(Exception):
+    """An order with the ID of a new order already exists"""
+
+
+def status_key(email: str, status: OrderStatus) -> str:
+    return f"{email}#{OrderStatus(status).value}"
+
+
+def participant_shards(email: str) -> int:
+    return settings.participant_index_shards.get(email, 1)
+
+
+def shard_for(order_id: str, email: str) -> int:
+    """The shard of a participant's index keys that holds an order"""
+    return zlib.crc32(order_id.encode()) % participant_shards(email)
+
+
+def sharded_key(key: str, shard: int) -> str:
+    # Shard 0 is the unsharded key, so raising a user's shard count leaves existing orders readable
+    return key if shard == 0 else f"{key}#{shard}"
+
 
 class OrderRepository:
     """Repository for order data access"""
@@ -29,102 +100,339 @@ class OrderRepository:
                 raise
         return table
     
+    # Reads are hedged (app.core.hedging) and may run on other threads, so each
+    # attempt takes its own thread's resource instead of the caller's table
+    
+    @staticmethod
+    def _get_item(order_id: str) -> Optional[Dict[str, Any]]:
+        OrderRepository.get_table()
+        return hedged(
+            'GetItem', 'orders',
+            lambda: get_dynamodb_resource().Table('orders').get_item(Key={'id': order_id})
+        ).get('Item')
+    
+    @staticmethod
+    def _query(**kwargs) -> Dict[str, Any]:
+        """One page of a query on the orders table or its indexes"""
+        return hedged('Query', 'orders', lambda: get_dynamodb_resource().Table('orders').query(**kwargs))
+    
     @staticmethod
     def find_by_id(order_id: str) -> Optional[Order]:
-        """Find order by ID"""
-        table = OrderRepository.get_table()
-        response = table.get_item(Key={'id': order_id})
-        if 'Item' in response:
-            return Order(**response['Item'])
+        """Find order by ID (concurrent reads of the same order share one call)"""
+        item = reads.do('orders', order_id, lambda: OrderRepository._get_item(order_id))
+        if item is not None:
+            return Order.from_item(item)
         return None
     
     @staticmethod
     def find_by_created_by(email: str) -> List[Order]:
-        """Find orders created by user"""
-        try:
-            table = OrderRepository.get_table()
-            response = table.query(
-                IndexName='created-by-index',
-                KeyConditionExpression='created_by = :email',
-                ExpressionAttributeValues={
-                    ':email': email
-                }
-            )
-            return [Order(**item) for item in response.get('Items', [])]
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                logger.error("Orders table or index not found. Please ensure tables are initialized.")
-                return []
-            raise
+        """Find orders created by user, newest first"""
+        return OrderRepository.find_by_participant(email, UserRole.AGENT)
     
     @staticmethod
     def find_by_renter_email(email: str) -> List[Order]:
-        """Find orders for renter"""
+        """Find orders for renter, newest first"""
+        return OrderRepository.find_by_participant(email, UserRole.RENTER)
+    
+    @staticmethod
+    def find_by_landlord_email(email: str) -> List[Order]:
+        """Find orders for landlord, newest first"""
+        return OrderRepository.find_by_participant(email, UserRole.LANDLORD)
+    
+    @staticmethod
+    def find_all() -> List[Order]:
+        """Get all orders"""
         try:
             table = OrderRepository.get_table()
-            response = table.query(
-                IndexName='renter-email-index',
-                KeyConditionExpression='renter_email = :email',
-                ExpressionAttributeValues={
-                    ':email': email
-                }
-            )
-            return [Order(**item) for item in response.get('Items', [])]
+            response = table.scan()
+            return [Order.from_item(item) for item in response.get('Items', [])]
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                logger.error("Orders table or index not found. Please ensure tables are initialized.")
+                logger.error("Orders table not found. Please ensure tables are initialized.")
                 return []
             raise
     
     @staticmethod
-    def find_by_landlord_email(email: str) -> List[Order]:
-        """Find orders for landlord"""
+    def scan_for_export(
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        segments: int = 4,
+        page_size: Optional[int] = None,
+        max_queued_pages: int = 8
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream raw order items from a parallel scan, filtered server-side
+
+        The embedded chat room snapshot is not read; it lives in the chat_rooms table.
+        """
+        names = {f'#{field}': field for field in Order.model_fields if field != 'chat_room'}
+        kwargs = {
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names,
+        }
+        conditions = []
+        if status:
+            conditions.append(Attr('status').eq(status))
+        if created_from:
+            conditions.append(Attr('created_at').gte(created_from))
+        if created_to:
+            conditions.append(Attr('created_at').lte(created_to))
+        if conditions:
+            filter_expression = conditions[0]
+            for condition in conditions[1:]:
+                filter_expression = filter_expression & condition
+            kwargs['FilterExpression'] = filter_expression
+        
+        OrderRepository.get_table()
+        return parallel_scan(
+            'orders',
+            segments=segments,
+            max_queued_pages=max_queued_pages,
+            page_size=page_size,
+            **kwargs
+        )
+    
+    @staticmethod
+    def scan_participant_keys(segments: int = 4, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the ID, version, status, participants and index keys of every order"""
+        attributes = [
+            'id', 'version', 'status',
+            *(attribute for _, attribute in PARTICIPANT_INDEXES.values()),
+            *SHARD_KEY_ATTRIBUTES.values(),
+            *STATUS_KEY_ATTRIBUTES.values(),
+        ]
+        names = {f'#{attribute}': attribute for attribute in attributes}
+        OrderRepository.get_table()
+        return parallel_scan(
+            'orders',
+            segments=segments,
+            page_size=page_size,
+            ProjectionExpression=', '.join(names),
+            ExpressionAttributeNames=names
+        )
+    
+    @staticmethod
+    def rekey(item: Dict[str, Any]) -> bool:
+        """Move an order's index keys to the shards of the current PARTICIPANT_INDEX_SHARDS
+
+        item is one from scan_participant_keys(). Returns True when keys were
+        rewritten; False when they were already right or the order changed
+        since it was read (its new write already used the current shards).
+        """
+        names, values, assignments = {}, {}, []
+        for role, (_, email_attribute) in PARTICIPANT_INDEXES.items():
+            email = item[email_attribute]
+            shard = shard_for(item['id'], email)
+            expected = {SHARD_KEY_ATTRIBUTES[role]: sharded_key(email, shard)}
+            if STATUS_KEY_ATTRIBUTES[role] in item:
+                expected[STATUS_KEY_ATTRIBUTES[role]] = sharded_key(status_key(email, item['status']), shard)
+            for attribute, key in expected.items():
+                if item.get(attribute) != key:
+                    names[f'#{attribute}'] = attribute
+                    values[f':{attribute}'] = key
+                    assignments.append(f'#{attribute} = :{attribute}')
+        if not assignments:
+            return False
+        condition, version_names, version_values = transactions.version_condition(item.get('version', 1), 'id')
         try:
-            table = OrderRepository.get_table()
-            response = table.query(
-                IndexName='landlord-email-index',
-                KeyConditionExpression='landlord_email = :email',
-                ExpressionAttributeValues={
-                    ':email': email
-                }
+            get_dynamodb_resource().Table('orders').update_item(
+                Key={'id': item['id']},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                ConditionExpression=condition,
+                ExpressionAttributeNames={**names, **version_names},
+                ExpressionAttributeValues={**values, **version_values}
             )
-            return [Order(**item) for item in response.get('Items', [])]
+            return True
         except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                logger.error("Orders table or index not found. Please ensure tables are initialized.")
-                return []
-            raise
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
     
     @staticmethod
-    def find_all() -> List[Order]:
-        """Get all orders"""
+    def scan_archivable(updated_before: str, segments: int = 4, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the IDs of completed, not yet archived orders last updated before a time"""
+        OrderRepository.get_table()
+        return parallel_scan(
+            'orders',
+            segments=segments,
+            page_size=page_size,
+            ProjectionExpression='id',
+            FilterExpression=(
+                Attr('status').eq(OrderStatus.COMPLETED.value)
+                & Attr('updated_at').lt(updated_before)
+                & Attr('archived_at').not_exists()
+            )
+        )
+
+    @staticmethod
+    def participants(order: Order) -> Dict[UserRole, str]:
+        return {
+            UserRole.AGENT: order.created_by,
+            UserRole.RENTER: order.renter_email,
+            UserRole.LANDLORD: order.landlord_email,
+        }
+    
+    @staticmethod
+    def to_item(order: Order) -> Dict[str, Any]:
+        """Stored item: the order plus its participant index keys
+
+        Every order carries a (possibly sharded) key per participant for the
+        participant indexes, and open orders a status key for the sparse
+        status indexes.
+        """
+        item = to_dynamodb_dict(order)
+        for role, email in OrderRepository.participants(order).items():
+            shard = shard_for(order.id, email)
+            item[SHARD_KEY_ATTRIBUTES[role]] = sharded_key(email, shard)
+            if order.status in OPEN_STATUSES:
+                item[STATUS_KEY_ATTRIBUTES[role]] = sharded_key(status_key(email, order.status), shard)
+        return item
+    
+    @staticmethod
+    def participant_queries(
+        email: str,
+        role: UserRole,
+        status: Optional[OrderStatus] = None,
+        page_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Query kwargs for each shard of a participant's orders, newest first"""
+        if status in OPEN_STATUSES:
+            # Sparse index: holds exactly the open orders of this participant and status
+            index_name, attribute, key = STATUS_INDEXES[role], STATUS_KEY_ATTRIBUTES[role], status_key(email, status)
+            filter_expression = None
+        else:
+            index_name, attribute, key = SHARD_INDEXES[role], SHARD_KEY_ATTRIBUTES[role], email
+            filter_expression = Attr('status').eq(OrderStatus(status).value) if status is not None else None
+        queries = []
+        for shard in range(participant_shards(email)):
+            kwargs = {
+                'IndexName': index_name,
+                'KeyConditionExpression': Key(attribute).eq(sharded_key(key, shard)),
+                'ScanIndexForward': False,
+            }
+            if filter_expression is not None:
+                kwargs['FilterExpression'] = filter_expression
+            if page_size:
+                kwargs['Limit'] = page_size
+            queries.append(kwargs)
+        return queries
+    
+    @staticmethod
+    def iter_by_participant(
+        email: str,
+        role: UserRole,
+        status: Optional[OrderStatus] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Order]:
+        """A participant's orders (optionally in one status), newest first
+
+        The shards of the participant's index key are queried in parallel and
+        merged by created_at. limit is how many orders the caller means to
+        take; it sizes the first page read from each shard.
+        """
+        OrderRepository.get_table()
+        page_size = None
+        if limit is not None:
+            page_size = -(-max(limit, 1) // participant_shards(email)) + 1
+        items = scatter_query(
+            OrderRepository._query,
+            OrderRepository.participant_queries(email, role, status, page_size),
+            'created_at'
+        )
+        return (Order.from_item(item) for item in items)
+    
+    @staticmethod
+    def find_by_participant(
+        email: str,
+        role: UserRole,
+        status: Optional[OrderStatus] = None,
+        limit: Optional[int] = None
+    ) -> List[Order]:
+        """The newest limit (default all) orders of a participant, optionally in one status"""
         try:
-            table = OrderRepository.get_table()
-            response = table.scan()
-            return [Order(**item) for item in response.get('Items', [])]
+            return list(islice(OrderRepository.iter_by_participant(email, role, status, limit), limit))
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                logger.error("Orders table not found. Please ensure tables are initialized.")
+                logger.error("Orders table or index not found. Please ensure tables are initialized.")
                 return []
             raise
     
     @staticmethod
-    def create(order: Order) -> Order:
-        """Create a new order"""
-        table = OrderRepository.get_table()
-        table.put_item(Item=to_dynamodb_dict(order))
+    def create(
+        order: Order,
+        extra_writes: Optional[List[Dict[str, Any]]] = None,
+        extra_events: Optional[List[ChangeEvent]] = None
+    ) -> Order:
+        """Create a new order (atomically with extra transaction actions and their events)
+
+        Nothing is written if an order with the same ID exists
+        (OrderIdTakenError) or a condition of the extra writes fails
+        (TransactionConflict).
+        """
+        OrderRepository.get_table()
+        try:
+            transactions.transact_write(
+                [
+                    transactions.put('orders', OrderRepository.to_item(order), 'attribute_not_exists(id)'),
+                    *(extra_writes or []),
+                ],
+                events=[change_events.change(EntityType.ORDER, order.id, None, order), *(extra_events or [])]
+            )
+        except transactions.TransactionConflict as e:
+            if e.reasons and e.reasons[0].get('Code') == 'ConditionalCheckFailed':
+                raise OrderIdTakenError(f"Order {order.id} already exists") from e
+            raise
         return order
     
     @staticmethod
-    def update(order: Order) -> Order:
-        """Update an order"""
-        table = OrderRepository.get_table()
-        table.put_item(Item=to_dynamodb_dict(order))
+    def update(
+        order: Order,
+        previous: Order,
+        extra_writes: Optional[List[Dict[str, Any]]] = None,
+        extra_events: Optional[List[ChangeEvent]] = None
+    ) -> Order:
+        """Replace previous with order
+
+        The write only succeeds while the stored order still has the version
+        of previous (VersionConflictError otherwise).
+        """
+        OrderRepository.get_table()
+        condition, names, values = transactions.version_condition(previous.version, 'id')
+        try:
+            transactions.transact_write(
+                [
+                    transactions.put('orders', OrderRepository.to_item(order), condition, names, values),
+                    *(extra_writes or []),
+                ],
+                events=[change_events.change(EntityType.ORDER, order.id, previous, order), *(extra_events or [])]
+            )
+        except transactions.TransactionConflict as e:
+            raise VersionConflictError(f"Order {order.id} was modified concurrently") from e
         return order
     
     @staticmethod
-    def delete(order_id: str):
-        """Delete an order"""
-        table = OrderRepository.get_table()
-        table.delete_item(Key={'id': order_id})
+    def delete(
+        order: Order,
+        extra_writes: Optional[List[Dict[str, Any]]] = None,
+        extra_events: Optional[List[ChangeEvent]] = None
+    ):
+        """Delete an order, unless it changed since it was read"""
+        OrderRepository.get_table()
+        condition, names, values = transactions.version_condition(order.version, 'id')
+        try:
+            transactions.transact_write(
+                [
+                    transactions.delete('orders', {'id': order.id}, condition, names, values),
+                    *(extra_writes or []),
+                ],
+                events=[change_events.change(EntityType.ORDER, order.id, order, None), *(extra_events or [])]
+            )
+        except transactions.TransactionConflict as e:
+            raise VersionConflictError(f"Order {order.id} was modified concurrently") from e
+
+
+def _forget_read(event: ChangeEvent):
+    reads.forget('orders', event.key)
+
 
+change_events.subscribe(_forget_read, EntityType.ORDER)
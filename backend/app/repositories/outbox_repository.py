@@ -0,0 +1,42 @@
+from app.core.database import get_dynamodb_resource
+from app.core.events import OUTBOX_TABLE, ChangeEvent, from_outbox_item
+from boto3.dynamodb.conditions import Key
+from typing import Dict, List, Optional
+
+CHECKPOINT_TABLE = 'outbox_checkpoints'
+
+
+class OutboxRepository:
+    """Repository for reading change events and consumer checkpoints"""
+
+    @staticmethod
+    def read(shard: str, after: Optional[str], up_to: str, limit: int) -> List[ChangeEvent]:
+        """Events of one shard with after < seq <= up_to, oldest first"""
+        table = get_dynamodb_resource().Table(OUTBOX_TABLE)
+        condition = Key('shard').eq(shard)
+        condition &= Key('seq').gt(after) if after else Key('seq').lte(up_to)
+        kwargs = {'KeyConditionExpression': condition, 'Limit': limit}
+        events = []
+        while len(events) < limit:
+            response = table.query(**kwargs)
+            for item in response.get('Items', []):
+                if item['seq'] > up_to:
+                    return events
+                events.append(from_outbox_item(item))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            kwargs['Limit'] = limit - len(events)
+        return events
+
+    @staticmethod
+    def get_checkpoints(consumer: str) -> Dict[str, str]:
+        """Last delivered seq per shard"""
+        table = get_dynamodb_resource().Table(CHECKPOINT_TABLE)
+        response = table.query(KeyConditionExpression=Key('consumer').eq(consumer))
+        return {item['shard']: item['seq'] for item in response.get('Items', [])}
+
+    @staticmethod
+    def save_checkpoint(consumer: str, shard: str, seq: str):
+        table = get_dynamodb_resource().Table(CHECKPOINT_TABLE)
+        table.put_item(Item={'consumer': consumer, 'shard': shard, 'seq': seq})
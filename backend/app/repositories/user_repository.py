@@ -1,8 +1,14 @@
+from app.core import events as change_events
 from app.core.database import get_dynamodb_resource
 from app.models.domain import User
-from app.models.enums import UserRole
+from app.models.enums import EntityType, UserRole
+from app.utils import transactions
 from app.utils.dynamodb import to_dynamodb_dict
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+import time
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
 
 
 class UserRepository:
@@ -46,6 +52,37 @@ class UserRepository:
         )
         return [User(**item) for item in response.get('Items', [])]
     
+    @staticmethod
+    def find_names(keys: Iterable[Tuple[str, UserRole]]) -> Dict[Tuple[str, UserRole], str]:
+        """Look up display names for many (email, role) pairs with BatchGetItem
+
+        Pairs without a user record are missing from the result.
+        """
+        keys = list(dict.fromkeys(keys))
+        resource = get_dynamodb_resource()
+        names = {}
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {
+                'users': {
+                    'Keys': [
+                        {'email': email, 'role': UserRole(role).value}
+                        for email, role in keys[start:start + BATCH_GET_LIMIT]
+                    ],
+                    'ProjectionExpression': '#e, #r, #n',
+                    'ExpressionAttributeNames': {'#e': 'email', '#r': 'role', '#n': 'name'}
+                }
+            }
+            attempt = 0
+            while request:
+                response = resource.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get('users', []):
+                    names[(item['email'], UserRole(item['role']))] = item['name']
+                request = response.get('UnprocessedKeys') or {}
+                if request:
+                    attempt += 1
+                    time.sleep(min(0.05 * (2 ** attempt), 2.0))
+        return names
+    
     @staticmethod
     def find_all(skip: int = 0, limit: int = 100) -> List[User]:
         """Get all users"""
@@ -57,8 +94,10 @@ class UserRepository:
     @staticmethod
     def create(user: User) -> User:
         """Create a new user"""
-        table = UserRepository.get_table()
-        table.put_item(Item=to_dynamodb_dict(user))
+        transactions.transact_write(
+            [transactions.put('users', to_dynamodb_dict(user))],
+            events=[change_events.change(EntityType.USER, f"{user.email}#{UserRole(user.role).value}", None, user)]
+        )
         return user
     
     @staticmethod
@@ -42,9 +42,32 @@ class ChatRoomResponse(BaseModel):
     order_id: str
     participants: List[ChatParticipantResponse]
     messages: List[ChatMessageResponse]
+    message_count: int = 0
     created_at: str
     updated_at: str
 
     class Config:
         from_attributes = True
 
+
+class ChatRoomSummaryResponse(BaseModel):
+    order_id: str
+    participants: List[ChatParticipantResponse]
+    message_count: int
+    unread: int  # For the user the summary was requested for
+    updated_at: str
+
+
+
+class ChatSearchHitResponse(BaseModel):
+    order_id: str
+    position: int  # Index of the message in the room's history
+    score: float
+    message: ChatMessageResponse
+
+
+class ChatSearchResponse(BaseModel):
+    query: str
+    total: int
+    items: List[ChatSearchHitResponse]
+    next_offset: Optional[int] = None  # Pass as `offset` for the next page
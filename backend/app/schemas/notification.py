@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.models.enums import NotificationType, UserRole
+
+
+class NotificationResponse(BaseModel):
+    id: str
+    recipient_email: str
+    recipient_role: UserRole
+    type: NotificationType
+    order_id: str
+    text: str
+    actor_email: Optional[str] = None
+    created_at: str
+    read: bool
+
+
+class NotificationPageResponse(BaseModel):
+    items: List[NotificationResponse]
+    unread: int
+    next_cursor: Optional[str] = None  # Pass as `before` for the next (older) page
+
+
+class UnreadCountResponse(BaseModel):
+    unread: int
@@ -42,7 +42,35 @@ class OrderResponse(BaseModel):
     updated_at: str
     progress_stages: List[ProgressStageResponse] = []
     chat_room: Optional[ChatRoomResponse] = None
+    unread_messages: Optional[int] = None  # Set when listing orders for a user
+    archived_at: Optional[str] = None  # Archived: lists carry a stub without description, progress and chat
 
     class Config:
         from_attributes = True
 
+
+
+class OrderCountsResponse(BaseModel):
+    pending: int = 0
+    in_progress: int = 0
+    completed: int = 0
+    total: int = 0
+    held_deposits: float = 0.0
+
+
+class OrderSearchHitResponse(BaseModel):
+    id: str
+    title: str
+    property_address: str
+    renter_email: str
+    landlord_email: str
+    created_by: str
+    status: OrderStatus
+    created_at: str
+
+
+class OrderSearchResponse(BaseModel):
+    query: str
+    total: int  # Candidates; can exceed the actual matches slightly
+    items: List[OrderSearchHitResponse]
+    next_offset: Optional[int] = None  # Pass as `offset` for the next page
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class DepositGroupResponse(BaseModel):
+    key: str
+    count: int
+    sum: float
+    mean: float
+    percentiles: Dict[str, float]
+
+
+class StageFunnelResponse(BaseModel):
+    stage: str
+    completed: int
+    conversion: float
+
+
+class DepositReportResponse(BaseModel):
+    group_by: str
+    orders: int
+    total: float
+    total_groups: int
+    groups: List[DepositGroupResponse]
+    funnel: List[StageFunnelResponse]
+    as_of: Optional[str] = None
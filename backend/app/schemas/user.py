@@ -62,4 +62,6 @@ class LoginRequest(BaseModel):
 class LoginResponse(BaseModel):
     user: UserResponse
     access_token: Optional[str] = None
+    token_type: str = "bearer"
+    expires_in: Optional[int] = None  # Seconds
 
@@ -0,0 +1,52 @@
+"""
+Script to archive completed orders to the cold store
+
+Completed orders not updated for --older-than-days (default
+ARCHIVE_AFTER_DAYS) are written with their chat rooms to the cold store
+(COLD_STORE_URL) and replaced by small stubs in the orders table. Orders
+changed while the run is in progress are left for the next run, so the
+script is safe to run while the API serves traffic and to re-run.
+
+Usage (from the backend/ directory):
+
+    python -m app.scripts.archive_orders --older-than-days 365 --workers 8
+    COLD_STORE_URL=s3://kaution-archive/prod python -m app.scripts.archive_orders
+"""
+import argparse
+import logging
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Archive completed Kaution orders to the cold store")
+    parser.add_argument("--older-than-days", type=int, default=None,
+                        help="Archive completed orders not updated for this many days (default ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel scan segments")
+    parser.add_argument("--workers", type=int, default=4, help="Orders archived in parallel")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many candidate orders")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Add parent directory to path when running as script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from app.core.config import settings
+    from app.core.database import init_tables
+    from app.services.archive_service import ArchiveService
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    print("Initializing DynamoDB tables...")
+    init_tables()
+    print(f"Archiving to {settings.COLD_STORE_URL}...")
+    counts = ArchiveService.archive_completed(
+        older_than_days=args.older_than_days,
+        segments=args.segments,
+        workers=args.workers,
+        limit=args.limit
+    )
+    print(f"\nArchived {counts['archived']} order(s); skipped {counts['skipped']}, "
+          f"changed concurrently {counts['conflict']}, failed {counts['failed']}")
+    sys.exit(1 if counts['failed'] else 0)
@@ -9,7 +9,6 @@ from app.models.enums import UserRole, OrderStatus, ProgressStageType
 from app.utils.dynamodb import format_datetime
 from app.repositories.user_repository import UserRepository
 from app.repositories.order_repository import OrderRepository
-from app.repositories.chat_repository import ChatRepository
 from app.services.order_service import OrderService
 import logging
 
@@ -85,9 +84,6 @@ def init_static_data():
             updated_at=now
         )
         
-        OrderRepository.create(order)
-        logger.info(f"Created order: {order_id}")
-        
         # Create chat room for the order
         # Get user names for participants
         def get_user_name(email, role):
@@ -120,12 +116,10 @@ def init_static_data():
             created_at=now,
             updated_at=now
         )
-        ChatRepository.create(chat_room)
-        logger.info(f"Created chat room for order: {order_id}")
-        
-        # Update order with chat room reference
+        # Store order, chat room and counters together
         order.chat_room = chat_room
-        OrderRepository.update(order)
+        OrderService.insert_order(order)
+        logger.info(f"Created order and chat room: {order_id}")
         
         logger.info("Static data initialized successfully")
         logger.info("Users: Alice@gmail.com (Agent), Bob@gmail.com (Renter), Charlie@gmail.com (Landlord)")
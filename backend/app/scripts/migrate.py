@@ -0,0 +1,51 @@
+"""
+Script to apply schema and data migrations
+
+Pending migrations (app/migrations/versions) are applied in order and
+recorded in the schema_migrations table. Backfills run as rate-limited
+parallel scans and checkpoint their progress, so the script is safe to run
+while the API serves traffic and can simply be re-run after an interruption.
+
+Usage (from the backend/ directory):
+
+    python -m app.scripts.migrate status
+    python -m app.scripts.migrate up --segments 8 --rate 200
+"""
+import argparse
+import logging
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply Kaution schema and data migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="List migrations and whether they are applied")
+    up_parser = subparsers.add_parser("up", help="Apply pending migrations")
+    up_parser.add_argument("--target", help="Stop after this migration id")
+    up_parser.add_argument("--segments", type=int, default=4, help="Parallel scan segments per backfill")
+    up_parser.add_argument("--rate", type=float, default=100,
+                           help="Items per second processed by backfills (0 = unlimited)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Add parent directory to path when running as script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from app.core.database import init_tables
+    from app.migrations.runner import MigrationRunner
+    from app.migrations.versions import MIGRATIONS
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    print("Initializing DynamoDB tables...")
+    init_tables()
+    if args.command == "status":
+        for entry in MigrationRunner(MIGRATIONS).status():
+            applied = f" ({entry['applied_at']})" if entry['applied_at'] else ""
+            print(f"{entry['id']:<32} {entry['status']:<8}{applied}  {entry['description']}")
+    else:
+        runner = MigrationRunner(MIGRATIONS, segments=args.segments, rate=args.rate)
+        applied = runner.run(args.target)
+        print(f"\nApplied {len(applied)} migration(s): {', '.join(applied) or 'none pending'}")
@@ -0,0 +1,42 @@
+"""
+Script to move participant index keys to the configured shards
+
+Order lists only query the shards in PARTICIPANT_INDEX_SHARDS, so lowering
+a user's count would hide their orders in the dropped shards. This script
+rewrites every order whose keys are not in the shards of the current
+setting. Run it with the lowered count before deploying that count: the
+new shards are a subset of the old ones, so the API keeps finding every
+order meanwhile. Orders changed during the run already carry the right
+keys, so the script is safe to run while the API serves traffic and to re-run.
+
+Usage (from the backend/ directory):
+
+    PARTICIPANT_INDEX_SHARDS=agent@bigagency.com=4 python -m app.scripts.rekey_shards --segments 8
+"""
+import argparse
+import logging
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move Kaution participant index keys to the configured shards")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel scan segments")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Add parent directory to path when running as script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from app.core.config import settings
+    from app.core.database import init_tables
+    from app.services.order_service import OrderService
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    print("Initializing DynamoDB tables...")
+    init_tables()
+    print(f"Re-keying orders for PARTICIPANT_INDEX_SHARDS={settings.PARTICIPANT_INDEX_SHARDS!r}...")
+    counts = OrderService.rekey_participant_shards(segments=args.segments)
+    print(f"\nScanned {counts['scanned']} order(s), moved {counts['moved']}")
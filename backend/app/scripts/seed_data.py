@@ -0,0 +1,371 @@
+"""
+Script to seed large synthetic datasets for capacity and load testing
+
+The data is deterministic for a given seed and realistically skewed: a few
+heavy agents own most orders, landlords own several properties each, and a
+small fraction of chat rooms carries a long message history. Work is split
+into chunks that are generated independently (so any chunk can be re-created
+on its own), written by a pool of processes each running parallel
+BatchWriteItem workers, and recorded in a checkpoint file so an interrupted
+run resumes where it stopped.
+
+Usage (from the backend/ directory):
+
+    python -m app.scripts.seed_data --orders 1000000 --processes 8 --threads 8
+    python -m app.scripts.seed_data --orders 1000000 --checkpoint seed.json  # resume
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Any, Dict, List, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+STAGES = [
+    ("order_created", "Order Created"),
+    ("renter_review", "Renter Review"),
+    ("landlord_review", "Landlord Review"),
+    ("deposit_held", "Deposit Held"),
+    ("completed", "Completed"),
+]
+
+MESSAGE_TEMPLATES = [
+    "Hi all, I've uploaded the signed lease for {address}.",
+    "Can we schedule the move-in inspection for next week?",
+    "The deposit of {amount} EUR has been transferred.",
+    "There is a small scratch on the kitchen floor, photos attached.",
+    "The landlord mentioned the damaged carpet in the living room.",
+    "Thanks, I have reviewed the documents and everything looks fine.",
+    "Could you confirm the bank details for the deposit account?",
+    "Keys will be handed over on Monday at 10am.",
+    "The heating was serviced before the move-in.",
+    "Please approve the renter review so we can continue.",
+]
+
+STREETS = ["Main Street", "Hauptstrasse", "Lindenallee", "Bergmannstrasse", "Schillerweg", "Parkstrasse"]
+CITIES = ["Berlin 10115", "Hamburg 20095", "Munich 80331", "Cologne 50667", "Leipzig 04109"]
+
+
+@dataclass
+class SeedConfig:
+    seed: int = 42
+    orders: int = 10000
+    chunk_size: int = 2000
+    agents: int = 200
+    heavy_agents: int = 5
+    heavy_agent_share: float = 0.6
+    renters: int = 50000
+    landlords: int = 5000
+    messages_per_room: int = 4
+    long_history_fraction: float = 0.02
+    long_history_messages: int = 400
+    days: int = 730
+    end_date: str = "2025-01-01T00:00:00"
+
+    def fingerprint(self) -> str:
+        return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:16]
+
+    def chunks(self) -> List[Tuple[str, int]]:
+        users = self.agents + self.renters + self.landlords
+        return (
+            [("users", i) for i in range((users + self.chunk_size - 1) // self.chunk_size)]
+            + [("orders", i) for i in range((self.orders + self.chunk_size - 1) // self.chunk_size)]
+        )
+
+
+def user_email(role: str, index: int) -> str:
+    return f"{role}{index:07d}@seed.example.com"
+
+
+def _user_name(role: str, index: int) -> str:
+    return f"Seed {role.title()} {index}"
+
+
+def _zipf_cum_weights(n: int, exponent: float = 1.1) -> List[float]:
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+class _Generator:
+    """Builds DynamoDB items for one chunk, deterministically from (seed, chunk)"""
+
+    def __init__(self, config: SeedConfig):
+        self.config = config
+        self.end = datetime.fromisoformat(config.end_date)
+        light_agents = max(config.agents - config.heavy_agents, 1)
+        self.agent_weights = _zipf_cum_weights(light_agents)
+        self.landlord_weights = _zipf_cum_weights(config.landlords, exponent=0.8)
+
+    def users(self, chunk: int) -> List[Dict[str, Any]]:
+        config = self.config
+        start = chunk * config.chunk_size
+        stop = min(start + config.chunk_size, config.agents + config.renters + config.landlords)
+        created = self.end - timedelta(days=config.days)
+        now = created.isoformat()
+        items = []
+        for n in range(start, stop):
+            if n < config.agents:
+                role, index = "agent", n
+            elif n < config.agents + config.renters:
+                role, index = "renter", n - config.agents
+            else:
+                role, index = "landlord", n - config.agents - config.renters
+            items.append({
+                'email': user_email(role, index),
+                'role': role,
+                'name': _user_name(role, index),
+                'created_at': now,
+                'updated_at': now,
+            })
+        return items
+
+    def _agent(self, rng: random.Random) -> int:
+        config = self.config
+        if config.heavy_agents and rng.random() < config.heavy_agent_share:
+            return rng.randrange(config.heavy_agents)
+        light = rng.choices(range(len(self.agent_weights)), cum_weights=self.agent_weights)[0]
+        return min(config.heavy_agents + light, config.agents - 1)
+
+    def orders(self, chunk: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return (order items, chat room items) for one chunk"""
+        from app.repositories.order_repository import shard_for, sharded_key
+
+        config = self.config
+        rng = random.Random(f"{config.seed}:orders:{chunk}")
+        start = chunk * config.chunk_size
+        stop = min(start + config.chunk_size, config.orders)
+        orders, rooms = [], []
+        for n in range(start, stop):
+            agent_index = self._agent(rng)
+            renter_index = rng.randrange(config.renters)
+            landlord_index = rng.choices(range(config.landlords), cum_weights=self.landlord_weights)[0]
+            agent = user_email("agent", agent_index)
+            renter = user_email("renter", renter_index)
+            landlord = user_email("landlord", landlord_index)
+
+            age_days = rng.random() * config.days
+            created = self.end - timedelta(days=age_days)
+            age_share = age_days / config.days if config.days else 0.0
+            roll = rng.random()
+            if roll < 0.15 + 0.7 * age_share:
+                status, completed_stages = "completed", len(STAGES)
+            elif roll < 0.55 + 0.35 * age_share:
+                status, completed_stages = "in_progress", rng.randint(2, len(STAGES) - 1)
+            else:
+                status, completed_stages = "pending", 1
+            updated = min(created + timedelta(days=rng.random() * 60), self.end)
+
+            stages = []
+            for index, (stage, title) in enumerate(STAGES):
+                entry = {'stage': stage, 'title': title, 'completed': index < completed_stages}
+                if index < completed_stages:
+                    entry['date'] = (created + timedelta(days=index * 3)).isoformat()
+                    if index:
+                        entry['completed_by'] = (agent, renter, landlord, agent, agent)[index]
+                stages.append(entry)
+
+            address = (
+                f"{rng.randint(1, 250)} {rng.choice(STREETS)}, "
+                f"Apartment {rng.randint(1, 40)}{rng.choice('ABCD')}, {rng.choice(CITIES)}"
+            )
+            amount = Decimal(rng.randrange(500, 9000, 50))
+            participants = [
+                {'email': agent, 'role': 'agent', 'name': _user_name("agent", agent_index)},
+                {'email': renter, 'role': 'renter', 'name': _user_name("renter", renter_index)},
+                {'email': landlord, 'role': 'landlord', 'name': _user_name("landlord", landlord_index)},
+            ]
+            created_at, updated_at = created.isoformat(), updated.isoformat()
+            order_id = f"S{n:09d}"
+
+            if rng.random() < config.long_history_fraction:
+                message_count = config.long_history_messages
+            else:
+                message_count = rng.randint(0, config.messages_per_room * 2)
+            messages = []
+            for m in range(message_count):
+                sender = participants[rng.randrange(3)]
+                messages.append({
+                    'sender_email': sender['email'],
+                    'sender_role': sender['role'],
+                    'sender_name': sender['name'],
+                    'text': rng.choice(MESSAGE_TEMPLATES).format(address=address, amount=amount),
+                    'timestamp': (created + timedelta(minutes=m * 17)).isoformat(),
+                })
+
+            room = {
+                'order_id': order_id,
+                'participants': participants,
+                'messages': messages,
+                'message_count': len(messages),
+                'read_cursors': {},
+                'created_at': created_at,
+                'updated_at': messages[-1]['timestamp'] if messages else created_at,
+            }
+            orders.append({
+                'id': order_id,
+                'title': f"Deposit for {address.split(',')[1].strip()} - {address.split(',')[0]}",
+                'renter_email': renter,
+                'landlord_email': landlord,
+                'property_address': address,
+                'deposit_amount': amount,
+                'description': f"Security deposit, lease period {rng.choice((12, 24, 36))} months.",
+                'status': status,
+                'created_by': agent,
+                'progress_stages': stages,
+                # Orders embed the chat room as created (without messages), like OrderService does
+                'chat_room': {**room, 'messages': [], 'message_count': 0, 'updated_at': created_at},
+                'created_at': created_at,
+                'updated_at': updated_at,
+            })
+            # Participant and sparse status index keys, as OrderRepository.to_item writes them
+            for role, email in (("agent", agent), ("renter", renter), ("landlord", landlord)):
+                shard = shard_for(order_id, email)
+                orders[-1][f"{role}_shard_key"] = sharded_key(email, shard)
+                if status != "completed":
+                    orders[-1][f"{role}_status_key"] = sharded_key(f"{email}#{status}", shard)
+            rooms.append(room)
+        return orders, rooms
+
+
+def seed_chunk(config_dict: Dict[str, Any], kind: str, chunk: int, threads: int) -> Tuple[str, int, int]:
+    """Generate and write one chunk; runs in a worker process"""
+    from app.models.domain import ChatRoom, Order
+    from app.utils.batch_writer import ParallelBatchWriter
+    from app.utils.dynamodb import compress_attributes
+
+    generator = _Generator(SeedConfig(**config_dict))
+    written = 0
+    with ParallelBatchWriter(workers=threads) as writer:
+        if kind == "users":
+            for item in generator.users(chunk):
+                writer.put('users', item)
+                written += 1
+        else:
+            orders, rooms = generator.orders(chunk)
+            for order, room in zip(orders, rooms):
+                # Large attributes are stored compressed, as to_dynamodb_dict writes them
+                writer.put('orders', compress_attributes(order, Order.compressed_attributes))
+                writer.put('chat_rooms', compress_attributes(room, ChatRoom.compressed_attributes))
+                written += 1
+    return kind, chunk, written
+
+
+class Checkpoint:
+    """JSON file with the chunks already written for one seed configuration"""
+
+    def __init__(self, path: str, config: SeedConfig):
+        self.path = path
+        self.fingerprint = config.fingerprint()
+        self.completed = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("fingerprint") != self.fingerprint:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to a different seed configuration; "
+                    "delete it or use the original options"
+                )
+            self.completed = {tuple(entry) for entry in data.get("completed", [])}
+
+    def mark(self, kind: str, chunk: int):
+        self.completed.add((kind, chunk))
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "completed": sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def seed_data(config: SeedConfig, processes: int = 4, threads: int = 8, checkpoint_path: str = None) -> int:
+    """Seed the dataset described by config; returns the number of records written"""
+    checkpoint = Checkpoint(checkpoint_path, config)
+    pending = [chunk for chunk in config.chunks() if chunk not in checkpoint.completed]
+    if not pending:
+        logger.info("All chunks already seeded according to the checkpoint")
+        return 0
+    logger.info(
+        f"Seeding {len(pending)} chunks ({len(checkpoint.completed)} already done) "
+        f"with {processes} processes x {threads} writer threads"
+    )
+
+    started = time.perf_counter()
+    total = 0
+    config_dict = asdict(config)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(seed_chunk, config_dict, kind, chunk, threads) for kind, chunk in pending]
+        for future in as_completed(futures):
+            kind, chunk, written = future.result()
+            checkpoint.mark(kind, chunk)
+            total += written
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Seeded {kind} chunk {chunk} ({written} records); "
+                f"{len(checkpoint.completed)}/{len(config.chunks())} chunks, {total / elapsed:.0f} records/s"
+            )
+    return total
+
+
+def parse_args(argv=None):
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(description="Seed a large synthetic Kaution dataset")
+    parser.add_argument("--orders", type=int, default=defaults.orders)
+    parser.add_argument("--agents", type=int, default=defaults.agents)
+    parser.add_argument("--heavy-agents", type=int, default=defaults.heavy_agents,
+                        help="Agents that own --heavy-agent-share of all orders")
+    parser.add_argument("--heavy-agent-share", type=float, default=defaults.heavy_agent_share)
+    parser.add_argument("--renters", type=int, default=defaults.renters)
+    parser.add_argument("--landlords", type=int, default=defaults.landlords)
+    parser.add_argument("--messages-per-room", type=int, default=defaults.messages_per_room,
+                        help="Average chat history length")
+    parser.add_argument("--long-history-fraction", type=float, default=defaults.long_history_fraction,
+                        help="Fraction of chat rooms with a long history")
+    parser.add_argument("--long-history-messages", type=int, default=defaults.long_history_messages)
+    parser.add_argument("--days", type=int, default=defaults.days, help="Time span covered by the orders")
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--threads", type=int, default=8, help="BatchWriteItem workers per process")
+    parser.add_argument("--checkpoint", default="seed_checkpoint.json",
+                        help="Checkpoint file for resuming; empty string disables it")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Add parent directory to path when running as script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from app.core.database import init_tables
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    config = SeedConfig(
+        seed=args.seed,
+        orders=args.orders,
+        chunk_size=args.chunk_size,
+        agents=args.agents,
+        heavy_agents=args.heavy_agents,
+        heavy_agent_share=args.heavy_agent_share,
+        renters=args.renters,
+        landlords=args.landlords,
+        messages_per_room=args.messages_per_room,
+        long_history_fraction=args.long_history_fraction,
+        long_history_messages=args.long_history_messages,
+        days=args.days,
+    )
+
+    print("Initializing DynamoDB tables...")
+    init_tables()
+    written = seed_data(config, args.processes, args.threads, args.checkpoint or None)
+    print("Recounting per-user order counters...")
+    from app.services.order_service import OrderService
+    OrderService.recount_counters(segments=args.processes)
+    print(f"\nSeeding complete! {written} records written.")
@@ -0,0 +1,279 @@
+"""
+Script to snapshot and restore the users, orders and chat_rooms tables
+
+A snapshot is a directory with one sub-directory per table holding gzip
+compressed NDJSON chunk files (items in the DynamoDB attribute value format,
+so every type round-trips exactly) and a manifest.json describing tables,
+files and item counts. Tables are read with a parallel segmented scan, one
+worker per segment, each writing its own chunk files. The snapshot is not a
+point-in-time copy: items written while it runs may or may not be included,
+and the manifest records when the scan started and finished.
+
+Restore writes the chunk files back with parallel BatchWriteItem workers
+(unprocessed items are retried with backoff). Finished files are recorded
+in a checkpoint inside the snapshot directory, so an interrupted restore
+resumes where it stopped; the checkpoint is removed once a restore finishes.
+
+Usage (from the backend/ directory):
+
+    python -m app.scripts.snapshot snapshot backups/2024-06-01 --workers 8
+    python -m app.scripts.snapshot restore backups/2024-06-01 --workers 8
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+TABLES = ['users', 'orders', 'chat_rooms']
+MANIFEST = 'manifest.json'
+CHECKPOINT = 'restore_checkpoint.json'
+
+
+def encode_value(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Make an attribute value JSON-serializable (binary values become base64)"""
+    (kind, inner), = value.items()
+    if kind == 'B':
+        return {'B': base64.b64encode(bytes(inner)).decode('ascii')}
+    if kind == 'BS':
+        return {'BS': [base64.b64encode(bytes(v)).decode('ascii') for v in inner]}
+    if kind == 'M':
+        return {'M': {k: encode_value(v) for k, v in inner.items()}}
+    if kind == 'L':
+        return {'L': [encode_value(v) for v in inner]}
+    return value
+
+
+def decode_value(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of encode_value"""
+    (kind, inner), = value.items()
+    if kind == 'B':
+        return {'B': base64.b64decode(inner)}
+    if kind == 'BS':
+        return {'BS': [base64.b64decode(v) for v in inner]}
+    if kind == 'M':
+        return {'M': {k: decode_value(v) for k, v in inner.items()}}
+    if kind == 'L':
+        return {'L': [decode_value(v) for v in inner]}
+    return value
+
+
+def _write_json(path: str, data: Any):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class _ChunkWriter:
+    """Writes one segment's items into numbered gzip chunk files"""
+
+    def __init__(self, directory: str, table_name: str, segment: int, chunk_items: int):
+        self.directory = directory
+        self.table_name = table_name
+        self.segment = segment
+        self.chunk_items = chunk_items
+        self.files: List[Dict[str, Any]] = []
+        self._file = None
+
+    def write(self, item: Dict[str, Any]):
+        if self._file is None:
+            name = f"{self.table_name}/segment-{self.segment:04d}-{len(self.files):05d}.ndjson.gz"
+            self.files.append({'path': name, 'items': 0})
+            self._file = gzip.open(os.path.join(self.directory, name), "wt", encoding="utf-8")
+        self._file.write(json.dumps({k: encode_value(v) for k, v in item.items()}) + "\n")
+        self.files[-1]['items'] += 1
+        if self.files[-1]['items'] >= self.chunk_items:
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def snapshot_table(directory: str, table_name: str, workers: int, chunk_items: int) -> Dict[str, Any]:
+    """Parallel-scan one table into chunk files; returns its manifest entry"""
+    from app.core.database import get_dynamodb_client
+    from app.utils.parallel_scan import scan_segment_pages
+
+    os.makedirs(os.path.join(directory, table_name), exist_ok=True)
+    description = get_dynamodb_client().describe_table(TableName=table_name)['Table']
+
+    def scan_segment(segment: int) -> List[Dict[str, Any]]:
+        writer = _ChunkWriter(directory, table_name, segment, chunk_items)
+        try:
+            for items in scan_segment_pages(table_name, segment, workers, raw=True):
+                for item in items:
+                    writer.write(item)
+        finally:
+            writer.close()
+        return writer.files
+
+    files = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"snapshot-{table_name}") as pool:
+        for segment_files in pool.map(scan_segment, range(workers)):
+            files.extend(segment_files)
+    return {
+        'key_schema': description['KeySchema'],
+        'items': sum(f['items'] for f in files),
+        'files': files,
+    }
+
+
+def snapshot(directory: str, tables: List[str] = None, workers: int = 4, chunk_items: int = 10000) -> Dict[str, Any]:
+    """Write a snapshot of the given tables into directory; returns the manifest"""
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        raise ValueError(f"{directory} already contains a snapshot")
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'tables': {},
+    }
+    started = time.perf_counter()
+    for table_name in tables or TABLES:
+        table_started = time.perf_counter()
+        manifest['tables'][table_name] = snapshot_table(directory, table_name, workers, chunk_items)
+        elapsed = time.perf_counter() - table_started
+        count = manifest['tables'][table_name]['items']
+        logger.info(f"Snapshot of {table_name}: {count} items in {elapsed:.1f}s ({count / elapsed:.0f} items/s)")
+    manifest['finished_at'] = datetime.now(timezone.utc).isoformat()
+    manifest['duration_s'] = round(time.perf_counter() - started, 3)
+    # The manifest is written last: a directory without one is an incomplete snapshot
+    _write_json(os.path.join(directory, MANIFEST), manifest)
+    return manifest
+
+
+def read_chunk(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield {k: decode_value(v) for k, v in json.loads(line).items()}
+
+
+class RestoreCheckpoint:
+    """Chunk files already restored from one snapshot"""
+
+    def __init__(self, path: Optional[str], manifest: Dict[str, Any]):
+        self.path = path
+        self.snapshot = manifest['started_at']
+        self.completed = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('snapshot') == self.snapshot:
+                self.completed = set(data.get('completed', []))
+
+    def mark(self, chunk_path: str):
+        with self._lock:
+            self.completed.add(chunk_path)
+            if self.path:
+                _write_json(self.path, {'snapshot': self.snapshot, 'completed': sorted(self.completed)})
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def restore_chunk(directory: str, table_name: str, chunk_path: str) -> int:
+    """Write one chunk file back with BatchWriteItem; returns the number of items"""
+    from app.utils.batch_writer import MAX_BATCH_SIZE, batch_write
+
+    batch, written = [], 0
+    for item in read_chunk(os.path.join(directory, chunk_path)):
+        batch.append({'PutRequest': {'Item': item}})
+        if len(batch) == MAX_BATCH_SIZE:
+            batch_write({table_name: batch})
+            written += len(batch)
+            batch = []
+    if batch:
+        batch_write({table_name: batch})
+        written += len(batch)
+    return written
+
+
+def restore(directory: str, tables: List[str] = None, workers: int = 4, checkpoint: bool = True) -> int:
+    """Restore a snapshot (puts overwrite existing items); returns items written"""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    progress = RestoreCheckpoint(os.path.join(directory, CHECKPOINT) if checkpoint else None, manifest)
+
+    pending = [
+        (table_name, chunk['path'])
+        for table_name, entry in manifest['tables'].items()
+        if not tables or table_name in tables
+        for chunk in entry['files']
+        if chunk['path'] not in progress.completed
+    ]
+    if not pending:
+        logger.info("Nothing to restore according to the checkpoint")
+        return 0
+    logger.info(f"Restoring {len(pending)} chunk files ({len(progress.completed)} already done) with {workers} workers")
+
+    started = time.perf_counter()
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="restore") as pool:
+        futures = {
+            pool.submit(restore_chunk, directory, table_name, chunk_path): chunk_path
+            for table_name, chunk_path in pending
+        }
+        for future in as_completed(futures):
+            total += future.result()
+            progress.mark(futures[future])
+            elapsed = time.perf_counter() - started
+            logger.info(f"Restored {futures[future]}; {total} items, {total / elapsed:.0f} items/s")
+    # Finished: a later restore of the same snapshot starts from scratch again
+    progress.clear()
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot or restore the Kaution DynamoDB tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Write the tables to a snapshot directory")
+    snapshot_parser.add_argument("directory")
+    snapshot_parser.add_argument("--tables", default=",".join(TABLES))
+    snapshot_parser.add_argument("--workers", type=int, default=4, help="Parallel scan segments per table")
+    snapshot_parser.add_argument("--chunk-items", type=int, default=10000, help="Items per chunk file")
+
+    restore_parser = subparsers.add_parser("restore", help="Write a snapshot back to the tables")
+    restore_parser.add_argument("directory")
+    restore_parser.add_argument("--tables", default="", help="Restore only these tables (default: all)")
+    restore_parser.add_argument("--workers", type=int, default=4, help="Parallel BatchWriteItem workers")
+    restore_parser.add_argument("--no-checkpoint", action="store_true",
+                                help="Restore every chunk, ignoring and not writing the checkpoint")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Add parent directory to path when running as script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from app.core.database import init_tables
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    if args.command == "snapshot":
+        manifest = snapshot(args.directory, tables, args.workers, args.chunk_items)
+        counts = ", ".join(f"{name}: {entry['items']}" for name, entry in manifest['tables'].items())
+        print(f"\nSnapshot complete! {counts}")
+    else:
+        print("Initializing DynamoDB tables...")
+        init_tables()
+        written = restore(args.directory, tables, args.workers, checkpoint=not args.no_checkpoint)
+        print(f"\nRestore complete! {written} items written.")
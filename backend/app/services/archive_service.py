@@ -0,0 +1,200 @@
+"""
+Archiving of completed orders.
+
+Completed orders not updated for ARCHIVE_AFTER_DAYS are moved, with their
+chat rooms, to the cold store (app.core.cold_store). For each order:
+
+1. The full order and chat room, messages included, are written to the cold
+   store as one compressed blob.
+2. One transaction replaces the order with a stub and deletes the chat room,
+   both conditional on the versions that were read. A concurrent change makes
+   the order wait for the next run; its blob is simply written again.
+
+The stub keeps every attribute the participant indexes, lists, counters and
+reports use (status, participants, amount, dates). It drops the description,
+progress stages and chat room copy and carries archived_at. Per-user queries
+and list polls therefore read only small items, however much history builds
+up. Reading a single archived order (GET /api/orders/{id}, its chat room and
+messages) fetches the blob on demand. Archived orders cannot be changed;
+deleting one deletes its blob too.
+
+Run from the command line (python -m app.scripts.archive_orders) or through
+POST /admin/archive, which starts a run in the background.
+"""
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.models.domain import ChatRoom, Order
+from app.models.enums import OrderStatus
+from app.repositories.archive_repository import ArchiveRepository
+from app.repositories.chat_repository import ChatRepository
+from app.repositories.order_repository import OrderRepository, VersionConflictError
+from app.utils.dynamodb import format_datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED, SKIPPED, CONFLICT, FAILED = 'archived', 'skipped', 'conflict', 'failed'
+
+# Left out of the stub; everything else stays in the orders table
+STUB_DROPPED_FIELDS = {'description', 'progress_stages', 'chat_room'}
+
+ARCHIVE_ORDERS = Counter(
+    "kaution_archive_orders_total",
+    "Orders considered for archiving by result (archived, skipped, conflict, failed)",
+    ("result",)
+)
+ARCHIVE_READS = Counter(
+    "kaution_archive_reads_total",
+    "Archived orders read back from the cold store by result (found, missing)",
+    ("result",)
+)
+
+# The background run started through the admin API
+_run_lock = threading.Lock()
+_run: Dict[str, Any] = {'running': False}
+
+
+class ArchiveService:
+    """Business logic for moving completed orders to the cold store and reading them back"""
+
+    @staticmethod
+    def stub(order: Order, archived_at: str) -> Order:
+        """The small replacement of an archived order in the orders table"""
+        data = order.model_dump(exclude=STUB_DROPPED_FIELDS)
+        data.update(version=order.version + 1, archived_at=archived_at)
+        return Order(**data)
+
+    @staticmethod
+    def archive_order(order_id: str, updated_before: str) -> str:
+        """Archive one order if it still qualifies; returns the result"""
+        order = OrderRepository.find_by_id(order_id)
+        if (
+            order is None
+            or order.archived_at
+            or order.status != OrderStatus.COMPLETED
+            or order.updated_at >= updated_before
+        ):
+            return SKIPPED
+        chat_room = ChatRepository.find_by_order_id(order_id)
+        archived_at = format_datetime(datetime.utcnow())
+        ArchiveRepository.put(order.model_copy(update={'archived_at': archived_at}), chat_room)
+
+        extra_writes, extra_events = [], []
+        if chat_room is not None:
+            action, event = ChatRepository.delete_write(chat_room, check_version=True)
+            extra_writes.append(action)
+            extra_events.append(event)
+        try:
+            OrderRepository.update(
+                ArchiveService.stub(order, archived_at), order,
+                extra_writes=extra_writes, extra_events=extra_events
+            )
+        except VersionConflictError:
+            return CONFLICT
+        return ARCHIVED
+
+    @staticmethod
+    def archive_completed(
+        older_than_days: Optional[int] = None,
+        segments: int = 4,
+        workers: int = 4,
+        limit: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Archive completed orders not updated for older_than_days; counts per result"""
+        if older_than_days is None:
+            older_than_days = settings.ARCHIVE_AFTER_DAYS
+        if older_than_days < 0:
+            raise ValueError("older_than_days must not be negative")
+        updated_before = format_datetime(datetime.utcnow() - timedelta(days=older_than_days))
+
+        def archive(item) -> str:
+            try:
+                return ArchiveService.archive_order(item['id'], updated_before)
+            except Exception as e:
+                logger.error(f"Archiving order {item['id']} failed: {e}")
+                return FAILED
+
+        counts = {ARCHIVED: 0, SKIPPED: 0, CONFLICT: 0, FAILED: 0}
+        items = OrderRepository.scan_archivable(updated_before, segments=segments)
+        try:
+            candidates = islice(items, limit) if limit is not None else items
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive") as pool:
+                while True:
+                    batch = list(islice(candidates, 100))
+                    if not batch:
+                        break
+                    for result in pool.map(archive, batch):
+                        counts[result] += 1
+                        ARCHIVE_ORDERS.inc(result=result)
+        finally:
+            items.close()
+        logger.info(f"Archived completed orders not updated since {updated_before}: {counts}")
+        return counts
+
+    @staticmethod
+    def start_background_run(**kwargs) -> bool:
+        """Run archive_completed on a background thread; False if a run is in progress"""
+        with _run_lock:
+            if _run['running']:
+                return False
+            _run.clear()
+            _run.update(running=True, started_at=format_datetime(datetime.utcnow()), options=kwargs)
+
+        def run():
+            try:
+                counts, error = ArchiveService.archive_completed(**kwargs), None
+            except Exception as e:
+                logger.error(f"Archive run failed: {e}")
+                counts, error = None, str(e)
+            with _run_lock:
+                _run.update(running=False, finished_at=format_datetime(datetime.utcnow()), counts=counts, error=error)
+
+        # A new thread starts without the request's context, so the request deadline does not apply
+        threading.Thread(target=run, name="archive-run", daemon=True).start()
+        return True
+
+    @staticmethod
+    def background_run_status() -> Dict[str, Any]:
+        with _run_lock:
+            return dict(_run)
+
+    @staticmethod
+    def load_archived(stub: Order) -> Order:
+        """The full order behind an archived order's stub, chat room included"""
+        archived = ArchiveRepository.find(stub.id)
+        if archived is None:
+            # The stub is all there is; still better than failing the read
+            ARCHIVE_READS.inc(result='missing')
+            logger.warning(f"Archived order {stub.id} is missing from the cold store")
+            return stub
+        ARCHIVE_READS.inc(result='found')
+        return archived
+
+    @staticmethod
+    def find_order(order_id: str) -> Optional[Order]:
+        """An order with its chat room; archived orders come from the cold store"""
+        order = OrderRepository.find_by_id(order_id)
+        if order is None:
+            return None
+        if order.archived_at:
+            return ArchiveService.load_archived(order)
+        chat_room = ChatRepository.find_by_order_id(order_id)
+        if chat_room:
+            order.chat_room = chat_room
+        return order
+
+    @staticmethod
+    def find_chat_room(order_id: str) -> Optional[ChatRoom]:
+        """A chat room, from the cold store if its order is archived"""
+        chat_room = ChatRepository.find_by_order_id(order_id)
+        if chat_room is not None:
+            return chat_room
+        order = OrderRepository.find_by_id(order_id)
+        if order is None or not order.archived_at:
+            return None
+        return ArchiveService.load_archived(order).chat_room
@@ -0,0 +1,486 @@
+"""
+Full-text search over chat messages with an in-memory inverted index.
+
+Every message is one document: its terms (app.utils.text.tokenize) are
+appended to per-term posting lists of document ids and term frequencies.
+Documents are numbered in the order they were indexed, so posting lists stay
+sorted without ever being rewritten. A query scores the postings of its
+terms with BM25, vectorized with NumPy, after dropping documents of rooms the
+user is not a participant of. Only the positions of the hits are kept; the
+messages of one result page are read with a single BatchGetItem.
+
+The index is kept current incrementally:
+  - messages added by this process are indexed right after their write
+    commits (app.core.events),
+  - an outbox follower indexes the chat room events of all processes. Its
+    positions live with the index, not in outbox_checkpoints, since every
+    API process has its own index.
+Rooms track how many of their messages are indexed, so an event seen twice
+(or both ways) is indexed once. Deleted or reloaded rooms leave their old
+documents behind as tombstones until the next compaction.
+
+The index is saved to CHAT_SEARCH_SNAPSHOT_PATH (compressed, delta-encoded
+postings, with the follower positions) every CHAT_SEARCH_SNAPSHOT_SECONDS.
+At startup it is loaded from there and caught up from the outbox; without a
+snapshot, or one older than the outbox retention, it is rebuilt from a
+parallel scan of the chat_rooms table.
+"""
+from app.core import events as change_events
+from app.core.config import settings
+from app.core.events import ChangeEvent, seq_cutoff, shards
+from app.models.domain import ChatRoom
+from app.models.enums import ChangeType, EntityType
+from app.repositories.chat_repository import ChatRepository
+from app.services.outbox_consumer import LocalConsumer
+from app.utils.dynamodb import decompress_attributes
+from app.utils.text import tokenize
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNAPSHOT_FORMAT = 1
+MAX_TERM_FREQUENCY = 0xFFFF
+# Compact once tombstones make up this share of all documents
+COMPACT_DEAD_RATIO = 0.25
+
+
+class _Room:
+    __slots__ = ('code', 'participants', 'version', 'count')
+
+    def __init__(self, code: int, participants: Iterable[str], version: int, count: int = 0):
+        self.code = code
+        self.participants = frozenset(participants)
+        self.version = version
+        self.count = count  # Messages indexed, i.e. positions 0..count-1
+
+
+def _emails(participants: Iterable[Any]) -> List[str]:
+    return [p['email'] if isinstance(p, dict) else p.email for p in participants]
+
+
+class ChatSearchIndex:
+    """Inverted index of chat messages, scoped by room participants"""
+
+    _STATE = (
+        'rooms', 'room_ids', 'by_email', 'postings', 'doc_room', 'doc_pos', 'doc_len',
+        'size', 'live_docs', 'live_length', 'positions', 'changes', 'saved_changes', 'saved_at'
+    )
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._first_load = threading.Lock()
+        self.rooms: Dict[str, _Room] = {}
+        self.room_ids: List[str] = []  # By room code
+        self.by_email: Dict[str, Set[int]] = {}
+        self.postings: Dict[str, Tuple[array, array]] = {}  # term -> (doc ids, term frequencies)
+        self.doc_room = np.zeros(capacity, dtype=np.int32)
+        self.doc_pos = np.zeros(capacity, dtype=np.int32)
+        self.doc_len = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+        self.live_docs = 0
+        self.live_length = 0
+        self.positions: Dict[str, str] = {}  # Outbox shard -> last applied seq
+        self.changes = 0
+        self.saved_changes = 0
+        self.saved_at: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+
+    # Writes (callers hold the lock)
+
+    def _add_room(self, order_id: str, participants: List[str], version: int) -> _Room:
+        room = self.rooms[order_id] = _Room(len(self.room_ids), participants, version)
+        self.room_ids.append(order_id)
+        for email in room.participants:
+            self.by_email.setdefault(email, set()).add(room.code)
+        return room
+
+    def _drop_room(self, order_id: str):
+        room = self.rooms.pop(order_id, None)
+        if room is None:
+            return
+        for email in room.participants:
+            codes = self.by_email.get(email)
+            if codes is not None:
+                codes.discard(room.code)
+                if not codes:
+                    del self.by_email[email]
+        docs = np.flatnonzero(self.doc_room[:self.size] == room.code)
+        self.live_docs -= len(docs)
+        self.live_length -= int(self.doc_len[docs].sum())
+        self.changes += 1
+
+    def _set_participants(self, room: _Room, participants: List[str]):
+        participants = frozenset(participants)
+        for email in room.participants - participants:
+            codes = self.by_email.get(email)
+            if codes is not None:
+                codes.discard(room.code)
+                if not codes:
+                    del self.by_email[email]
+        for email in participants - room.participants:
+            self.by_email.setdefault(email, set()).add(room.code)
+        room.participants = participants
+
+    def _add_message(self, room: _Room, text: str):
+        if self.size == len(self.doc_room):
+            for name in ('doc_room', 'doc_pos', 'doc_len'):
+                column = getattr(self, name)
+                setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+        doc = self.size
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.doc_room[doc] = room.code
+        self.doc_pos[doc] = room.count
+        self.doc_len[doc] = length
+        for term, frequency in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array('i'), array('H'))
+            posting[0].append(doc)
+            posting[1].append(min(frequency, MAX_TERM_FREQUENCY))
+        self.size += 1
+        self.live_docs += 1
+        self.live_length += length
+        room.count += 1
+        self.changes += 1
+
+    def put_room(self, item: Dict[str, Any]):
+        """(Re)index a whole chat room item (order_id, participants, version, messages)"""
+        with self._lock:
+            self._drop_room(item['order_id'])
+            room = self._add_room(item['order_id'], _emails(item.get('participants', [])), int(item.get('version', 1)))
+            for message in item.get('messages', []):
+                self._add_message(room, message['text'] if isinstance(message, dict) else message.text)
+
+    def remove_room(self, order_id: str):
+        with self._lock:
+            self._drop_room(order_id)
+
+    def apply(self, event: ChangeEvent) -> bool:
+        """Index the messages a chat room event added; False if earlier messages are missing
+
+        Events that were applied before (or whose messages a reload already
+        indexed) change nothing.
+        """
+        with self._lock:
+            if event.change == ChangeType.DELETED:
+                room = self.rooms.get(event.key)
+                if room is not None and (event.before_version or 0) >= room.version:
+                    self._drop_room(event.key)
+                return True
+            added = event.details.get('messages_added', [])
+            total = int(event.after.get('message_count', len(added)))
+            first = total - len(added)
+            room = self.rooms.get(event.key)
+            if room is None:
+                if first > 0:
+                    return False
+                room = self._add_room(event.key, _emails(event.after.get('participants', [])), event.after_version or 1)
+            elif (event.after_version or 0) > room.version:
+                self._set_participants(room, _emails(event.after.get('participants', [])))
+                room.version = event.after_version
+            if first > room.count:
+                return False
+            for message in added[room.count - first:]:
+                self._add_message(room, message['text'])
+            return True
+
+    # Reads
+
+    def search(self, query: str, email: str, limit: int, offset: int = 0) -> Tuple[int, List[Tuple[str, int, float]]]:
+        """Total hit count and one page of (order_id, message position, score), best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            codes = self.by_email.get(email)
+            if not terms or not codes or not self.live_docs:
+                return 0, []
+            allowed = np.zeros(len(self.room_ids), dtype=bool)
+            allowed[list(codes)] = True
+            average_length = max(self.live_length / self.live_docs, 1.0)
+            matched_docs, matched_scores = [], []
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                docs = np.frombuffer(posting[0], dtype=np.int32, count=len(posting[0]))
+                frequencies = np.frombuffer(posting[1], dtype=np.uint16, count=len(posting[1])).astype(np.float64)
+                idf = math.log(1 + (self.live_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                keep = allowed[self.doc_room[docs]]
+                docs, frequencies = docs[keep], frequencies[keep]
+                norm = K1 * (1 - B + B * self.doc_len[docs] / average_length)
+                matched_docs.append(docs)
+                matched_scores.append(idf * frequencies * (K1 + 1) / (frequencies + norm))
+            if not matched_docs:
+                return 0, []
+            docs, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+            # Best score first, newer messages first among equal scores
+            ranked = np.lexsort((-docs, -scores))[offset:offset + limit]
+            page = [
+                (self.room_ids[self.doc_room[doc]], int(self.doc_pos[doc]), round(float(score), 4))
+                for doc, score in zip(docs[ranked], scores[ranked])
+            ]
+            return len(docs), page
+
+    # Compaction and snapshots
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Live rooms and documents as flat arrays; tombstones are dropped and documents renumbered"""
+        with self._lock:
+            order_ids = list(self.rooms)
+            rooms = [self.rooms[order_id] for order_id in order_ids]
+            new_codes = np.full(len(self.room_ids), -1, dtype=np.int32)
+            new_codes[[room.code for room in rooms]] = np.arange(len(rooms), dtype=np.int32)
+            doc_room = new_codes[self.doc_room[:self.size]]
+            live = doc_room >= 0
+            new_ids = np.cumsum(live, dtype=np.int64) - 1
+
+            terms, lengths, doc_chunks, frequency_chunks = [], [], [], []
+            for term, (docs, frequencies) in self.postings.items():
+                docs = np.frombuffer(docs, dtype=np.int32, count=len(docs))
+                keep = live[docs]
+                if not keep.any():
+                    continue
+                terms.append(term)
+                lengths.append(int(keep.sum()))
+                doc_chunks.append(new_ids[docs[keep]])
+                frequency_chunks.append(np.frombuffer(frequencies, dtype=np.uint16, count=len(frequencies))[keep])
+            docs = np.concatenate(doc_chunks) if doc_chunks else np.zeros(0, dtype=np.int64)
+            lengths = np.array(lengths, dtype=np.int64)
+            # Delta-encode each posting list; small gaps compress well
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64) if len(lengths) else lengths
+            deltas = docs.copy()
+            deltas[1:] -= docs[:-1]
+            deltas[starts] = docs[starts]
+
+            participants = [sorted(room.participants) for room in rooms]
+            meta = {
+                'format': SNAPSHOT_FORMAT,
+                'positions': self.positions,
+                'saved_at': time.time(),
+            }
+            return {
+                'meta': np.array(json.dumps(meta)),
+                'room_ids': np.array(order_ids, dtype=str),
+                'room_versions': np.array([room.version for room in rooms], dtype=np.int64),
+                'room_counts': np.array([room.count for room in rooms], dtype=np.int32),
+                'participant_counts': np.array([len(p) for p in participants], dtype=np.int32),
+                'participants': np.array([email for p in participants for email in p], dtype=str),
+                'terms': np.array(terms, dtype=str),
+                'term_lengths': lengths,
+                'doc_deltas': deltas.astype(np.uint32),
+                'frequencies': np.concatenate(frequency_chunks) if frequency_chunks else np.zeros(0, dtype=np.uint16),
+                'doc_room': doc_room[live],
+                'doc_pos': self.doc_pos[:self.size][live],
+                'doc_len': self.doc_len[:self.size][live],
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ChatSearchIndex":
+        meta = json.loads(str(arrays['meta']))
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported chat search snapshot format: {meta.get('format')}")
+        size = len(arrays['doc_room'])
+        index = cls(capacity=max(1024, size))
+        participants = iter(arrays['participants'].tolist())
+        for order_id, version, count, participant_count in zip(
+            arrays['room_ids'].tolist(), arrays['room_versions'].tolist(),
+            arrays['room_counts'].tolist(), arrays['participant_counts'].tolist()
+        ):
+            room = index._add_room(order_id, [next(participants) for _ in range(participant_count)], version)
+            room.count = count
+        index.doc_room[:size] = arrays['doc_room']
+        index.doc_pos[:size] = arrays['doc_pos']
+        index.doc_len[:size] = arrays['doc_len']
+        index.size = index.live_docs = size
+        index.live_length = int(arrays['doc_len'].sum())
+
+        lengths = arrays['term_lengths']
+        docs = np.cumsum(arrays['doc_deltas'], dtype=np.int64)
+        if len(lengths):
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+            # Undo the delta encoding: subtract the running total from before each list
+            docs -= np.repeat(docs[starts] - arrays['doc_deltas'][starts], lengths)
+        docs = docs.astype(np.int32)
+        frequencies = arrays['frequencies'].astype(np.uint16)
+        start = 0
+        for term, length in zip(arrays['terms'].tolist(), lengths.tolist()):
+            index.postings[term] = (
+                array('i', docs[start:start + length].tobytes()),
+                array('H', frequencies[start:start + length].tobytes())
+            )
+            start += length
+        index.positions = dict(meta.get('positions', {}))
+        index.saved_at = meta.get('saved_at')
+        return index
+
+    def _swap(self, fresh: "ChatSearchIndex"):
+        with self._lock:
+            for name in self._STATE:
+                setattr(self, name, getattr(fresh, name))
+
+    def compact(self):
+        """Drop tombstoned documents"""
+        with self._lock:
+            changes, saved_changes = self.changes, self.saved_changes
+            self._swap(ChatSearchIndex.from_arrays(self.to_arrays()))
+            self.changes, self.saved_changes = changes, saved_changes
+
+    @property
+    def dead_docs(self) -> int:
+        return self.size - self.live_docs
+
+    def save(self, path: str):
+        """Write a compressed snapshot (atomically replacing the previous one)"""
+        with self._lock:
+            arrays = self.to_arrays()
+            changes = self.changes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporary, path)
+        with self._lock:
+            self.saved_changes = changes
+            self.saved_at = time.time()
+
+    @classmethod
+    def read(cls, path: str) -> "ChatSearchIndex":
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls.from_arrays({name: arrays[name] for name in arrays.files})
+
+    # Loading
+
+    def _read_snapshot(self) -> Optional["ChatSearchIndex"]:
+        path = settings.CHAT_SEARCH_SNAPSHOT_PATH
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            fresh = ChatSearchIndex.read(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable chat search snapshot {path}: {e}")
+            return None
+        # Events older than the retention are gone from the outbox; catching up would miss them
+        if fresh.saved_at is None or time.time() - fresh.saved_at > (settings.OUTBOX_RETENTION_DAYS - 1) * 86400:
+            logger.info(f"Chat search snapshot {path} is too old to catch up, rebuilding")
+            return None
+        return fresh
+
+    def load(self):
+        """Load the snapshot, or rebuild from a parallel scan of the chat rooms"""
+        started = time.perf_counter()
+        fresh = self._read_snapshot()
+        source = 'snapshot'
+        if fresh is None:
+            source = 'scan'
+            fresh = ChatSearchIndex()
+            # Events from here on are replayed by the follower; rooms already scanned ignore them
+            start = seq_cutoff(settings.OUTBOX_SETTLE_SECONDS)
+            fresh.positions = {shard: start for shard in shards([EntityType.CHAT_ROOM])}
+            for item in ChatRepository.scan_for_search(
+                segments=settings.EXPORT_SCAN_SEGMENTS,
+                page_size=settings.EXPORT_SCAN_PAGE_SIZE
+            ):
+                fresh.put_room(decompress_attributes(item, ChatRoom.compressed_attributes))
+            fresh.changes = 1  # Not saved yet
+        with self._lock:
+            self._swap(fresh)
+            self.loaded_at = time.time()
+        logger.info(
+            f"Chat search index loaded from {source}: {self.live_docs} messages, "
+            f"{len(self.postings)} terms in {time.perf_counter() - started:.2f}s"
+        )
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            # Concurrent first requests wait for one load instead of searching an empty index
+            with self._first_load:
+                if self.loaded_at is None:
+                    self.load()
+
+    def maintain(self):
+        """Compact when tombstones pile up; save a snapshot when due"""
+        if self.dead_docs > COMPACT_DEAD_RATIO * max(self.size, 1):
+            self.compact()
+        path = settings.CHAT_SEARCH_SNAPSHOT_PATH
+        if (
+            path and self.changes != self.saved_changes
+            and time.time() - (self.saved_at or 0) >= settings.CHAT_SEARCH_SNAPSHOT_SECONDS
+        ):
+            self.save(path)
+
+
+chat_index = ChatSearchIndex()
+
+
+def _apply_events(events: List[ChangeEvent]):
+    for event in events:
+        if not chat_index.apply(event):
+            # Messages before this event are missing (e.g. the room was created before a rebuild started)
+            room = ChatRepository.find_by_order_id(event.key)
+            if room is not None:
+                chat_index.put_room(room.model_dump())
+            else:
+                chat_index.remove_room(event.key)
+
+
+follower = LocalConsumer("chat-search", _apply_events, [EntityType.CHAT_ROOM], chat_index)
+
+
+def _apply_change(event: ChangeEvent):
+    # Messages of this process become searchable right away; on a gap the follower catches up
+    if chat_index.loaded_at is not None:
+        chat_index.apply(event)
+
+
+change_events.subscribe(_apply_change, EntityType.CHAT_ROOM)
+
+
+class ChatSearchService:
+    """Business logic for chat search"""
+
+    @staticmethod
+    def start():
+        """Load the index and follow the outbox (every API process keeps its own index)"""
+        if not settings.CHAT_SEARCH_ENABLED:
+            return
+        chat_index.ensure_loaded()
+        follower.start()
+
+    @staticmethod
+    def search(query: str, user_email: str, limit: int, offset: int = 0) -> Dict[str, Any]:
+        """Messages matching the query in the user's chat rooms, best match first"""
+        if not settings.CHAT_SEARCH_ENABLED:
+            raise ValueError("Chat search is disabled")
+        chat_index.ensure_loaded()
+        total, page = chat_index.search(query, user_email, limit, offset)
+        positions: Dict[str, List[int]] = {}
+        for order_id, position, _ in page:
+            positions.setdefault(order_id, []).append(position)
+        messages = ChatRepository.find_messages(positions) if positions else {}
+        items = [
+            {'order_id': order_id, 'position': position, 'score': score, 'message': messages[(order_id, position)]}
+            for order_id, position, score in page
+            if (order_id, position) in messages
+        ]
+        return {
+            'query': query,
+            'total': total,
+            'items': items,
+            'next_offset': offset + limit if offset + limit < total else None,
+        }
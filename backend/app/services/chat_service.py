@@ -4,8 +4,9 @@ from app.repositories.user_repository import UserRepository
 from app.models.domain import ChatRoom, ChatParticipant, ChatMessage
 from app.models.enums import UserRole
 from app.utils.dynamodb import format_datetime
+from app.utils.transactions import VersionConflictError
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 
 class ChatService:
@@ -61,36 +62,88 @@ class ChatService:
         sender_email: str,
         sender_role: UserRole,
         sender_name: str,
-        text: str
+        text: str,
+        max_attempts: int = 5
     ) -> ChatMessage:
         """Add a message to a chat room"""
-        chat_room = ChatRepository.find_by_order_id(order_id)
+        for attempt in range(max_attempts):
+            previous = ChatRepository.find_by_order_id(order_id)
+            if not previous:
+                raise ValueError("Chat room not found")
+            
+            # Verify sender is a participant
+            participant = next(
+                (p for p in previous.participants if p.email == sender_email),
+                None
+            )
+            if not participant:
+                raise ValueError("User is not a participant in this chat room")
+            
+            # Create message
+            new_message = ChatMessage(
+                sender_email=sender_email,
+                sender_role=sender_role,
+                sender_name=sender_name,
+                text=text,
+                timestamp=format_datetime(datetime.utcnow())
+            )
+            
+            # Add message to chat room; a message posted concurrently makes us re-read and retry
+            chat_room = previous.model_copy(deep=True)
+            chat_room.messages.append(new_message)
+            chat_room.message_count = len(chat_room.messages)
+            # The sender has read everything up to their own message
+            chat_room.read_cursors[sender_email] = chat_room.message_count
+            chat_room.updated_at = format_datetime(datetime.utcnow())
+            chat_room.version = previous.version + 1
+            try:
+                ChatRepository.update(chat_room, previous)
+                break
+            except VersionConflictError:
+                if attempt == max_attempts - 1:
+                    raise
+        
+        return new_message
+    
+    @staticmethod
+    def mark_read(order_id: str, user_email: str, count: Optional[int] = None) -> ChatRoom:
+        """Mark the first count messages (default: all) read for a participant; returns the room summary"""
+        chat_room = ChatRepository.find_summaries([order_id]).get(order_id)
         if not chat_room:
             raise ValueError("Chat room not found")
-        
-        # Verify sender is a participant
-        participant = next(
-            (p for p in chat_room.participants if p.email == sender_email),
-            None
-        )
-        if not participant:
+        if not any(p.email == user_email for p in chat_room.participants):
             raise ValueError("User is not a participant in this chat room")
-        
-        # Create message
-        new_message = ChatMessage(
-            sender_email=sender_email,
-            sender_role=sender_role,
-            sender_name=sender_name,
-            text=text,
-            timestamp=format_datetime(datetime.utcnow())
-        )
-        
-        # Add message to chat room
-        chat_room.messages.append(new_message)
-        chat_room.updated_at = format_datetime(datetime.utcnow())
-        ChatRepository.update(chat_room)
-        
-        return new_message
+        count = chat_room.message_count if count is None else min(max(count, 0), chat_room.message_count)
+        if ChatRepository.mark_read(order_id, user_email, count):
+            chat_room.read_cursors[user_email] = count
+        return chat_room
+    
+    @staticmethod
+    def summary(chat_room: ChatRoom, user_email: str) -> dict:
+        return {
+            'order_id': chat_room.order_id,
+            'participants': chat_room.participants,
+            'message_count': chat_room.message_count,
+            'unread': chat_room.unread_for(user_email),
+            'updated_at': chat_room.updated_at,
+        }
+    
+    @staticmethod
+    def get_user_chat_room_summaries(user_email: str) -> List[ChatRoom]:
+        """Chat rooms of a user without message bodies, most recently active first"""
+        rooms = ChatRepository.find_summaries(ChatService._user_order_ids(user_email)).values()
+        return sorted(rooms, key=lambda room: room.updated_at, reverse=True)
+    
+    @staticmethod
+    def _user_order_ids(user_email: str) -> set:
+        order_ids = set()
+        for orders in (
+            OrderRepository.find_by_created_by(user_email),
+            OrderRepository.find_by_renter_email(user_email),
+            OrderRepository.find_by_landlord_email(user_email),
+        ):
+            order_ids.update(order.id for order in orders)
+        return order_ids
     
     @staticmethod
     def get_user_chat_rooms(user_email: str) -> List[ChatRoom]:
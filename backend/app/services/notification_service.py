@@ -0,0 +1,123 @@
+"""
+Notification inboxes, filled by fan-out on write.
+
+An outbox consumer turns order status and stage changes and new chat
+messages into one notification per participant (agent, renter, landlord;
+not the person who caused it) and stores them in each recipient's inbox.
+Reading an inbox is then one query, however many orders the user has.
+Redelivered events produce the same notification ids and are skipped.
+"""
+from app.core.events import ChangeEvent
+from app.models.domain import Notification
+from app.models.enums import ChangeType, EntityType, NotificationType, UserRole
+from app.repositories.notification_repository import NotificationRepository
+from app.services import outbox_consumer
+from app.utils.dynamodb import format_datetime
+from botocore.exceptions import ClientError
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_TEXT_LENGTH = 200
+
+
+def _label(value: str) -> str:
+    return value.replace('_', ' ')
+
+
+class NotificationService:
+    """Business logic for notifications"""
+
+    @staticmethod
+    def notifications_for(event: ChangeEvent) -> List[Notification]:
+        """Notifications caused by one change event"""
+        if event.change != ChangeType.UPDATED:
+            return []
+        if event.entity == EntityType.ORDER:
+            recipients = [
+                (event.after['created_by'], UserRole.AGENT),
+                (event.after['renter_email'], UserRole.RENTER),
+                (event.after['landlord_email'], UserRole.LANDLORD),
+            ]
+            changes = NotificationService._order_changes(event.before, event.after)
+        elif event.entity == EntityType.CHAT_ROOM:
+            recipients = [(p['email'], UserRole(p['role'])) for p in event.after.get('participants', [])]
+            changes = [
+                (NotificationType.MESSAGE, f"{m['sender_name']}: {m['text']}", m['sender_email'])
+                for m in event.details.get('messages_added', [])
+            ]
+        else:
+            return []
+
+        created_at = format_datetime(datetime.utcfromtimestamp(event.occurred_at))
+        notifications = []
+        for index, (kind, text, actor) in enumerate(changes):
+            if len(text) > MAX_TEXT_LENGTH:
+                text = text[:MAX_TEXT_LENGTH - 1] + '…'
+            for email, role in recipients:
+                if email == actor:
+                    continue
+                notifications.append(Notification(
+                    id=f"{event.seq}.{index:03d}",
+                    recipient_email=email,
+                    recipient_role=role,
+                    type=kind,
+                    order_id=event.key,
+                    text=text,
+                    actor_email=actor,
+                    created_at=created_at
+                ))
+        return notifications
+
+    @staticmethod
+    def _order_changes(before: Dict[str, Any], after: Dict[str, Any]) -> List[Tuple[NotificationType, str, Optional[str]]]:
+        title = after.get('title', after['id'])
+        changes = []
+        if before.get('status') != after.get('status'):
+            changes.append((NotificationType.STATUS_CHANGED, f'Order "{title}" is now {_label(after["status"])}', None))
+        completed_before = {s['stage'] for s in before.get('progress_stages', []) if s.get('completed')}
+        for stage in after.get('progress_stages', []):
+            if stage.get('completed') and stage['stage'] not in completed_before:
+                changes.append((
+                    NotificationType.STAGE_COMPLETED,
+                    f'{stage.get("title") or _label(stage["stage"])} completed for order "{title}"',
+                    stage.get('completed_by')
+                ))
+        return changes
+
+    @staticmethod
+    def deliver(events: List[ChangeEvent]):
+        """Outbox consumer handler: fan every event out to its recipients' inboxes"""
+        for event in events:
+            for notification in NotificationService.notifications_for(event):
+                NotificationRepository.add(notification)
+
+    @staticmethod
+    def get_inbox(email: str, role: UserRole, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        notifications, unread, read_up_to, next_cursor = NotificationRepository.find_page(email, role, limit, before)
+        return {
+            'items': [
+                {**n.model_dump(), 'read': read_up_to is not None and n.id <= read_up_to}
+                for n in notifications
+            ],
+            'unread': unread,
+            'next_cursor': next_cursor,
+        }
+
+    @staticmethod
+    def mark_all_read(email: str, role: UserRole) -> int:
+        """Mark the inbox read up to its newest entry; returns the remaining unread count"""
+        notifications, unread, read_up_to, _ = NotificationRepository.find_page(email, role, limit=1)
+        if not notifications or (read_up_to is not None and notifications[0].id <= read_up_to):
+            return unread
+        try:
+            return NotificationRepository.mark_read(email, role, notifications[0].id, unread)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        # Marked read further by a concurrent request
+        return NotificationRepository.find_page(email, role, limit=1)[1]
+
+
+outbox_consumer.register(outbox_consumer.OutboxConsumer(
+    "notifications", NotificationService.deliver, [EntityType.ORDER, EntityType.CHAT_ROOM]
+))
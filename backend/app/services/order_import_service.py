@@ -0,0 +1,321 @@
+"""
+Bulk order import from streamed CSV or NDJSON uploads.
+
+The upload is parsed incrementally (one record at a time, never the whole
+body), every row is validated against OrderCreate, participant names are
+resolved once per distinct email with BatchGetItem, and orders plus their
+chat rooms are written through a parallel BatchWriteItem pipeline. A result
+line per row is produced as soon as that row's batch has been written.
+"""
+from app.core import events as change_events
+from app.core.config import settings
+from app.core.events import ChangeEvent
+from app.models.domain import Order
+from app.models.enums import EntityType, UserRole
+from app.repositories.counter_repository import CounterRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.user_repository import UserRepository
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.utils.batch_writer import MAX_BATCH_SIZE, ParallelBatchWriter, serialize_item
+from app.utils.dynamodb import to_dynamodb_dict
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": FORMAT_CSV,
+    "application/csv": FORMAT_CSV,
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/ndjson": FORMAT_NDJSON,
+    "application/jsonl": FORMAT_NDJSON,
+    "application/json-lines": FORMAT_NDJSON,
+}
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be parsed at all (as opposed to a single bad row)"""
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick csv or ndjson from an explicit choice or the Content-Type header"""
+    if requested:
+        requested = requested.lower()
+        if requested not in (FORMAT_CSV, FORMAT_NDJSON):
+            raise ImportFormatError(f"Unsupported format: {requested}. Use csv or ndjson")
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CONTENT_TYPE_FORMATS:
+        return CONTENT_TYPE_FORMATS[media_type]
+    raise ImportFormatError(
+        "Cannot detect upload format; send Content-Type text/csv or application/x-ndjson, "
+        "or pass format=csv|ndjson"
+    )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering more than one line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row number, row dict) from a CSV stream with a header line
+
+    Quoted fields may contain newlines: physical lines are joined until the
+    quotes balance, then the record is handed to the csv module.
+    """
+    header = None
+    record = ""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values))
+    if record:
+        raise ImportFormatError("Upload ends inside a quoted CSV field")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, parsed JSON or parse error message) per non-empty line"""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, ImportFormatError(f"Invalid JSON: {e.msg}")
+
+
+def _validate(raw: Any) -> Tuple[Optional[OrderCreate], Optional[List[str]]]:
+    if isinstance(raw, Exception):
+        return None, [str(raw)]
+    if not isinstance(raw, dict):
+        return None, ["Row must be an object"]
+    # CSV gives empty strings for missing optional values
+    row = {key: (None if value == "" else value) for key, value in raw.items() if key}
+    try:
+        return OrderCreate(**row), None
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error['loc'] else error['msg']
+            for error in e.errors()
+        ]
+
+
+class _Batch:
+    """Rows whose orders, chat rooms and change events are written together"""
+
+    def __init__(self, rows: List[Tuple[int, str]], orders: List[Order], events: List[ChangeEvent], parts: int):
+        self.rows = rows  # (row number, order id)
+        self.orders = orders
+        self.events = events
+        self.remaining = parts  # orders batch + chat rooms batch + outbox batches
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def done(self, error: Optional[BaseException]) -> bool:
+        """Record one written part; True once all parts finished"""
+        with self._lock:
+            if error is not None and self.error is None:
+                self.error = error
+            self.remaining -= 1
+            return self.remaining == 0
+
+
+class OrderImportService:
+    """Business logic for bulk order imports"""
+
+    def __init__(self, created_by: str, workers: Optional[int] = None, creator_name: Optional[str] = None):
+        self.created_by = created_by
+        self.workers = workers or settings.BULK_IMPORT_WORKERS
+        self.names: Dict[Tuple[str, UserRole], str] = {}
+        if creator_name is not None:
+            # Known from the caller's token
+            self.names[(created_by, UserRole.AGENT)] = creator_name
+        self.created = 0
+        self.failed = 0
+
+    @staticmethod
+    def verify_creator(created_by: str):
+        """Only agents can create orders"""
+        users = UserRepository.find_by_email(created_by)
+        if not any(u.role == UserRole.AGENT for u in users):
+            raise ValueError("Only agents can create orders")
+
+    def _resolve_names(self, orders: List[OrderCreate]):
+        """Fetch names for participants not seen earlier in this import"""
+        wanted = {(self.created_by, UserRole.AGENT)}
+        for order in orders:
+            wanted.add((order.renter_email, UserRole.RENTER))
+            wanted.add((order.landlord_email, UserRole.LANDLORD))
+        missing = [key for key in wanted if key not in self.names]
+        if not missing:
+            return
+        found = UserRepository.find_names(missing)
+        for key in missing:
+            self.names[key] = found.get(key) or OrderService.default_user_name(key[0])
+
+    @staticmethod
+    def _new_order_id() -> str:
+        # BatchWriteItem puts cannot be conditional, so a short id that collides
+        # with a stored order would silently replace it; a full UUID cannot collide
+        return uuid.uuid4().hex
+
+    def _build_items(self, rows: List[Tuple[int, OrderCreate]]):
+        """Build serialized order and chat room items, (row, order id) pairs, the orders and their events"""
+        self._resolve_names([order for _, order in rows])
+        order_items, room_items, written_rows, orders, events = [], [], [], [], []
+        for row_number, data in rows:
+            order_id = self._new_order_id()
+            order = OrderService.build_order(
+                order_id=order_id,
+                title=data.title,
+                renter_email=data.renter_email,
+                landlord_email=data.landlord_email,
+                property_address=data.property_address,
+                deposit_amount=data.deposit_amount,
+                description=data.description,
+                created_by=self.created_by
+            )
+            chat_room = OrderService.build_chat_room(
+                order_id, self.created_by, data.renter_email, data.landlord_email,
+                lambda email, role: self.names[(email, role)]
+            )
+            order.chat_room = chat_room
+            order_items.append({'PutRequest': {'Item': serialize_item(OrderRepository.to_item(order))}})
+            room_items.append({'PutRequest': {'Item': serialize_item(to_dynamodb_dict(chat_room))}})
+            written_rows.append((row_number, order_id))
+            orders.append(order)
+            events.append(change_events.change(EntityType.ORDER, order_id, None, order))
+            events.append(change_events.change(EntityType.CHAT_ROOM, order_id, None, chat_room))
+        return order_items, room_items, written_rows, orders, events
+
+    @staticmethod
+    def _count(orders: List[Order]):
+        """Add a written batch to the per-user counters (one ADD per participant)"""
+        try:
+            CounterRepository.apply(OrderService.summed_counter_deltas(orders))
+        except Exception as e:
+            logger.error(f"Failed to update counters for {len(orders)} imported orders: {e}")
+
+    async def run(self, chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[str]:
+        """Import a stream; yields one NDJSON result line per row, then a summary"""
+        loop = asyncio.get_running_loop()
+        finished: asyncio.Queue = asyncio.Queue()
+        in_flight = 0
+        rows: List[Tuple[int, OrderCreate]] = []
+        records = iter_csv_records(chunks) if fmt == FORMAT_CSV else iter_ndjson_records(chunks)
+        writer = ParallelBatchWriter(workers=self.workers)
+
+        def on_written(batch: _Batch, error: Optional[BaseException]):
+            # Runs on a writer thread
+            if batch.done(error):
+                if batch.error is None:
+                    self._count(batch.orders)
+                    change_events.publish(batch.events)
+                loop.call_soon_threadsafe(finished.put_nowait, batch)
+
+        async def submit(pending_rows):
+            order_items, room_items, written_rows, orders, events = await run_in_threadpool(
+                self._build_items, pending_rows
+            )
+            # Not one transaction like single writes: an order can land without its events if a part fails
+            event_items = [
+                {'PutRequest': {'Item': serialize_item(change_events.to_outbox_item(event))}} for event in events
+            ]
+            event_batches = [
+                event_items[start:start + MAX_BATCH_SIZE] for start in range(0, len(event_items), MAX_BATCH_SIZE)
+            ]
+            batch = _Batch(written_rows, orders, events, 2 + len(event_batches))
+            await run_in_threadpool(writer.submit, 'orders', order_items, lambda e: on_written(batch, e))
+            await run_in_threadpool(writer.submit, 'chat_rooms', room_items, lambda e: on_written(batch, e))
+            for requests in event_batches:
+                await run_in_threadpool(
+                    writer.submit, change_events.OUTBOX_TABLE, requests, lambda e: on_written(batch, e)
+                )
+
+        def results(batch: _Batch) -> List[str]:
+            if batch.error is None:
+                self.created += len(batch.rows)
+                return [self._line(row=row, status="created", id=order_id) for row, order_id in batch.rows]
+            self.failed += len(batch.rows)
+            return [
+                self._line(row=row, status="error", errors=[f"Write failed: {batch.error}"])
+                for row, _ in batch.rows
+            ]
+
+        try:
+            try:
+                async for row_number, raw in records:
+                    if row_number > settings.BULK_IMPORT_MAX_ROWS:
+                        yield self._line(status="aborted", errors=[
+                            f"Import is limited to {settings.BULK_IMPORT_MAX_ROWS} rows"
+                        ])
+                        break
+                    data, errors = _validate(raw)
+                    if errors:
+                        self.failed += 1
+                        yield self._line(row=row_number, status="error", errors=errors)
+                    else:
+                        rows.append((row_number, data))
+                    if len(rows) == MAX_BATCH_SIZE:
+                        await submit(rows)
+                        rows = []
+                        in_flight += 1
+                    while not finished.empty():
+                        in_flight -= 1
+                        for line in results(finished.get_nowait()):
+                            yield line
+                if rows:
+                    await submit(rows)
+                    in_flight += 1
+            except ImportFormatError as e:
+                yield self._line(status="aborted", errors=[str(e)])
+            except Exception as e:
+                yield self._line(status="aborted", errors=[f"Error during import: {str(e)}"])
+
+            # Report the batches still being written
+            while in_flight:
+                batch = await finished.get()
+                in_flight -= 1
+                for line in results(batch):
+                    yield line
+            yield self._line(summary={"created": self.created, "failed": self.failed})
+        finally:
+            await run_in_threadpool(writer.close)
+
+    @staticmethod
+    def _line(**fields) -> str:
+        return json.dumps(fields) + "\n"
@@ -0,0 +1,314 @@
+"""
+Order lookup by title, address and participant with an in-memory trigram index.
+
+The searchable fields (title, property_address, renter_email, landlord_email)
+are normalized (app.utils.text.normalize, punctuation to spaces) and split
+into words. Every trigram of a word, and its first one and two characters as
+prefix keys ("^m", "^ma"), point to the rows of the orders containing them.
+Each (role, email) pair has a row list as well. All lists are append-only
+arrays sorted by row, because new and changed orders always get a new row;
+the old row is only marked dead.
+
+A query is split into words the same way. A word of three or more characters
+matches orders containing it anywhere (all its trigrams), a shorter one
+orders with a word starting with it. Lookup starts from the shortest list
+(often the user's own orders) and keeps the candidates found in every other
+list by binary search, so the cost depends on the smallest list, not on the
+number of orders. Of a longer word only its two rarest trigrams are used. Candidates are ranked newest first and the words of a
+result are checked against the actual text before it is returned, since
+trigrams of a word can occur in an order without the word itself. The total
+counts candidates and can therefore be slightly too high for long words.
+
+Like the report projection the index is built from a parallel scan on first
+use. Writes of this process are applied right away (app.core.events); an
+outbox follower applies those of other processes.
+"""
+from app.core import events as change_events
+from app.core.config import settings
+from app.core.events import ChangeEvent, seq_cutoff, shards
+from app.models.enums import EntityType, UserRole
+from app.services.outbox_consumer import LocalConsumer
+from app.utils.dynamodb import parse_datetime
+from app.utils.text import normalize
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('title', 'property_address', 'renter_email', 'landlord_email')
+# Fields returned with a hit
+HIT_FIELDS = ('id',) + SEARCH_FIELDS + ('created_by', 'status', 'created_at')
+# A change of anything else than the status moves the order to a new row
+_ROW_FIELDS = tuple(field for field in HIT_FIELDS if field != 'status')
+_SEARCH_COLUMNS = tuple(HIT_FIELDS.index(field) for field in SEARCH_FIELDS)
+ROLE_FIELDS = {UserRole.AGENT: 'created_by', UserRole.RENTER: 'renter_email', UserRole.LANDLORD: 'landlord_email'}
+
+# Rebuild once dead rows make up this share of all rows
+COMPACT_DEAD_RATIO = 0.25
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def words(text: str) -> List[str]:
+    return [word for word in _SEPARATORS.split(normalize(text)) if word]
+
+
+def word_keys(word: str) -> List[str]:
+    """Index keys of a word: its trigrams, and prefix keys for its first two characters"""
+    keys = ['^' + word[:1]]
+    if len(word) > 1:
+        keys.append('^' + word[:2])
+    keys.extend({word[i:i + 3] for i in range(len(word) - 2)})
+    return keys
+
+
+def query_keys(word: str) -> List[str]:
+    """Keys an order must have for a query word to match"""
+    if len(word) < 3:
+        return ['^' + word]
+    return list({word[i:i + 3] for i in range(len(word) - 2)})
+
+
+def _timestamp(created_at: Optional[str]) -> float:
+    try:
+        return parse_datetime(created_at).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OrderSearchIndex:
+    """Trigram and prefix index over the orders' searchable fields"""
+
+    _STATE = ('rows', 'hits', 'versions', 'deleted', 'keys', 'by_user', 'alive', 'created', 'size', 'dead', 'positions')
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._first_load = threading.Lock()
+        self.rows: Dict[str, int] = {}  # Order id -> live row
+        self.hits: List[Optional[Tuple]] = []  # By row, HIT_FIELDS values (None once dead)
+        self.versions: Dict[str, int] = {}
+        self.deleted: Dict[str, int] = {}  # Order id -> version it was deleted at (ignores replayed older events)
+        self.keys: Dict[str, array] = {}
+        self.by_user: Dict[Tuple[str, str], array] = {}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.created = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.dead = 0
+        self.positions: Dict[str, str] = {}  # Outbox shard -> last applied seq
+        self.loaded_at: Optional[float] = None
+
+    # Writes
+
+    def _kill(self, order_id: str):
+        row = self.rows.pop(order_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self.hits[row] = None
+            self.dead += 1
+
+    def _append(self, order: Dict[str, Any]):
+        if self.size == len(self.alive):
+            self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+            self.created = np.concatenate([self.created, np.zeros_like(self.created)])
+        row = self.size
+        self.size += 1
+        self.rows[order['id']] = row
+        self.hits.append(tuple(order.get(field) for field in HIT_FIELDS))
+        self.alive[row] = True
+        self.created[row] = _timestamp(order.get('created_at'))
+        keys: Set[str] = set()
+        for field in SEARCH_FIELDS:
+            for word in words(order.get(field) or ''):
+                keys.update(word_keys(word))
+        for key in keys:
+            rows = self.keys.get(key)
+            if rows is None:
+                rows = self.keys[key] = array('i')
+            rows.append(row)
+        for role, field in ROLE_FIELDS.items():
+            if order.get(field):
+                self.by_user.setdefault((role.value, order[field]), array('i')).append(row)
+
+    def upsert(self, order: Dict[str, Any]):
+        """Index an order (raw item or model dump); versions older than the indexed one are ignored"""
+        order_id = order['id']
+        version = int(order.get('version', 1))
+        with self._lock:
+            known = self.versions.get(order_id) if order_id in self.rows else self.deleted.get(order_id)
+            if known is not None and version <= known:
+                return
+            self.deleted.pop(order_id, None)
+            self.versions[order_id] = version
+            row = self.rows.get(order_id)
+            if row is not None:
+                old = dict(zip(HIT_FIELDS, self.hits[row]))
+                if all(old[field] == order.get(field) for field in _ROW_FIELDS):
+                    self.hits[row] = tuple(order.get(field) for field in HIT_FIELDS)
+                    return
+                self._kill(order_id)
+            self._append(order)
+
+    def remove(self, order_id: str, version: Optional[int] = None):
+        with self._lock:
+            if order_id in self.rows and version is not None and version < self.versions[order_id]:
+                return
+            self._kill(order_id)
+            self.deleted[order_id] = max(version or 0, self.versions.pop(order_id, 0))
+
+    def apply(self, event: ChangeEvent):
+        if event.after is not None:
+            self.upsert(event.after)
+        else:
+            self.remove(event.key, event.before_version)
+
+    # Reads
+
+    def search(
+        self,
+        query: str,
+        email: str,
+        role: UserRole,
+        limit: int,
+        offset: int = 0
+    ) -> Tuple[int, List[Dict[str, Any]], Optional[int]]:
+        """Total candidates, one page of hits (newest first) and the offset of the next page"""
+        query_words = list(dict.fromkeys(words(query)))
+        with self._lock:
+            lists = []
+            user_rows = self.by_user.get((UserRole(role).value, email))
+            if not query_words or user_rows is None:
+                return 0, [], None
+            lists.append(user_rows)
+            for word in query_words:
+                word_lists = [self.keys.get(key) for key in query_keys(word)]
+                if any(rows is None for rows in word_lists):
+                    return 0, [], None
+                # The rarest two trigrams narrow down enough; the text check below does the rest
+                lists.extend(sorted(word_lists, key=len)[:2])
+            lists.sort(key=len)
+            candidates = np.frombuffer(lists[0], dtype=np.int32, count=len(lists[0]))
+            for rows in lists[1:]:
+                if not len(candidates):
+                    break
+                rows = np.frombuffer(rows, dtype=np.int32, count=len(rows))
+                found = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+                candidates = candidates[rows[found] == candidates]
+            candidates = candidates[self.alive[candidates]]
+            total = len(candidates)
+            if offset >= total:
+                return total, [], None
+
+            created = self.created[candidates]
+            window = offset + 2 * limit
+            if total > window:
+                # Only the newest `window` need sorting; the rest is sorted if checking drops too many
+                top = np.argpartition(-created, window)[:window]
+                ranked = top[np.argsort(-created[top], kind='stable')]
+            else:
+                ranked = np.argsort(-created, kind='stable')
+            # Words of up to three characters match exactly through their single key
+            check = [word for word in query_words if len(word) > 3]
+            page, position = [], offset
+            while len(page) < limit and position < total:
+                if position == len(ranked):
+                    ranked = np.argsort(-created, kind='stable')
+                hit = self.hits[candidates[ranked[position]]]
+                position += 1
+                if check:
+                    text = ' '.join(words(' '.join(hit[i] or '' for i in _SEARCH_COLUMNS)))
+                    if not all(word in text for word in check):
+                        continue
+                page.append(dict(zip(HIT_FIELDS, hit)))
+            return total, page, position if position < total else None
+
+    # Loading
+
+    def _swap(self, fresh: "OrderSearchIndex"):
+        with self._lock:
+            for name in self._STATE:
+                setattr(self, name, getattr(fresh, name))
+
+    def load(self):
+        """(Re)build the index from a parallel scan of the orders table"""
+        from app.repositories.order_repository import OrderRepository
+
+        started = time.perf_counter()
+        fresh = OrderSearchIndex(capacity=max(1024, self.size))
+        # Events from here on are replayed by the follower; versions make that harmless
+        start = seq_cutoff(settings.OUTBOX_SETTLE_SECONDS)
+        fresh.positions = {shard: start for shard in shards([EntityType.ORDER])}
+        for item in OrderRepository.scan_for_export(
+            segments=settings.EXPORT_SCAN_SEGMENTS,
+            page_size=settings.EXPORT_SCAN_PAGE_SIZE
+        ):
+            fresh.upsert(item)
+        self._swap(fresh)
+        self.loaded_at = time.time()
+        logger.info(f"Order search index loaded: {len(self.rows)} orders, {len(self.keys)} keys in {time.perf_counter() - started:.2f}s")
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            # Concurrent first requests wait for one load instead of searching an empty index
+            with self._first_load:
+                if self.loaded_at is None:
+                    self.load()
+
+    def compact(self):
+        """Re-index the live orders into fresh rows, dropping dead ones"""
+        with self._lock:
+            fresh = OrderSearchIndex(capacity=max(1024, len(self.rows)))
+            for row in sorted(self.rows.values()):
+                fresh._append(dict(zip(HIT_FIELDS, self.hits[row])))
+            fresh.versions, fresh.deleted, fresh.positions = self.versions, self.deleted, self.positions
+            self._swap(fresh)
+
+    def maintain(self):
+        if self.dead > COMPACT_DEAD_RATIO * max(self.size, 1):
+            self.compact()
+
+
+order_index = OrderSearchIndex()
+
+
+def _apply_events(events: List[ChangeEvent]):
+    for event in events:
+        order_index.apply(event)
+
+
+follower = LocalConsumer("order-search", _apply_events, [EntityType.ORDER], order_index)
+
+
+def _apply_change(event: ChangeEvent):
+    # Orders of this process are found right away; other processes' once the follower gets them
+    if order_index.loaded_at is not None:
+        order_index.apply(event)
+
+
+change_events.subscribe(_apply_change, EntityType.ORDER)
+
+
+class OrderSearchService:
+    """Business logic for order search"""
+
+    @staticmethod
+    def start():
+        """Build the index and follow the outbox (every API process keeps its own index)"""
+        if not settings.ORDER_SEARCH_ENABLED:
+            return
+        order_index.ensure_loaded()
+        follower.start()
+
+    @staticmethod
+    def search(query: str, user_email: str, user_role: UserRole, limit: int, offset: int = 0) -> Dict[str, Any]:
+        """The user's orders whose title, address or participant emails contain every query word"""
+        if not settings.ORDER_SEARCH_ENABLED:
+            raise ValueError("Order search is disabled")
+        order_index.ensure_loaded()
+        total, items, next_offset = order_index.search(query, user_email, user_role, limit, offset)
+        return {'query': query, 'total': total, 'items': items, 'next_offset': next_offset}
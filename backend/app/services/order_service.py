@@ -1,12 +1,19 @@
-from app.repositories.order_repository import OrderRepository
+from app.repositories.archive_repository import ArchiveRepository
+from app.repositories.order_repository import OrderIdTakenError, OrderRepository, OPEN_STATUSES, VersionConflictError
 from app.repositories.user_repository import UserRepository
 from app.repositories.chat_repository import ChatRepository
+from app.repositories.counter_repository import CounterRepository, CounterKey
 from app.models.domain import Order, ProgressStage, ChatRoom, ChatParticipant
 from app.models.enums import ProgressStageType, OrderStatus, UserRole
+from app.utils import transactions
 from app.utils.dynamodb import format_datetime
 from datetime import datetime
+from decimal import Decimal
+import logging
 import uuid
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
 
 
 class OrderService:
@@ -43,7 +50,13 @@ class OrderService:
         return progress_stages
     
     @staticmethod
-    def create_order(
+    def default_user_name(email: str) -> str:
+        """Display name derived from an email address when no user record exists"""
+        return email.split('@')[0].replace('.', ' ').replace('_', ' ').title()
+    
+    @staticmethod
+    def build_order(
+        order_id: str,
         title: str,
         renter_email: str,
         landlord_email: str,
@@ -52,23 +65,9 @@ class OrderService:
         description: Optional[str],
         created_by: str
     ) -> Order:
-        """Create a new order"""
-        # Verify creator is an agent
-        users = UserRepository.find_by_email(created_by)
-        creator = next((u for u in users if u.role == UserRole.AGENT), None)
-        
-        if not creator:
-            raise ValueError("Only agents can create orders")
-        
-        # Generate order ID
-        order_id = OrderService.generate_order_id()
-        
-        # Create progress stages
-        progress_stages = OrderService.create_default_progress_stages()
-        
-        # Create order
+        """Build a new pending order with default progress stages (not stored)"""
         now = format_datetime(datetime.utcnow())
-        order = Order(
+        return Order(
             id=order_id,
             title=title,
             renter_email=renter_email,
@@ -78,22 +77,21 @@ class OrderService:
             description=description,
             created_by=created_by,
             status=OrderStatus.PENDING,
-            progress_stages=progress_stages,
+            progress_stages=OrderService.create_default_progress_stages(),
             created_at=now,
             updated_at=now
         )
-        
-        OrderRepository.create(order)
-        
-        # Create chat room for the order
+    
+    @staticmethod
+    def build_chat_room(
+        order_id: str,
+        created_by: str,
+        renter_email: str,
+        landlord_email: str,
+        get_user_name: Callable[[str, UserRole], str]
+    ) -> ChatRoom:
+        """Build the chat room for a new order (not stored)"""
         now = format_datetime(datetime.utcnow())
-        
-        # Fetch user names for participants
-        def get_user_name(email, role):
-            users = UserRepository.find_by_email(email)
-            user = next((u for u in users if u.role == role), None)
-            return user.name if user else email.split('@')[0].replace('.', ' ').replace('_', ' ').title()
-        
         participants = [
             ChatParticipant(
                 email=created_by, 
@@ -111,34 +109,236 @@ class OrderService:
                 name=get_user_name(landlord_email, UserRole.LANDLORD)
             ),
         ]
-        chat_room = ChatRoom(
+        return ChatRoom(
             order_id=order_id,
             participants=participants,
             messages=[],
             created_at=now,
             updated_at=now
         )
-        ChatRepository.create(chat_room)
+    
+    @staticmethod
+    def create_order(
+        title: str,
+        renter_email: str,
+        landlord_email: str,
+        property_address: str,
+        deposit_amount: float,
+        description: Optional[str],
+        created_by: str,
+        creator_name: Optional[str] = None,
+        max_id_attempts: int = 5
+    ) -> Order:
+        """Create a new order
+
+        creator_name is passed for a creator already known to be an agent
+        (from a verified token), which saves looking the creator up.
+        """
+        if creator_name is None:
+            # Verify creator is an agent
+            users = UserRepository.find_by_email(created_by)
+            creator = next((u for u in users if u.role == UserRole.AGENT), None)
+            
+            if not creator:
+                raise ValueError("Only agents can create orders")
+            creator_name = creator.name
         
-        # Update order with chat room reference
-        order.chat_room = chat_room
-        OrderRepository.update(order)
+        # Fetch user names for participants
+        def get_user_name(email, role):
+            if email == created_by and role == UserRole.AGENT:
+                return creator_name
+            users = UserRepository.find_by_email(email)
+            user = next((u for u in users if u.role == role), None)
+            return user.name if user else OrderService.default_user_name(email)
+        
+        # Order IDs are short, so one may already be taken; the write is
+        # conditional on that and is retried with a fresh ID
+        for attempt in range(max_id_attempts):
+            order_id = OrderService.generate_order_id()
+            order = OrderService.build_order(
+                order_id=order_id,
+                title=title,
+                renter_email=renter_email,
+                landlord_email=landlord_email,
+                property_address=property_address,
+                deposit_amount=deposit_amount,
+                description=description,
+                created_by=created_by
+            )
+            order.chat_room = OrderService.build_chat_room(
+                order_id, created_by, renter_email, landlord_email, get_user_name
+            )
+            try:
+                OrderService.insert_order(order)
+                return order
+            except OrderIdTakenError:
+                if attempt == max_id_attempts - 1:
+                    raise
+                logger.info(f"Order ID {order_id} is taken, retrying with a new one")
+    
+    @staticmethod
+    def insert_order(order: Order):
+        """Store a new order, its chat room and the counter updates in one transaction
+
+        Raises OrderIdTakenError if an order or chat room with the order's ID exists.
+        """
+        extra_writes, extra_events = OrderService.counter_writes(None, order), []
+        room_index = None
+        if order.chat_room:
+            action, event = ChatRepository.create_write(order.chat_room)
+            room_index = 1 + len(extra_writes)  # Position in the transaction, after the order put
+            extra_writes.append(action)
+            extra_events.append(event)
+        try:
+            OrderRepository.create(order, extra_writes=extra_writes, extra_events=extra_events)
+        except transactions.TransactionConflict as e:
+            # A chat room left over under the same ID takes the ID as well
+            codes = [reason.get('Code') for reason in e.reasons]
+            if room_index is not None and codes[room_index:room_index + 1] == ['ConditionalCheckFailed']:
+                raise OrderIdTakenError(f"A chat room for order {order.id} already exists") from e
+            raise
+    
+    @staticmethod
+    def update_order(order_id: str, update_data: dict, max_attempts: int = 3) -> Optional[Order]:
+        """Apply field updates to an order; None if it does not exist
+
+        The write is conditional on the version that was read, so counter
+        deltas are computed against the state actually replaced. On a
+        concurrent modification the update is re-applied to a fresh read.
+        """
+        for attempt in range(max_attempts):
+            previous = OrderRepository.find_by_id(order_id)
+            if not previous:
+                return None
+            if previous.archived_at:
+                raise ValueError("Archived orders cannot be changed")
+            order = previous.model_copy(deep=True)
+            data = dict(update_data)
+            
+            # Handle progress_stages separately - convert response models to domain models
+            if 'progress_stages' in data:
+                order.progress_stages = [
+                    ProgressStage(
+                        stage=ps['stage'],
+                        title=ps['title'],
+                        completed=ps['completed'],
+                        date=ps.get('date'),
+                        completed_by=ps.get('completed_by')
+                    )
+                    for ps in data.pop('progress_stages')
+                ]
+            
+            # Update other fields
+            for field, value in data.items():
+                setattr(order, field, value)
+            
+            order.updated_at = format_datetime(datetime.utcnow())
+            order.version = previous.version + 1
+            try:
+                OrderRepository.update(
+                    order,
+                    previous,
+                    extra_writes=OrderService.counter_writes(previous, order)
+                )
+                return order
+            except VersionConflictError:
+                if attempt == max_attempts - 1:
+                    raise
+    
+    @staticmethod
+    def delete_order(order: Order):
+        """Delete an order with its chat room (or archived copy) and counter contributions"""
+        extra_writes, extra_events = OrderService.counter_writes(order, None), []
+        chat_room = ChatRepository.find_by_order_id(order.id)
+        if chat_room:
+            action, event = ChatRepository.delete_write(chat_room)
+            extra_writes.append(action)
+            extra_events.append(event)
+        OrderRepository.delete(order, extra_writes=extra_writes, extra_events=extra_events)
+        if order.archived_at:
+            ArchiveRepository.delete(order.id)
+    
+    @staticmethod
+    def counter_deltas(previous: Optional[Order], current: Optional[Order]) -> Dict[CounterKey, Dict[str, Any]]:
+        """Per-participant counter changes from replacing previous with current (None = absent)"""
+        deltas: Dict[CounterKey, Dict[str, Any]] = {}
         
-        return order
-    
-    @staticmethod
-    def get_orders_for_user(user_email: str, user_role: UserRole) -> List[Order]:
-        """Get orders filtered by user role"""
-        if user_role == UserRole.AGENT:
-            orders = OrderRepository.find_by_created_by(user_email)
-        elif user_role == UserRole.RENTER:
-            orders = OrderRepository.find_by_renter_email(user_email)
-        elif user_role == UserRole.LANDLORD:
-            orders = OrderRepository.find_by_landlord_email(user_email)
-        else:
-            orders = []
+        def add(order: Order, sign: int):
+            for role, email in OrderRepository.participants(order).items():
+                delta = deltas.setdefault((email, role), {})
+                status = OrderStatus(order.status).value
+                delta[status] = delta.get(status, 0) + sign
+                delta['total'] = delta.get('total', 0) + sign
+                if order.status in OPEN_STATUSES:
+                    amount = Decimal(str(order.deposit_amount)) * sign
+                    delta['held_deposits'] = delta.get('held_deposits', 0) + amount
         
-        # Sort by created_at descending
-        orders.sort(key=lambda x: x.created_at, reverse=True)
-        return orders
+        if previous is not None:
+            add(previous, -1)
+        if current is not None:
+            add(current, 1)
+        return {key: delta for key, delta in deltas.items() if any(delta.values())}
+    
+    @staticmethod
+    def summed_counter_deltas(orders: Iterable[Order]) -> Dict[CounterKey, Dict[str, Any]]:
+        """Counter changes from adding all orders"""
+        totals: Dict[CounterKey, Dict[str, Any]] = {}
+        for order in orders:
+            for key, delta in OrderService.counter_deltas(None, order).items():
+                counters = totals.setdefault(key, {})
+                for field, value in delta.items():
+                    counters[field] = counters.get(field, 0) + value
+        return totals
+    
+    @staticmethod
+    def counter_writes(previous: Optional[Order], current: Optional[Order]) -> List[Dict[str, Any]]:
+        return CounterRepository.transact_updates(OrderService.counter_deltas(previous, current))
+    
+    @staticmethod
+    def get_order_counts(user_email: str, user_role: UserRole) -> Dict[str, Any]:
+        """Order counts per status, total and held deposits for one user (one read)"""
+        return CounterRepository.find(user_email, user_role)
+    
+    @staticmethod
+    def recount_counters(segments: int = 4) -> int:
+        """Rebuild all counters from a scan of the orders table; returns the users counted
+
+        Writes that happen while the scan runs can be missed, so run it when
+        the counters drifted or right after bulk loading data.
+        """
+        totals = OrderService.summed_counter_deltas(
+            Order.from_item(item) for item in OrderRepository.scan_for_export(segments=segments)
+        )
+        # Users whose orders are all gone drop to zero
+        for key in CounterRepository.find_all_keys():
+            totals.setdefault(key, {})
+        CounterRepository.replace_all(totals)
+        return len(totals)
+    
+    @staticmethod
+    def rekey_participant_shards(segments: int = 4) -> Dict[str, int]:
+        """Move every order's index keys to the shards of the current PARTICIPANT_INDEX_SHARDS
+
+        Needed after lowering a user's shard count: orders in the dropped
+        shards are not read any more. Returns the orders scanned and moved.
+        """
+        counts = {'scanned': 0, 'moved': 0}
+        for item in OrderRepository.scan_participant_keys(segments=segments):
+            counts['scanned'] += 1
+            if OrderRepository.rekey(item):
+                counts['moved'] += 1
+        return counts
+    
+    @staticmethod
+    def get_orders_for_user(
+        user_email: str,
+        user_role: UserRole,
+        status: Optional[OrderStatus] = None,
+        limit: Optional[int] = None
+    ) -> List[Order]:
+        """Get orders filtered by user role (and optionally status), newest first
+
+        limit caps the orders returned (and read); None returns all of them.
+        """
+        return OrderRepository.find_by_participant(user_email, user_role, status, limit)
 
@@ -0,0 +1,148 @@
+"""
+Outbox consumers: durable, at-least-once delivery of change events.
+
+A consumer has a name, the entity types it wants and a handler that takes a
+batch of ChangeEvents (all of one outbox shard, oldest first). It polls every
+shard of those entity types, hands new events to the handler and records the
+last delivered seq per shard only after the handler returned. A crash or a
+handler error therefore redelivers the batch; handlers must be idempotent,
+e.g. by comparing event.after_version with what they stored.
+
+Consumers stay OUTBOX_SETTLE_SECONDS behind the present. A seq is taken when
+a transaction is built, so a transaction that takes longer than that to
+commit (or a writer whose clock is off by more) can be missed.
+
+    consumer = OutboxConsumer("search-index", index_events, [EntityType.CHAT_ROOM])
+    register(consumer)  # started with the API process, see start_consumers()
+"""
+from app.core.config import settings
+from app.core.events import ChangeEvent, seq_cutoff, shards
+from app.models.enums import EntityType
+from app.repositories.outbox_repository import OutboxRepository
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[List[ChangeEvent]], None]
+
+
+class OutboxConsumer:
+    """Delivers outbox events of some entity types to a batch handler"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: BatchHandler,
+        entities: Optional[List[EntityType]] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.shards = shards(entities)
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_SECONDS if poll_interval is None else poll_interval
+        self.positions = None
+        self.delivered = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> int:
+        """Deliver at most one batch per shard; returns the number of events delivered"""
+        if self.positions is None:
+            self.positions = self.load_positions()
+        up_to = seq_cutoff(settings.OUTBOX_SETTLE_SECONDS)
+        delivered = 0
+        for shard in self.shards:
+            events = OutboxRepository.read(shard, self.positions.get(shard), up_to, self.batch_size)
+            if not events:
+                continue
+            self.handler(events)
+            self.save_position(shard, events[-1].seq)
+            self.positions[shard] = events[-1].seq
+            delivered += len(events)
+        self.delivered += delivered
+        return delivered
+
+    def load_positions(self) -> Dict[str, str]:
+        """Last delivered seq per shard; consumers whose state is not in DynamoDB override both"""
+        return OutboxRepository.get_checkpoints(self.name)
+
+    def save_position(self, shard: str, seq: str):
+        OutboxRepository.save_checkpoint(self.name, shard, seq)
+
+    def run(self):
+        """Poll until stop(); full batches are followed by an immediate next poll"""
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                delivered = self.poll()
+                failures = 0
+            except Exception as e:
+                # Checkpoints only move after a successful handler call, so the batch is retried
+                failures += 1
+                delivered = 0
+                logger.error(f"Outbox consumer {self.name} failed (attempt {failures}): {e}")
+            if delivered < self.batch_size:
+                self._stop.wait(min(self.poll_interval * 2 ** failures, 60.0))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name=f"outbox-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class LocalConsumer(OutboxConsumer):
+    """Consumer that feeds state held in this process, e.g. an in-memory index
+
+    Every process has its own copy of such state, so the positions are kept
+    by the state (its positions dict, replaced on every change) instead of
+    in outbox_checkpoints, and can be saved and restored along with it. The
+    state's maintain() method, if any, runs after every poll.
+    """
+
+    def __init__(self, name: str, handler: BatchHandler, entities: Optional[List[EntityType]], state: Any, **kwargs):
+        super().__init__(name, handler, entities, **kwargs)
+        self.state = state
+
+    def load_positions(self) -> Dict[str, str]:
+        return dict(self.state.positions)
+
+    def save_position(self, shard: str, seq: str):
+        self.state.positions = {**self.state.positions, shard: seq}
+
+    def poll(self) -> int:
+        delivered = super().poll()
+        maintain = getattr(self.state, 'maintain', None)
+        if maintain is not None:
+            maintain()
+        return delivered
+
+
+_consumers: List[OutboxConsumer] = []
+
+
+def register(consumer: OutboxConsumer):
+    """Add a consumer to the ones started with the API process"""
+    _consumers.append(consumer)
+
+
+def start_consumers():
+    if not settings.OUTBOX_CONSUMERS_ENABLED:
+        return
+    for consumer in _consumers:
+        consumer.start()
+        logger.info(f"Started outbox consumer {consumer.name}")
+
+
+def stop_consumers():
+    for consumer in _consumers:
+        consumer.stop()
@@ -0,0 +1,404 @@
+"""
+Deposit analytics over an in-memory columnar projection of the orders table.
+
+Each order is one row in a set of NumPy arrays (amount in cents, status,
+landlord, agent, month, day, completed progress stages as a bitmask). For
+every grouping a sorted index keeps the live rows ordered by (group, amount)
+and is patched incrementally after writes. A report filters that index and
+computes counts, sums and interpolated percentiles of all groups at once with
+reduceat and fancy indexing. No per-order Python loop runs on the request
+path.
+
+The projection is loaded once with a parallel scan. After that it is kept
+current by the order change events this process publishes (app.core.events).
+Writes made by other processes are picked up by a periodic full reload
+(REPORTS_REFRESH_SECONDS).
+"""
+from app.core import events as change_events
+from app.core.config import settings
+from app.core.events import ChangeEvent
+from app.models.enums import EntityType, OrderStatus, ProgressStageType
+from app.utils.dynamodb import parse_datetime
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATUSES = list(OrderStatus)
+STAGES = list(ProgressStageType)
+STATUS_CODES = {status.value: code for code, status in enumerate(STATUSES)}
+STAGE_BITS = {stage.value: 1 << bit for bit, stage in enumerate(STAGES)}
+GROUP_BY = ("status", "landlord", "agent", "month")
+
+# Sorted index composite: group key in the high bits, amount in cents (offset, so
+# negative amounts sort correctly) in the low 40 bits
+_AMOUNT_BITS = 40
+_AMOUNT_OFFSET = 1 << (_AMOUNT_BITS - 1)
+_AMOUNT_MASK = (1 << _AMOUNT_BITS) - 1
+
+
+_COLUMNS = ('cents', 'status', 'landlord', 'agent', 'month', 'day', 'stages', 'alive')
+
+
+def _month_index(created_at: str) -> int:
+    dt = parse_datetime(created_at)
+    return dt.year * 12 + dt.month - 1
+
+
+def _day_index(created_at: str) -> int:
+    return parse_datetime(created_at).toordinal()
+
+
+def _month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class _Labels:
+    """Interns strings (emails) to dense integer codes"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class DepositColumnStore:
+    """Columnar, NumPy-backed projection of orders for reporting"""
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._allocate(capacity)
+        self.rows: Dict[str, int] = {}  # order id -> row
+        self.size = 0
+        self.landlords = _Labels()
+        self.agents = _Labels()
+        self.loaded_at: Optional[float] = None
+        self._loading = False
+        self._first_load = threading.Lock()
+        self._pending: List[Tuple[str, Any]] = []
+        self._indexes: Dict[str, "_SortedIndex"] = {}
+
+    def _allocate(self, capacity: int):
+        self.cents = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.landlord = np.zeros(capacity, dtype=np.int32)
+        self.agent = np.zeros(capacity, dtype=np.int32)
+        self.month = np.zeros(capacity, dtype=np.int32)
+        self.day = np.zeros(capacity, dtype=np.int32)
+        self.stages = np.zeros(capacity, dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in _COLUMNS}
+        self._allocate(len(self.cents) * 2)
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    # Writes
+
+    def upsert(self, order: Any):
+        """Insert or update one order (an Order model or a raw item dict)"""
+        with self._lock:
+            if self.loaded_at is None and not self._loading:
+                return  # Not in use yet; the first load reads everything
+            if self._loading:
+                self._pending.append(('upsert', order))
+                return
+            self._set_row(order)
+
+    def remove(self, order_id: str):
+        with self._lock:
+            if self.loaded_at is None and not self._loading:
+                return
+            if self._loading:
+                self._pending.append(('remove', order_id))
+                return
+            row = self.rows.pop(order_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self._mark_dirty(row)
+
+    def _set_row(self, order: Any):
+        get = order.get if isinstance(order, dict) else lambda name: getattr(order, name, None)
+        order_id = get('id')
+        row = self.rows.get(order_id)
+        if row is None:
+            if self.size == len(self.cents):
+                self._grow()
+            row = self.rows[order_id] = self.size
+            self.size += 1
+        status = get('status')
+        stages = 0
+        for stage in get('progress_stages') or []:
+            stage_get = stage.get if isinstance(stage, dict) else lambda name: getattr(stage, name, None)
+            if stage_get('completed'):
+                stages |= STAGE_BITS.get(getattr(stage_get('stage'), 'value', stage_get('stage')), 0)
+        self.cents[row] = int(round(float(get('deposit_amount') or 0) * 100))
+        self.status[row] = STATUS_CODES[getattr(status, 'value', status) or OrderStatus.PENDING.value]
+        self.landlord[row] = self.landlords.code(get('landlord_email'))
+        self.agent[row] = self.agents.code(get('created_by'))
+        self.month[row] = _month_index(get('created_at'))
+        self.day[row] = _day_index(get('created_at'))
+        self.stages[row] = stages
+        self.alive[row] = True
+        self._mark_dirty(row)
+
+    def _mark_dirty(self, row: int):
+        for index in self._indexes.values():
+            index.dirty.add(row)
+
+    # Loading
+
+    def load(self):
+        """(Re)build the projection from a parallel scan of the orders table"""
+        from app.repositories.order_repository import OrderRepository
+
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        started = time.perf_counter()
+        try:
+            fresh = DepositColumnStore(capacity=max(1024, self.size))
+            items = OrderRepository.scan_for_export(
+                segments=settings.EXPORT_SCAN_SEGMENTS,
+                page_size=settings.EXPORT_SCAN_PAGE_SIZE
+            )
+            for item in items:
+                fresh._set_row(item)
+        except Exception:
+            with self._lock:
+                self._loading = False
+                pending, self._pending = self._pending, []
+                for action, value in pending:
+                    self._apply(action, value)
+            raise
+        with self._lock:
+            # Writes that happened during the scan may be missing from it
+            for action, value in self._pending:
+                fresh._apply(action, value)
+            self._pending = []
+            for name in _COLUMNS + ('rows', 'size', 'landlords', 'agents'):
+                setattr(self, name, getattr(fresh, name))
+            self._indexes = {}
+            self.loaded_at = time.time()
+            self._loading = False
+        logger.info(f"Deposit report projection loaded: {self.size} orders in {time.perf_counter() - started:.2f}s")
+
+    def _apply(self, action: str, value: Any):
+        if action == 'upsert':
+            self._set_row(value)
+        else:
+            row = self.rows.pop(value, None)
+            if row is not None:
+                self.alive[row] = False
+                self._mark_dirty(row)
+
+    def ensure_loaded(self):
+        """Load on first use; reload in the background once the projection is stale"""
+        if self.loaded_at is None:
+            # Concurrent first requests wait for one load instead of reading an empty store
+            with self._first_load:
+                if self.loaded_at is None:
+                    self.load()
+        elif settings.REPORTS_REFRESH_SECONDS and time.time() - self.loaded_at > settings.REPORTS_REFRESH_SECONDS:
+            if not self._loading:
+                threading.Thread(target=self.load, name="deposit-report-reload", daemon=True).start()
+
+    # Reads
+
+    def _sorted_index(self, group_by: str) -> "_SortedIndex":
+        index = self._indexes.get(group_by)
+        if index is None:
+            index = self._indexes[group_by] = _SortedIndex(self, group_by)
+        index.refresh()
+        return index
+
+    def report(
+        self,
+        group_by: str = "status",
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        percentiles: Tuple[float, ...] = (50, 90, 99),
+        limit: Optional[int] = 100
+    ) -> Dict[str, Any]:
+        """Grouped deposit totals, percentiles and the progress stage funnel
+
+        At most `limit` groups are returned: the ones with the largest sums.
+        """
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY)}")
+        with self._lock:
+            index = self._sorted_index(group_by)
+            rows = index.rows
+            composite = index.composite
+            if status or created_from or created_to:
+                # Filtering keeps the (group, amount) order of the index
+                keep = np.ones(len(rows), dtype=bool)
+                if status:
+                    keep &= self.status[rows] == STATUS_CODES[status]
+                if created_from:
+                    keep &= self.day[rows] >= _day_index(created_from)
+                if created_to:
+                    keep &= self.day[rows] <= _day_index(created_to)
+                rows, composite = rows[keep], composite[keep]
+            stages = self.stages[rows]
+            labels = {
+                "landlord": self.landlords.values,
+                "agent": self.agents.values,
+            }.get(group_by)
+            labels = list(labels) if labels is not None else None
+            loaded_at = self.loaded_at
+
+        keys = composite >> _AMOUNT_BITS
+        cents = (composite & _AMOUNT_MASK) - _AMOUNT_OFFSET
+        groups = []
+        total_groups = 0
+        if len(keys):
+            # keys are sorted, so every group is one contiguous run of ascending amounts
+            boundaries = np.flatnonzero(np.diff(keys)) + 1
+            starts = np.concatenate(([0], boundaries))
+            sizes = np.diff(np.concatenate((starts, [len(keys)])))
+            sums = np.add.reduceat(cents, starts)
+            total_groups = len(starts)
+            if limit and total_groups > limit:
+                top = np.argpartition(-sums, limit - 1)[:limit]
+                top.sort()
+                starts, sizes, sums = starts[top], sizes[top], sums[top]
+            quantiles = {}
+            for p in percentiles:
+                # Linear interpolation between closest ranks, for every group at once
+                position = starts + (sizes - 1) * (p / 100.0)
+                low = np.floor(position).astype(np.int64)
+                high = np.ceil(position).astype(np.int64)
+                fraction = position - low
+                quantiles[p] = (cents[low] * (1 - fraction) + cents[high] * fraction) / 100.0
+            for i, key in enumerate(keys[starts].tolist()):
+                if group_by == "status":
+                    label = STATUSES[key].value
+                elif group_by == "month":
+                    label = _month_label(key)
+                else:
+                    label = labels[key]
+                groups.append({
+                    "key": label,
+                    "count": int(sizes[i]),
+                    "sum": int(sums[i]) / 100.0,
+                    "mean": round(int(sums[i]) / 100.0 / int(sizes[i]), 2),
+                    "percentiles": {f"p{p:g}": round(float(quantiles[p][i]), 2) for p in percentiles},
+                })
+            if group_by in ("landlord", "agent") or len(groups) < total_groups:
+                groups.sort(key=lambda g: g["sum"], reverse=True)
+
+        # Stage funnel: orders with each stage completed, and conversion from the previous stage.
+        # Count each of the 256 possible bitmasks once, then add up the masks containing a stage.
+        mask_counts = np.bincount(stages, minlength=256)
+        mask_values = np.arange(256)
+        funnel = []
+        for i, stage in enumerate(STAGES):
+            completed = int(mask_counts[(mask_values >> i) & 1 == 1].sum())
+            previous = funnel[-1]["completed"] if funnel else len(keys)
+            funnel.append({
+                "stage": stage.value,
+                "completed": completed,
+                "conversion": round(completed / previous, 4) if previous else 0.0,
+            })
+
+        return {
+            "group_by": group_by,
+            "orders": int(len(keys)),
+            "total": int(cents.sum()) / 100.0,
+            "total_groups": total_groups,
+            "groups": groups,
+            "funnel": funnel,
+            "as_of": datetime.utcfromtimestamp(loaded_at).isoformat() if loaded_at else None,
+        }
+
+
+class _SortedIndex:
+    """Live rows sorted by (group key, amount), kept as one int64 composite per row
+
+    Writes only mark rows dirty; refresh() removes them and merges their new
+    composites back in with searchsorted, so the full sort runs only when
+    the index is built or when most rows changed.
+    """
+
+    def __init__(self, store: DepositColumnStore, group_by: str):
+        self.store = store
+        self.column = group_by
+        self.dirty: set = set()
+        self.rebuild()
+
+    def _composite(self, rows: np.ndarray) -> np.ndarray:
+        keys = getattr(self.store, self.column)[rows].astype(np.int64)
+        return (keys << _AMOUNT_BITS) | (self.store.cents[rows] + _AMOUNT_OFFSET)
+
+    def rebuild(self):
+        rows = np.flatnonzero(self.store.alive[:self.store.size])
+        composite = self._composite(rows)
+        order = np.argsort(composite, kind='stable')
+        self.rows, self.composite = rows[order], composite[order]
+        self.dirty.clear()
+
+    def refresh(self):
+        if not self.dirty:
+            return
+        if len(self.dirty) > len(self.rows) // 10:
+            self.rebuild()
+            return
+        changed = np.fromiter(self.dirty, dtype=np.int64, count=len(self.dirty))
+        self.dirty.clear()
+        flags = np.zeros(self.store.size, dtype=bool)
+        flags[changed] = True
+        keep = ~flags[self.rows]
+        rows, composite = self.rows[keep], self.composite[keep]
+        changed = changed[self.store.alive[changed]]
+        if len(changed):
+            new_composite = self._composite(changed)
+            positions = np.searchsorted(composite, new_composite)
+            rows = np.insert(rows, positions, changed)
+            composite = np.insert(composite, positions, new_composite)
+        self.rows, self.composite = rows, composite
+
+
+deposit_store = DepositColumnStore()
+
+
+def _apply_order_change(event: ChangeEvent):
+    if event.after is not None:
+        deposit_store.upsert(event.after)
+    else:
+        deposit_store.remove(event.key)
+
+
+# Writes made by this process reach the projection right away; other processes' on reload
+change_events.subscribe(_apply_order_change, EntityType.ORDER)
+
+
+class ReportService:
+    """Business logic for reports"""
+
+    @staticmethod
+    def deposit_report(
+        group_by: str = "status",
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        percentiles: Tuple[float, ...] = (50, 90, 99),
+        limit: Optional[int] = 100
+    ) -> Dict[str, Any]:
+        """Deposit totals grouped by status, landlord, agent or month"""
+        deposit_store.ensure_loaded()
+        return deposit_store.report(group_by, status, created_from, created_to, percentiles, limit)
@@ -0,0 +1,177 @@
+"""
+Parallel BatchWriteItem pipeline.
+
+Items are buffered per table, sent in batches of 25 from a pool of worker
+threads through the shared (thread-safe) low-level client, and unprocessed
+items are retried with exponential backoff and jitter. The number of batches
+in flight is bounded, so producers are slowed down instead of buffering an
+unbounded amount of data.
+"""
+from app.core.database import get_dynamodb_client
+from boto3.dynamodb.types import TypeSerializer
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import random
+import threading
+import time
+
+MAX_BATCH_SIZE = 25
+
+_serializer = TypeSerializer()
+
+
+class BatchWriteError(Exception):
+    """Raised when items stay unprocessed after all retries"""
+
+
+def serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a plain (Decimal-based) item to the low-level attribute value format"""
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def batch_write(
+    request_items: Dict[str, List[Dict[str, Any]]],
+    max_retries: int = 8,
+    base_delay: float = 0.05,
+    client=None
+) -> int:
+    """Send one BatchWriteItem request (at most 25 write requests in total)
+
+    request_items uses the low-level format: {table: [{'PutRequest': {'Item': ...}}]}.
+    Unprocessed items are retried; returns the number of retries needed.
+    """
+    client = client or get_dynamodb_client()
+    pending = request_items
+    retries = 0
+    while pending:
+        response = client.batch_write_item(RequestItems=pending)
+        pending = response.get('UnprocessedItems') or {}
+        if not pending:
+            break
+        retries += 1
+        if retries > max_retries:
+            count = sum(len(requests) for requests in pending.values())
+            raise BatchWriteError(f"{count} items still unprocessed after {max_retries} retries")
+        # Full jitter backoff
+        time.sleep(random.uniform(0, base_delay * (2 ** min(retries, 10))))
+    return retries
+
+
+class ParallelBatchWriter:
+    """Buffers puts/deletes and writes them as concurrent BatchWriteItem calls
+
+    Use as a context manager; leaving the block flushes the buffers, waits for
+    every batch and re-raises the first write error.
+    """
+
+    def __init__(self, workers: int = 8, max_in_flight: Optional[int] = None, max_retries: int = 8):
+        self.workers = workers
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-writer")
+        self._slots = threading.Semaphore(max_in_flight or workers * 2)
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        self.items_written = 0
+        self.retries = 0
+        self._error: Optional[BaseException] = None
+
+    def put(self, table_name: str, item: Dict[str, Any]):
+        """Queue a put of a plain (Decimal-based) item"""
+        self._add(table_name, {'PutRequest': {'Item': serialize_item(item)}})
+
+    def put_serialized(self, table_name: str, item: Dict[str, Any]):
+        """Queue a put of an item already in the low-level format"""
+        self._add(table_name, {'PutRequest': {'Item': item}})
+
+    def delete(self, table_name: str, key: Dict[str, Any]):
+        self._add(table_name, {'DeleteRequest': {'Key': serialize_item(key)}})
+
+    def submit(
+        self,
+        table_name: str,
+        requests: List[Dict[str, Any]],
+        callback: Optional[Callable[[Optional[BaseException]], None]] = None
+    ) -> Future:
+        """Write up to 25 low-level write requests as one batch
+
+        callback(error) runs on the worker thread once the batch is written
+        (error is None) or failed.
+        """
+        if len(requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch holds at most {MAX_BATCH_SIZE} write requests")
+        self._raise_if_failed()
+        self._slots.acquire()
+        future = self._executor.submit(self._write, table_name, requests, callback)
+        with self._lock:
+            if len(self._futures) > 1024:
+                # Failures are recorded in self._error, finished futures can go
+                self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+        return future
+
+    def flush(self):
+        """Send all buffered items without waiting for them"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+        for table_name, requests in buffers.items():
+            for start in range(0, len(requests), MAX_BATCH_SIZE):
+                self.submit(table_name, requests[start:start + MAX_BATCH_SIZE])
+
+    def wait(self):
+        """Flush and block until every submitted batch finished"""
+        self.flush()
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        self._raise_if_failed()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            return False
+        self.close()
+        return False
+
+    def _add(self, table_name: str, request: Dict[str, Any]):
+        with self._lock:
+            buffer = self._buffers.setdefault(table_name, [])
+            buffer.append(request)
+            if len(buffer) < MAX_BATCH_SIZE:
+                return
+            self._buffers[table_name] = []
+        self.submit(table_name, buffer)
+
+    def _write(self, table_name, requests, callback):
+        error = None
+        try:
+            retries = batch_write({table_name: requests}, max_retries=self.max_retries)
+            with self._lock:
+                self.items_written += len(requests)
+                self.retries += retries
+        except Exception as e:
+            if callback is None:
+                # Nobody handles this batch's failure: fail the whole pipeline
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+                raise
+            error = e
+        finally:
+            self._slots.release()
+        if callback is not None:
+            callback(error)
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
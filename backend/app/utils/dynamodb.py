@@ -1,12 +1,55 @@
 """
 Utility functions for DynamoDB operations
 Convert between Pydantic models and DynamoDB format
+
+Attributes a model lists in compressed_attributes (chat histories, order
+descriptions, the chat room copy on orders) are stored as a binary
+attribute when their JSON form is at least STORAGE_COMPRESSION_MIN_BYTES:
+a format tag (b"KZ" and a version byte) followed by the zlib-compressed
+JSON. Version 1 compresses with a preset dictionary of the field names and
+phrases chat rooms repeat, so even short histories shrink. Items written
+before, or below the threshold, keep plain attributes; reads accept both
+(decompress_value), so old and new items can be mixed freely.
 """
-from typing import Any, Dict
+from app.core.config import settings
+from typing import Any, Dict, Iterable
 from decimal import Decimal
 import json
+import zlib
 from datetime import datetime
 
+COMPRESSED_TAG = b'KZ'
+
+# Preset dictionaries by format version. Never change a released one: items
+# compressed with it could no longer be read. Add a new version instead.
+# zlib finds matches in the last 32KB; the most common strings go last.
+COMPRESSION_DICTIONARIES = {
+    1: (
+        'Security deposit, lease period 12 months. 24 months. 36 months. Apartment '
+        'Hauptstrasse Lindenallee Bergmannstrasse Schillerweg Parkstrasse Main Street '
+        'Berlin Hamburg Munich Cologne Leipzig Frankfurt Stuttgart Dresden '
+        'Hi all, I\'ve uploaded the signed lease for the apartment. '
+        'Can we schedule the move-in inspection for next week? '
+        'The deposit of EUR has been transferred. '
+        'There is a small scratch on the kitchen floor, photos attached. '
+        'The landlord mentioned the damaged carpet in the living room. '
+        'Thanks, I have reviewed the documents and everything looks fine. '
+        'Could you confirm the bank details for the deposit account? '
+        'Keys will be handed over on Monday at 10am. '
+        'The heating was serviced before the move-in. '
+        'Please approve the renter review so we can continue. '
+        '"order_id": "participants": [{"email": "role": "agent", "name": '
+        '"message_count": "read_cursors": {}, "version": "created_at": "updated_at": '
+        '{"email": "role": "renter", "name": {"email": "role": "landlord", "name": '
+        '@gmail.com @web.de @gmx.de @example.com '
+        '{"sender_email": "sender_role": "agent", "sender_name": '
+        '{"sender_email": "sender_role": "landlord", "sender_name": '
+        '"text": "timestamp": "2025-01-01T00:00:00.000000"}, '
+        '{"sender_email": "sender_role": "renter", "sender_name": '
+    ).encode(),
+}
+COMPRESSION_VERSION = 1
+
 
 def decimal_default(obj):
     """JSON encoder for Decimal types"""
@@ -19,7 +62,65 @@ def to_dynamodb_dict(model: Any) -> Dict[str, Any]:
     """Convert Pydantic model to DynamoDB format"""
     data = model.model_dump(mode='json', exclude_none=True)
     # Convert floats to Decimals for DynamoDB compatibility
-    return _convert_floats_to_decimal(data)
+    return compress_attributes(_convert_floats_to_decimal(data), getattr(model, 'compressed_attributes', ()))
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, default=decimal_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _compress(encoded: bytes) -> bytes:
+    compressor = zlib.compressobj(level=6, zdict=COMPRESSION_DICTIONARIES[COMPRESSION_VERSION])
+    return COMPRESSED_TAG + bytes([COMPRESSION_VERSION]) + compressor.compress(encoded) + compressor.flush()
+
+
+def pack(value: Any) -> bytes:
+    """A JSON-serializable value in the compressed format, whatever its size"""
+    return _compress(_encode(value))
+
+
+def unpack(data: bytes) -> Any:
+    """Inverse of pack; numbers come back as Decimal like DynamoDB's"""
+    if data[:2] != COMPRESSED_TAG:
+        raise ValueError("Not in the compressed format")
+    version = data[2]
+    if version not in COMPRESSION_DICTIONARIES:
+        raise ValueError(f"Unknown compressed attribute format version {version}")
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARIES[version])
+    encoded = decompressor.decompress(bytes(data[3:])) + decompressor.flush()
+    return json.loads(encoded, parse_float=Decimal, parse_int=Decimal)
+
+
+def compress_value(value: Any) -> Any:
+    """The stored form of an attribute: compressed bytes if large enough and smaller, else the value"""
+    if not settings.STORAGE_COMPRESSION_ENABLED:
+        return value
+    encoded = _encode(value)
+    if len(encoded) < settings.STORAGE_COMPRESSION_MIN_BYTES:
+        return value
+    compressed = _compress(encoded)
+    return compressed if len(compressed) < len(encoded) else value
+
+
+def decompress_value(value: Any) -> Any:
+    """The value of a stored attribute, compressed or not"""
+    data = getattr(value, 'value', value)  # boto3 returns binary attributes wrapped in Binary
+    if not isinstance(data, (bytes, bytearray)) or data[:2] != COMPRESSED_TAG:
+        return value
+    return unpack(data)
+
+
+def compress_attributes(item: Dict[str, Any], names: Iterable[str]) -> Dict[str, Any]:
+    """Compress the named attributes of an item in place"""
+    for name in names:
+        if item.get(name) is not None:
+            item[name] = compress_value(item[name])
+    return item
+
+
+def decompress_attributes(item: Dict[str, Any], names: Iterable[str]) -> Dict[str, Any]:
+    """A copy of a stored item with the named attributes decompressed"""
+    return {key: decompress_value(value) if key in names else value for key, value in item.items()}
 
 
 def _convert_floats_to_decimal(obj: Any) -> Any:
@@ -0,0 +1,124 @@
+"""
+Parallel segmented Scan.
+
+The table is split into TotalSegments segments that are scanned concurrently,
+one worker thread per segment. Workers hand their pages to the consumer
+through a bounded queue, so a slow consumer pauses the scan instead of the
+whole table piling up in memory.
+"""
+from app.core.database import get_dynamodb_client, get_dynamodb_resource
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import contextvars
+import queue
+import threading
+
+_DONE = object()
+
+
+class _SegmentError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def scan_segment(
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    raw: bool = False,
+    **scan_kwargs
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """Yield (items, LastEvaluatedKey) per page of one scan segment
+
+    The key is None after the last page. raw=True scans with the low-level
+    client and yields items in the attribute value format ({'S': ...})
+    instead of plain Python values.
+    """
+    if raw:
+        scan = get_dynamodb_client().scan
+        scan_kwargs['TableName'] = table_name
+    else:
+        scan = get_dynamodb_resource().Table(table_name).scan
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = scan(**kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        yield response.get('Items', []), last_key
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def scan_segment_pages(
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    raw: bool = False,
+    **scan_kwargs
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the pages of one scan segment"""
+    for items, _ in scan_segment(table_name, segment, total_segments, raw=raw, **scan_kwargs):
+        yield items
+
+
+def parallel_scan(
+    table_name: str,
+    segments: int = 4,
+    max_queued_pages: int = 8,
+    page_size: Optional[int] = None,
+    **scan_kwargs
+) -> Iterator[Dict[str, Any]]:
+    """Yield every item of a table (in no particular order) from a parallel scan
+
+    scan_kwargs are passed to Table.scan (FilterExpression, ProjectionExpression,
+    ExpressionAttributeNames, ...). At most max_queued_pages pages are buffered.
+    Closing the generator early stops the workers after their current page.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=max_queued_pages)
+    stop = threading.Event()
+    if page_size:
+        scan_kwargs['Limit'] = page_size
+
+    def put(value) -> bool:
+        # Block while the queue is full, but give up once the consumer left
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment: int):
+        try:
+            for items in scan_segment_pages(table_name, segment, segments, **scan_kwargs):
+                if stop.is_set() or (items and not put(items)):
+                    return
+        except Exception as e:
+            put(_SegmentError(e))
+        finally:
+            put(_DONE)
+
+    # Each worker runs in a copy of the caller's context so its DynamoDB calls
+    # are still accounted to the request that started the scan
+    threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(scan_segment, segment),
+            name=f"scan-{table_name}-{segment}", daemon=True
+        )
+        for segment in range(segments)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        running = segments
+        while running:
+            page = pages.get()
+            if page is _DONE:
+                running -= 1
+            elif isinstance(page, _SegmentError):
+                raise page.error
+            else:
+                yield from page
+    finally:
+        stop.set()
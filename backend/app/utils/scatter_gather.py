@@ -0,0 +1,67 @@
+"""
+Scatter-gather queries over write-sharded index keys.
+
+A key written under several shards ("<key>", "<key>#1", ... see
+app.repositories.order_repository) is read with one query per shard. The
+first page of every shard is fetched in parallel. The results are merged
+into one stream ordered by the index range key, as a single query would
+return them, and later pages are fetched only when the merge reaches them.
+A caller that needs the newest 20 items therefore reads about 20 items per
+shard rather than everything.
+"""
+from app.core.config import settings
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import contextvars
+import heapq
+import threading
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PARTICIPANT_QUERY_WORKERS, thread_name_prefix="scatter"
+                )
+    return _executor
+
+
+def _items(query: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any], first: Future) -> Iterator[Dict[str, Any]]:
+    """Items of one query, page by page"""
+    response = first.result()
+    while True:
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs = dict(kwargs, ExclusiveStartKey=response['LastEvaluatedKey'])
+        response = query(**kwargs)
+
+
+def scatter_query(
+    query: Callable[..., Dict[str, Any]],
+    requests: List[Dict[str, Any]],
+    sort_key: str,
+    descending: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Merge the items of several queries, each sorted by sort_key, into one sorted stream
+
+    query runs one page of a Query (e.g. Table.query); requests are its
+    kwargs per shard and must all have the same ScanIndexForward direction
+    (descending=True for ScanIndexForward=False).
+    """
+    if len(requests) == 1:
+        first: Future = Future()
+        first.set_result(query(**requests[0]))
+        return _items(query, requests[0], first)
+
+    # Workers run in a copy of the caller's context, so the calls still count
+    # towards (and stop at the deadline of) the request that made them
+    executor = _get_executor()
+    firsts = [executor.submit(contextvars.copy_context().run, query, **kwargs) for kwargs in requests]
+    streams = [_items(query, kwargs, first) for kwargs, first in zip(requests, firsts)]
+    return heapq.merge(*streams, key=lambda item: item[sort_key], reverse=descending)
@@ -0,0 +1,39 @@
+"""
+Text normalization and tokenizing for the search indexes.
+
+Text is case-folded and stripped of accents ("Schäden" -> "schaden"), split
+into word tokens and reduced by a light suffix stemmer, so "damaged",
+"damages" and "damage" end up as the same term. Queries go through the same
+steps as the indexed text.
+"""
+from typing import List
+import re
+import unicodedata
+
+_WORD = re.compile(r"\w+")
+
+# Longest first; a suffix is only removed if at least MIN_STEM characters remain
+_SUFFIXES = ('ungen', 'ing', 'ung', 'ed', 'es', 'en', 'er', 'e', 's')
+MIN_STEM = 3
+
+
+def normalize(text: str) -> str:
+    """Case-fold and strip accents"""
+    if text.isascii():
+        return text.casefold()
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    if token.isdigit():
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Search terms of a text, in order (with repetitions)"""
+    return [stem(token) for token in _WORD.findall(normalize(text)) if len(token) > 1 or token.isdigit()]
@@ -0,0 +1,111 @@
+"""
+TransactWriteItems helpers.
+
+Write actions are built from plain (Decimal-based) values and serialized
+here. A failed condition is reported as TransactionConflict, which carries
+the per-action cancellation reasons. Change events passed along are written
+to the outbox in the same transaction and published in-process after it
+committed.
+"""
+from app.core import events as change_events
+from app.core.database import get_dynamodb_client
+from app.utils.batch_writer import serialize_item
+from botocore.exceptions import ClientError
+from typing import Any, Dict, List, Optional
+
+MAX_TRANSACT_ITEMS = 100
+
+
+class TransactionConflict(Exception):
+    """A condition in the transaction failed (or it collided with another transaction)"""
+
+    def __init__(self, message: str, reasons: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.reasons = reasons or []
+
+
+class VersionConflictError(Exception):
+    """The item changed (or disappeared) since it was read"""
+
+
+def version_condition(expected_version: Optional[int], key_attribute: str):
+    """Condition, names and values requiring the stored item to still have expected_version"""
+    if expected_version is None:
+        return None, None, None
+    names = {'#version': 'version', '#key': key_attribute}
+    values = {':version': expected_version}
+    if expected_version == 1:
+        # Items written before versioning count as version 1
+        return 'attribute_exists(#key) AND (#version = :version OR attribute_not_exists(#version))', names, values
+    return 'attribute_exists(#key) AND #version = :version', names, values
+
+
+def put(
+    table_name: str,
+    item: Dict[str, Any],
+    condition: Optional[str] = None,
+    names: Optional[Dict[str, str]] = None,
+    values: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    action = {'TableName': table_name, 'Item': serialize_item(item)}
+    return {'Put': _with_condition(action, condition, names, values)}
+
+
+def update(
+    table_name: str,
+    key: Dict[str, Any],
+    expression: str,
+    names: Optional[Dict[str, str]] = None,
+    values: Optional[Dict[str, Any]] = None,
+    condition: Optional[str] = None
+) -> Dict[str, Any]:
+    action = {'TableName': table_name, 'Key': serialize_item(key), 'UpdateExpression': expression}
+    return {'Update': _with_condition(action, condition, names, values)}
+
+
+def delete(
+    table_name: str,
+    key: Dict[str, Any],
+    condition: Optional[str] = None,
+    names: Optional[Dict[str, str]] = None,
+    values: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    action = {'TableName': table_name, 'Key': serialize_item(key)}
+    return {'Delete': _with_condition(action, condition, names, values)}
+
+
+def _with_condition(action, condition, names, values):
+    if condition:
+        action['ConditionExpression'] = condition
+    if names:
+        action['ExpressionAttributeNames'] = names
+    if values:
+        action['ExpressionAttributeValues'] = serialize_item(values)
+    return action
+
+
+def transact_write(
+    actions: List[Dict[str, Any]],
+    client=None,
+    events: Optional[List[change_events.ChangeEvent]] = None
+):
+    """Apply all actions (and outbox puts for events) atomically
+
+    Raises TransactionConflict when a condition fails.
+    """
+    events = events or []
+    actions = actions + [put(change_events.OUTBOX_TABLE, change_events.to_outbox_item(e)) for e in events]
+    if len(actions) > MAX_TRANSACT_ITEMS:
+        raise ValueError(f"A transaction holds at most {MAX_TRANSACT_ITEMS} actions")
+    client = client or get_dynamodb_client()
+    try:
+        client.transact_write_items(TransactItems=actions)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('TransactionCanceledException', 'TransactionConflictException'):
+            raise TransactionConflict(
+                e.response['Error'].get('Message', code),
+                e.response.get('CancellationReasons')
+            ) from e
+        raise
+    change_events.publish(events)
@@ -0,0 +1 @@
+# Benchmark suite and load generator for the Kaution API
@@ -0,0 +1,101 @@
+"""
+Order search benchmark.
+
+Fills the trigram index with synthetic orders (no DynamoDB involved) and
+times GET /api/orders/search's lookup for agents with small and large
+portfolios, renters, and a mix of short, long, rare and common query words.
+Prints a JSON report.
+
+    python -m benchmarks.order_search --orders 1000000 --repeat 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STREETS = [
+    "Main Street", "Hauptstraße", "Bahnhofstraße", "Gartenweg", "Schillerplatz", "Lindenallee",
+    "Goethestraße", "Am Markt", "Kirchgasse", "Parkstraße", "Rosenweg", "Berliner Ring",
+]
+CITIES = ["Berlin", "Hamburg", "München", "Köln", "Frankfurt", "Stuttgart", "Leipzig", "Dresden"]
+TITLES = ["Flat", "Apartment", "Studio", "Loft", "House", "Room", "Penthouse", "Maisonette"]
+
+
+def fill(index, orders: int, agents: int, renters: int, seed: int):
+    """Append synthetic orders; a few heavy agents own a large share of them"""
+    rng = random.Random(seed)
+    for i in range(orders):
+        street, city = rng.choice(STREETS), rng.choice(CITIES)
+        number = f"{rng.randint(1, 200)}{rng.choice(['', '', 'A', 'B'])}"
+        index._append({
+            'id': f"order-{i}",
+            'title': f"{rng.choice(TITLES)} {city} {i}",
+            'property_address': f"{street} {number}, {city}",
+            'renter_email': f"renter{rng.randrange(renters)}@example.com",
+            'landlord_email': f"landlord{rng.randrange(renters // 4 or 1)}@example.com",
+            'created_by': f"agent{int(agents * rng.random() ** 2)}@example.com",
+            'status': 'pending',
+            'created_at': f"{2023 + i % 3}-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00",
+        })
+    index.loaded_at = time.time()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Order search benchmark")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=2_000)
+    parser.add_argument("--renters", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+    from app.models.enums import UserRole
+    from app.services.order_search_service import OrderSearchIndex
+
+    index = OrderSearchIndex()
+    started = time.perf_counter()
+    fill(index, args.orders, args.agents, args.renters, args.seed)
+    results = {
+        "orders": args.orders,
+        "keys": len(index.keys),
+        "fill_s": round(time.perf_counter() - started, 3),
+        "queries": {},
+    }
+
+    heavy_agent = ("agent0@example.com", UserRole.AGENT)
+    light_agent = (f"agent{args.agents - 1}@example.com", UserRole.AGENT)
+    renter = ("renter7@example.com", UserRole.RENTER)
+    cases = [
+        ("heavy_agent_common_word", heavy_agent, "Berlin"),
+        ("heavy_agent_address", heavy_agent, "Main Street 2A"),
+        ("heavy_agent_prefix", heavy_agent, "ha"),
+        ("heavy_agent_rare", heavy_agent, "Penthouse Leipzig 99"),
+        ("light_agent_address", light_agent, "Gartenweg"),
+        ("renter_landlord_prefix", renter, "landlord"),
+    ]
+    for name, (email, role), query in cases:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            total, page, _ = index.search(query, email, role, limit=20)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        results["queries"][name] = {
+            "query": query,
+            "candidates": total,
+            "returned": len(page),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+            "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 3),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
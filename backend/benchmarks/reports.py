@@ -0,0 +1,93 @@
+"""
+Deposit report benchmark.
+
+Fills the columnar report projection with a synthetic set of orders (no
+DynamoDB involved) and times GET /api/reports/deposits' computation for
+every grouping. Prints a JSON report.
+
+    python -m benchmarks.reports --orders 1000000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fill(store, orders: int, landlords: int, agents: int, seed: int):
+    """Write synthetic rows straight into the store's columns"""
+    import numpy as np
+    from app.services.report_service import STAGES, STATUSES
+
+    rng = np.random.default_rng(seed)
+    store._allocate(orders)
+    store.cents[:] = rng.integers(10, 100, orders) * 5000
+    store.status[:] = rng.integers(0, len(STATUSES), orders)
+    # Zipf-like skew: a few landlords and agents own most orders
+    store.landlord[:] = np.minimum(rng.zipf(1.3, orders) - 1, landlords - 1)
+    store.agent[:] = np.minimum(rng.zipf(1.5, orders) - 1, agents - 1)
+    store.day[:] = 738886 + rng.integers(0, 730, orders)  # 2024-01-01 + up to two years
+    store.month[:] = 2024 * 12 + (store.day - 738886) // 31
+    completed_stages = rng.integers(1, len(STAGES) + 1, orders)
+    store.stages[:] = (1 << completed_stages) - 1
+    store.alive[:] = True
+    store.size = orders
+    store.rows = {}
+    for i in range(landlords):
+        store.landlords.code(f"landlord{i}@example.com")
+    for i in range(agents):
+        store.agents.code(f"agent{i}@example.com")
+    store._indexes = {}
+    store.loaded_at = time.time()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deposit report benchmark")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--landlords", type=int, default=20_000)
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+    from app.services.report_service import GROUP_BY, DepositColumnStore
+
+    store = DepositColumnStore()
+    started = time.perf_counter()
+    fill(store, args.orders, args.landlords, args.agents, args.seed)
+    results = {"orders": args.orders, "fill_s": round(time.perf_counter() - started, 3), "reports": {}}
+
+    # The first report per grouping builds its sorted index; report that separately
+    for group_by in GROUP_BY:
+        started = time.perf_counter()
+        store.report(group_by)
+        results.setdefault("index_build_ms", {})[group_by] = round((time.perf_counter() - started) * 1000, 2)
+
+    cases = [(group_by, {}) for group_by in GROUP_BY]
+    cases.append(("status", {"created_from": "2024-06-01", "created_to": "2024-12-31"}))
+    for group_by, filters in cases:
+        timings = []
+        for _ in range(args.repeat):
+            # A trickle of writes between reports, so the incremental index patch is included
+            for row in range(0, args.orders, max(1, args.orders // 100)):
+                store._mark_dirty(row)
+            started = time.perf_counter()
+            report = store.report(group_by, **filters)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        name = group_by + ("_filtered" if filters else "")
+        results["reports"][name] = {
+            "groups": len(report["groups"]),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+            "max_ms": round(timings[-1] * 1000, 2),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Benchmark runner / load generator.
+
+Seeds a synthetic dataset, drives the real API endpoints with a pool of
+concurrent workers and reports throughput, latency percentiles and DynamoDB
+calls per request as JSON. With --baseline the run fails (exit code 1) when a
+tracked metric regressed by more than its threshold.
+
+Examples (from the backend/ directory):
+
+    # In-process app against an in-memory DynamoDB stand-in (moto)
+    python -m benchmarks.run --scale small --output results.json
+
+    # In-process app against DynamoDB Local
+    python -m benchmarks.run --storage dynamodb-local --endpoint-url http://localhost:8000
+
+    # Compare with a stored baseline
+    python -m benchmarks.run --baseline baseline.json --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_THRESHOLDS = os.path.join(BENCHMARK_DIR, "thresholds.json")
+
+# Metrics where a higher value is an improvement; everything else is "lower is better"
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+# (method, route) each scenario hits, for reading DynamoDB calls out of /metrics
+SCENARIO_ROUTES = {
+    "order_list_poll": ("GET", "/api/orders"),
+    "order_create": ("POST", "/api/orders"),
+    "message_post": ("POST", "/api/chat/rooms/{order_id}/messages"),
+    "chat_room_list": ("GET", "/api/chat/rooms"),
+    "stage_transition": ("PUT", "/api/orders/{order_id}"),
+}
+
+_METRIC_LINE = re.compile(
+    r'^kaution_http_request_dynamodb_calls_(sum|count)\{method="([^"]*)",route="([^"]*)"\} (\S+)$'
+)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def scrape_dynamodb_calls(client) -> Dict[tuple, tuple]:
+    """(method, route) -> (sum, count) of DynamoDB calls per request"""
+    response = client.get("/metrics")
+    result = {}
+    if response.status_code != 200:
+        return result
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            total, count = result.get((method, route), (0.0, 0.0))
+            if kind == "sum":
+                total = float(value)
+            else:
+                count = float(value)
+            result[(method, route)] = (total, count)
+    return result
+
+
+def run_scenario(client, dataset, name: str, scenario, requests: int, concurrency: int, seed: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(index: int):
+        rng = random.Random(f"{seed}:{name}:{index}")
+        timings, failures = [], 0
+        for _ in range(per_worker[index]):
+            started = time.perf_counter()
+            response = scenario(client, dataset, rng)
+            timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                failures += 1
+        return timings, failures
+
+    before = scrape_dynamodb_calls(client)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for timings, failures in pool.map(worker, range(concurrency)):
+            latencies.extend(timings)
+            errors += failures
+    wall = time.perf_counter() - started
+    after = scrape_dynamodb_calls(client)
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+        },
+    }
+    key = SCENARIO_ROUTES.get(name)
+    if key in after:
+        calls = after[key][0] - before.get(key, (0.0, 0.0))[0]
+        count = after[key][1] - before.get(key, (0.0, 0.0))[1]
+        if count:
+            result["dynamodb_calls_per_request"] = round(calls / count, 2)
+    return result
+
+
+def tracked_metrics(result: dict) -> Dict[str, float]:
+    metrics = {
+        "throughput_rps": result["throughput_rps"],
+        "latency_p50_ms": result["latency_ms"]["p50"],
+        "latency_p95_ms": result["latency_ms"]["p95"],
+        "latency_p99_ms": result["latency_ms"]["p99"],
+        "error_rate": result["errors"] / result["requests"] if result["requests"] else 0.0,
+    }
+    if "dynamodb_calls_per_request" in result:
+        metrics["dynamodb_calls_per_request"] = result["dynamodb_calls_per_request"]
+    return metrics
+
+
+def compare(results: dict, baseline: dict, thresholds: dict) -> List[str]:
+    """Return one message per tracked metric that regressed beyond its threshold"""
+    regressions = []
+    defaults = thresholds.get("default", {})
+    for name, result in results["scenarios"].items():
+        if name not in baseline.get("scenarios", {}):
+            continue
+        limits = {**defaults, **thresholds.get("scenarios", {}).get(name, {})}
+        current = tracked_metrics(result)
+        previous = tracked_metrics(baseline["scenarios"][name])
+        for metric, allowed in limits.items():
+            if metric not in current or metric not in previous:
+                continue
+            old, new = previous[metric], current[metric]
+            if metric in HIGHER_IS_BETTER:
+                worse = old > 0 and (old - new) / old > allowed
+            elif old == 0:
+                worse = new > allowed
+            else:
+                worse = (new - old) / old > allowed
+            if worse:
+                regressions.append(
+                    f"{name}.{metric}: {old:g} -> {new:g} (allowed regression {allowed:.0%})"
+                )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Kaution API benchmark suite")
+    parser.add_argument("--storage", choices=["moto", "dynamodb-local"], default="moto",
+                        help="In-process DynamoDB stand-in (moto) or a DynamoDB Local endpoint")
+    parser.add_argument("--endpoint-url", default="http://localhost:8000",
+                        help="DynamoDB Local endpoint for --storage dynamodb-local")
+    parser.add_argument("--base-url", default=None,
+                        help="Drive an already running API over HTTP instead of the in-process app")
+    parser.add_argument("--scale", default="small", help="Dataset preset: tiny, small, medium")
+    parser.add_argument("--orders", type=int, help="Override the number of seeded orders")
+    parser.add_argument("--messages-per-room", type=int, help="Override chat history length")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse an already seeded dataset")
+    parser.add_argument("--scenarios", default=",".join(SCENARIO_ROUTES),
+                        help="Comma-separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent workers")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for data and request mix")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Fail when results regress against this report")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS,
+                        help="Allowed relative regression per tracked metric")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    # Settings are read at import time, so configure storage before importing the app
+    if args.storage == "moto":
+        os.environ["DYNAMODB_ENDPOINT_URL"] = ""
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        from moto import mock_aws
+        mock = mock_aws()
+        mock.start()
+    else:
+        os.environ["DYNAMODB_ENDPOINT_URL"] = args.endpoint_url
+    # The load generator is one peer sending far more than one client's budget;
+    # measure the endpoints, not the rate limiter and admission control
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+    from app.core.database import init_tables
+    from benchmarks.scenarios import SCENARIOS, login
+    from benchmarks.seed import SCALES, Scale, seed
+
+    init_tables()
+    scale = Scale(**vars(SCALES[args.scale]))
+    if args.orders is not None:
+        scale.orders = args.orders
+    if args.messages_per_room is not None:
+        scale.messages_per_room = args.messages_per_room
+
+    seed_started = time.perf_counter()
+    dataset = seed(scale, args.seed, write=not args.skip_seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    if args.base_url:
+        import httpx
+        client = httpx.Client(base_url=args.base_url, timeout=60)
+    else:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app).__enter__()
+    login(client, dataset)
+
+    results = {
+        "meta": {
+            "storage": args.storage if not args.base_url else f"http:{args.base_url}",
+            "scale": {**vars(scale), "preset": args.scale},
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "seed_duration_s": round(seed_seconds, 3),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in [n.strip() for n in args.scenarios.split(",") if n.strip()]:
+            if name not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario: {name}")
+            results["scenarios"][name] = run_scenario(
+                client, dataset, name, SCENARIOS[name], args.requests, args.concurrency, args.seed
+            )
+    finally:
+        if hasattr(client, "__exit__"):
+            client.__exit__(None, None, None)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        regressions = compare(results, baseline, thresholds)
+        if regressions:
+            print("Benchmark regressions:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            return 1
+        print("No benchmark regressions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark scenarios: one function per hot path, each issuing a single request.
+
+Every scenario receives the HTTP client, the seeded dataset and a random
+generator owned by the calling worker, and returns the response so the runner
+can check the status code. Requests act as a synthetic user with the bearer
+token login() got for it.
+"""
+from typing import Callable, Dict
+import threading
+
+from app.models.enums import ProgressStageType
+from app.services.order_service import OrderService
+
+STAGE_ORDER = [
+    ProgressStageType.ORDER_CREATED,
+    ProgressStageType.RENTER_REVIEW,
+    ProgressStageType.LANDLORD_REVIEW,
+    ProgressStageType.DEPOSIT_HELD,
+    ProgressStageType.COMPLETED,
+]
+
+_stage_lock = threading.Lock()
+_completed_stages: Dict[str, int] = {}
+
+
+def login(client, dataset):
+    """Log every synthetic user in and keep their access tokens in dataset.tokens"""
+    for email in dataset.agents + dataset.renters + dataset.landlords:
+        response = client.post("/api/auth/login", json={"email": email})
+        response.raise_for_status()
+        dataset.tokens[email] = response.json()["access_token"]
+
+
+def _as(dataset, email: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {dataset.tokens[email]}"}
+
+
+def order_list_poll(client, dataset, rng):
+    """Dashboard polling GET /api/orders for a random participant"""
+    users = rng.choice((dataset.agents, dataset.renters, dataset.landlords))
+    return client.get("/api/orders", headers=_as(dataset, rng.choice(users)))
+
+
+def order_create(client, dataset, rng):
+    return client.post(
+        "/api/orders",
+        headers=_as(dataset, rng.choice(dataset.agents)),
+        json={
+            "title": "Benchmark order",
+            "renter_email": rng.choice(dataset.renters),
+            "landlord_email": rng.choice(dataset.landlords),
+            "property_address": f"{rng.randint(1, 300)} Bench Street, Berlin",
+            "deposit_amount": float(rng.randrange(500, 5000, 50)),
+            "description": "Created by the benchmark suite",
+        }
+    )
+
+
+def message_post(client, dataset, rng):
+    order_id = rng.choice(list(dataset.orders))
+    agent, renter, landlord = dataset.orders[order_id]
+    return client.post(
+        f"/api/chat/rooms/{order_id}/messages",
+        headers=_as(dataset, rng.choice((agent, renter, landlord))),
+        json={"text": "Benchmark message about the move-out inspection"}
+    )
+
+
+def chat_room_list(client, dataset, rng):
+    return client.get("/api/chat/rooms", headers=_as(dataset, rng.choice(dataset.renters + dataset.landlords)))
+
+
+def stage_transition(client, dataset, rng):
+    """The order's agent completes the next progress stage of a random order (wrapping around)"""
+    order_id = rng.choice(list(dataset.orders))
+    agent = dataset.orders[order_id][0]
+    with _stage_lock:
+        completed = _completed_stages.get(order_id, 1) % len(STAGE_ORDER) + 1
+        _completed_stages[order_id] = completed
+    stages = OrderService.create_default_progress_stages()
+    payload = []
+    for index, stage in enumerate(stages):
+        done = index < completed
+        payload.append({
+            "stage": stage.stage.value,
+            "title": stage.title,
+            "completed": done,
+            "date": stage.date or ("2024-06-01T12:00:00" if done else None),
+            "completed_by": None,
+        })
+    status = "completed" if completed == len(STAGE_ORDER) else "in_progress"
+    return client.put(
+        f"/api/orders/{order_id}",
+        headers=_as(dataset, agent),
+        json={"progress_stages": payload, "status": status}
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "order_list_poll": order_list_poll,
+    "order_create": order_create,
+    "message_post": message_post,
+    "chat_room_list": chat_room_list,
+    "stage_transition": stage_transition,
+}
@@ -0,0 +1,135 @@
+"""
+Synthetic dataset for the benchmarks.
+
+Generates users, orders and chat histories deterministically from a seed and
+writes them with batched puts. The returned Dataset tells the scenarios which
+users, orders and participants exist.
+"""
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+import random
+
+from app.core.database import get_dynamodb_resource
+from app.models.domain import User, Order, ChatRoom, ChatParticipant, ChatMessage
+from app.models.enums import UserRole, OrderStatus
+from app.repositories.order_repository import OrderRepository
+from app.services.order_service import OrderService
+from app.utils.dynamodb import to_dynamodb_dict, format_datetime
+
+
+@dataclass
+class Scale:
+    agents: int = 5
+    renters: int = 50
+    landlords: int = 20
+    orders: int = 200
+    messages_per_room: int = 20
+
+
+SCALES = {
+    "tiny": Scale(agents=2, renters=10, landlords=5, orders=20, messages_per_room=5),
+    "small": Scale(),
+    "medium": Scale(agents=20, renters=500, landlords=200, orders=5000, messages_per_room=40),
+}
+
+
+@dataclass
+class Dataset:
+    agents: List[str] = field(default_factory=list)
+    renters: List[str] = field(default_factory=list)
+    landlords: List[str] = field(default_factory=list)
+    # order id -> (agent, renter, landlord)
+    orders: Dict[str, tuple] = field(default_factory=dict)
+    # email -> access token, filled by benchmarks.scenarios.login()
+    tokens: Dict[str, str] = field(default_factory=dict)
+
+
+def _email(role: UserRole, index: int) -> str:
+    return f"bench.{role.value}{index}@example.com"
+
+
+class _NullWriter:
+    def put_item(self, Item):
+        pass
+
+
+def _writer(resource, table_name: str):
+    if resource is None:
+        return nullcontext(_NullWriter())
+    return resource.Table(table_name).batch_writer()
+
+
+def seed(scale: Scale, seed_value: int = 42, write: bool = True) -> Dataset:
+    """Describe a synthetic dataset and (unless write=False) store it
+
+    Generation is deterministic, so write=False reproduces the description of
+    a dataset seeded earlier with the same scale and seed.
+    """
+    rng = random.Random(seed_value)
+    base_time = datetime(2024, 1, 1)
+    dataset = Dataset()
+    resource = get_dynamodb_resource() if write else None
+
+    with _writer(resource, 'users') as users:
+        for role, count, target in (
+            (UserRole.AGENT, scale.agents, dataset.agents),
+            (UserRole.RENTER, scale.renters, dataset.renters),
+            (UserRole.LANDLORD, scale.landlords, dataset.landlords),
+        ):
+            for i in range(count):
+                email = _email(role, i)
+                now = format_datetime(base_time)
+                users.put_item(Item=to_dynamodb_dict(User(
+                    email=email, role=role, name=f"Bench {role.value.title()} {i}",
+                    created_at=now, updated_at=now
+                )))
+                target.append(email)
+
+    with _writer(resource, 'orders') as orders, _writer(resource, 'chat_rooms') as rooms:
+        for i in range(scale.orders):
+            order_id = f"B{i:07d}"
+            agent = rng.choice(dataset.agents)
+            renter = rng.choice(dataset.renters)
+            landlord = rng.choice(dataset.landlords)
+            created = format_datetime(base_time + timedelta(minutes=i))
+            participants = [
+                ChatParticipant(email=agent, role=UserRole.AGENT, name=agent.split('@')[0]),
+                ChatParticipant(email=renter, role=UserRole.RENTER, name=renter.split('@')[0]),
+                ChatParticipant(email=landlord, role=UserRole.LANDLORD, name=landlord.split('@')[0]),
+            ]
+            messages = []
+            for m in range(scale.messages_per_room):
+                sender = participants[rng.randrange(3)]
+                messages.append(ChatMessage(
+                    sender_email=sender.email,
+                    sender_role=sender.role,
+                    sender_name=sender.name,
+                    text=f"Message {m} about the deposit for order {order_id}",
+                    timestamp=format_datetime(base_time + timedelta(minutes=i, seconds=m))
+                ))
+            chat_room = ChatRoom(
+                order_id=order_id, participants=participants, messages=messages,
+                created_at=created, updated_at=created
+            )
+            order = Order(
+                id=order_id,
+                title=f"Deposit for apartment {i}",
+                renter_email=renter,
+                landlord_email=landlord,
+                property_address=f"{rng.randint(1, 300)} Main Street, Apartment {i}, Berlin",
+                deposit_amount=float(rng.randrange(500, 5000, 50)),
+                description="Synthetic benchmark order",
+                created_by=agent,
+                status=OrderStatus.PENDING,
+                progress_stages=OrderService.create_default_progress_stages(),
+                chat_room=chat_room,
+                created_at=created,
+                updated_at=created
+            )
+            orders.put_item(Item=OrderRepository.to_item(order))
+            rooms.put_item(Item=to_dynamodb_dict(chat_room))
+            dataset.orders[order_id] = (agent, renter, landlord)
+
+    return dataset
@@ -0,0 +1,151 @@
+"""
+Stored item compression benchmark.
+
+Generates chat-heavy orders and chat rooms with the seed data generator (no
+DynamoDB involved), stores them the way to_dynamodb_dict does with and
+without compression, and reports item sizes, the capacity units a write and
+a GetItem of each item would consume, and the time spent compressing and
+decompressing. zlib without the preset dictionary is reported alongside to
+show what the dictionary adds. Prints a JSON report.
+
+    python -m benchmarks.storage_compression --orders 5000 --long-history-fraction 0.05
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import zlib
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def attribute_size(value: Any) -> int:
+    """Size DynamoDB bills for an attribute value"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (int, float, Decimal)):
+        digits = len(str(value).lstrip('-').replace('.', '').lstrip('0')) or 1
+        return min(21, 1 + (digits + 1) // 2)
+    if isinstance(value, dict):
+        return 3 + sum(len(key.encode()) + attribute_size(item) + 1 for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(attribute_size(item) + 1 for item in value)
+    raise TypeError(f"Unsupported attribute type {type(value)}")
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    return sum(len(name.encode()) + attribute_size(value) for name, value in item.items())
+
+
+def write_units(size: int) -> int:
+    return max(1, math.ceil(size / 1024))
+
+
+def read_units(size: int) -> float:
+    """Eventually consistent GetItem"""
+    return max(1, math.ceil(size / 4096)) / 2
+
+
+def _plain_zlib(item: Dict[str, Any], names, min_bytes: int) -> Dict[str, Any]:
+    stored = dict(item)
+    for name in names:
+        if stored.get(name) is not None:
+            encoded = json.dumps(stored[name], default=float, separators=(',', ':')).encode()
+            compressed = b'KZ\x00' + zlib.compress(encoded, 6)
+            if len(encoded) >= min_bytes and len(compressed) < len(encoded):
+                stored[name] = compressed
+    return stored
+
+
+def measure(items: List[Dict[str, Any]], names, min_bytes: int, compress_attributes, decompress_attributes) -> Dict[str, Any]:
+    plain = [item_size(item) for item in items]
+    started = time.perf_counter()
+    stored_items = [compress_attributes(dict(item), names) for item in items]
+    compress_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for item in stored_items:
+        decompress_attributes(item, names)
+    decompress_s = time.perf_counter() - started
+    stored = [item_size(item) for item in stored_items]
+    no_dictionary = [item_size(_plain_zlib(item, names, min_bytes)) for item in items]
+    count = len(items)
+
+    def totals(sizes: List[int]) -> Dict[str, Any]:
+        ordered = sorted(sizes)
+        return {
+            "bytes": sum(sizes),
+            "mean_bytes": round(sum(sizes) / count, 1),
+            "p99_bytes": ordered[int(count * 0.99)],
+            "max_bytes": ordered[-1],
+            "write_units": sum(write_units(size) for size in sizes),
+            "read_units": sum(read_units(size) for size in sizes),
+        }
+
+    plain_totals, stored_totals = totals(plain), totals(stored)
+    return {
+        "items": count,
+        "compressed_items": sum(1 for before, after in zip(plain, stored) if after < before),
+        "plain": plain_totals,
+        "compressed": stored_totals,
+        "zlib_without_dictionary": totals(no_dictionary),
+        "bytes_saved_pct": round(100 * (1 - stored_totals["bytes"] / plain_totals["bytes"]), 1),
+        "write_units_saved_pct": round(100 * (1 - stored_totals["write_units"] / plain_totals["write_units"]), 1),
+        "read_units_saved_pct": round(100 * (1 - stored_totals["read_units"] / plain_totals["read_units"]), 1),
+        "compress_us_per_item": round(compress_s / count * 1e6, 1),
+        "decompress_us_per_item": round(decompress_s / count * 1e6, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stored item compression benchmark")
+    parser.add_argument("--orders", type=int, default=5_000)
+    parser.add_argument("--messages-per-room", type=int, default=12)
+    parser.add_argument("--long-history-fraction", type=float, default=0.05)
+    parser.add_argument("--long-history-messages", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+    from app.core.config import settings
+    from app.models.domain import ChatRoom, Order
+    from app.scripts.seed_data import SeedConfig, _Generator
+    from app.utils.dynamodb import compress_attributes, decompress_attributes
+
+    config = SeedConfig(
+        seed=args.seed,
+        orders=args.orders,
+        chunk_size=args.orders,
+        messages_per_room=args.messages_per_room,
+        long_history_fraction=args.long_history_fraction,
+        long_history_messages=args.long_history_messages,
+    )
+    # Orders embed the chat room as created (without messages), like OrderService writes them
+    orders, rooms = _Generator(config).orders(0)
+    min_bytes = settings.STORAGE_COMPRESSION_MIN_BYTES
+
+    def run(items, model):
+        return measure(items, model.compressed_attributes, min_bytes, compress_attributes, decompress_attributes)
+
+    results = {
+        "orders": len(orders),
+        "min_bytes": min_bytes,
+        "chat_rooms": run(rooms, ChatRoom),
+        "orders_table": run(orders, Order),
+    }
+    long_rooms = [room for room in rooms if len(room['messages']) >= args.long_history_messages]
+    if long_rooms:
+        results["long_history_chat_rooms"] = run(long_rooms, ChatRoom)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
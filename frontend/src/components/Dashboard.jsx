@@ -3,20 +3,29 @@ import AgentDashboard from './dashboards/AgentDashboard';
 import CreateOrderModal from './modals/CreateOrderModal';
 import OrderDetailModal from './modals/OrderDetailModal';
 import FloatingChatWidget from './FloatingChatWidget';
+import { getOrder } from '../services/orderService';
 
 const Dashboard = ({ currentUser, orders, allOrders, onCreateOrder, onUpdateOrder, onApproveOrder, onAddChatMessage, onDeleteOrder, onShowNotification, onLogout, enableChatPolling }) => {
     const [showCreateModal, setShowCreateModal] = useState(false);
     const [selectedOrder, setSelectedOrder] = useState(null);
     const [chatOrderId, setChatOrderId] = useState(null);
 
-    const handleOrderClick = (orderId) => {
+    const handleOrderClick = async (orderId) => {
         const order = allOrders.find(o => o.id === orderId);
         setSelectedOrder(order);
+        if (order?.archived) {
+            // Lists only carry a stub; the full order comes from the archive
+            try {
+                setSelectedOrder(await getOrder(orderId));
+            } catch (error) {
+                console.error('Error loading archived order:', error);
+            }
+        }
     };
 
-    // Sync selected order when allOrders changes
+    // Sync selected order when allOrders changes (archived orders do not change)
     useEffect(() => {
-        if (selectedOrder) {
+        if (selectedOrder && !selectedOrder.archived) {
             const updatedOrder = allOrders.find(o => o.id === selectedOrder.id);
             if (updatedOrder) {
                 setSelectedOrder(updatedOrder);
@@ -1,5 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import ChatRoom from './ChatRoom';
+import { markChatRead } from '../services/chatService';
 
 const FloatingChatWidget = ({ orders, currentUser, onSendMessage, chatOrderId, onChatOrderSelected, onChatOpenChange }) => {
     const [isMinimized, setIsMinimized] = useState(true);
@@ -71,11 +72,18 @@ const FloatingChatWidget = ({ orders, currentUser, onSendMessage, chatOrderId, o
         }
     }, [chatOrderId, ordersWithChat, onChatOrderSelected]);
 
-    // Count unread messages (for future implementation)
-    const getUnreadCount = (order) => {
-        // For now, return 0. Can be enhanced later with read/unread tracking
-        return 0;
-    };
+    // Unread messages are counted by the backend per participant
+    const getUnreadCount = (order) => order.unreadMessages || 0;
+
+    // Opening a chat marks its messages read
+    const selectedUnread = selectedOrder ? getUnreadCount(selectedOrder) : 0;
+    useEffect(() => {
+        if (!isMinimized && !showOrderList && selectedOrder && selectedUnread > 0 && currentUser?.email) {
+            markChatRead(selectedOrder.id, currentUser.email).catch(() => {});
+        }
+    }, [isMinimized, showOrderList, selectedOrder?.id, selectedUnread, currentUser?.email]);
+
+    const totalUnread = ordersWithChat.reduce((sum, order) => sum + getUnreadCount(order), 0);
 
     const handleSendMessage = (text) => {
         if (selectedOrder && onSendMessage) {
@@ -116,8 +124,8 @@ const FloatingChatWidget = ({ orders, currentUser, onSendMessage, chatOrderId, o
                     <svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
                         <path d="M20 2H4C2.9 2 2 2.9 2 4V22L6 18H20C21.1 18 22 17.1 22 16V4C22 2.9 21.1 2 20 2Z" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"/>
                     </svg>
-                    {ordersWithChat.length > 0 && (
-                        <span className="chat-badge-count">{ordersWithChat.length}</span>
+                    {totalUnread > 0 && (
+                        <span className="chat-badge-count">{totalUnread}</span>
                     )}
                 </button>
             ) : (
@@ -177,9 +185,12 @@ const FloatingChatWidget = ({ orders, currentUser, onSendMessage, chatOrderId, o
                                         <div className="chat-order-select-info">
                                             <div className="chat-order-select-title">{order.title}</div>
                                             <div className="chat-order-select-meta">
-                                                {order.chatRoom?.messages?.length || 0} messages
+                                                {order.chatRoom?.messageCount ?? order.chatRoom?.messages?.length ?? 0} messages
                                             </div>
                                         </div>
+                                        {getUnreadCount(order) > 0 && (
+                                            <span className="chat-unread-badge">{getUnreadCount(order)}</span>
+                                        )}
                                         <svg width="20" height="20" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
                                             <path d="M9 18L15 12L9 6" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"/>
                                         </svg>
@@ -66,6 +66,9 @@ const OrderCard = ({ order, onClick, onOpenChat }) => {
                             <svg width="20" height="20" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
                                 <path d="M20 2H4C2.9 2 2 2.9 2 4V22L6 18H20C21.1 18 22 17.1 22 16V4C22 2.9 21.1 2 20 2Z" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"/>
                             </svg>
+                            {order.unreadMessages > 0 && (
+                                <span className="chat-unread-badge">{order.unreadMessages}</span>
+                            )}
                         </button>
                     )}
                     <span className={`status-badge ${getStatusClass(order.status)}`}>
@@ -16,6 +16,7 @@ export const API_ENDPOINTS = {
     CHAT_ROOMS: `${API_BASE_URL}/api/chat/rooms`,
     CHAT_MESSAGES: (orderId) => `${API_BASE_URL}/api/chat/rooms/${orderId}/messages`,
     CREATE_MESSAGE: (orderId) => `${API_BASE_URL}/api/chat/rooms/${orderId}/messages`,
+    CHAT_READ: (orderId) => `${API_BASE_URL}/api/chat/rooms/${orderId}/read`,
 };
 
 export default API_BASE_URL;
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { loadOrders, getOrdersForUser, createOrder as createOrderService, updateOrder as updateOrderService, getOrder, deleteOrder as deleteOrderService } from '../services/orderService';
 import { sendMessage } from '../services/chatService';
 
@@ -6,6 +6,8 @@ export const useOrders = (currentUser, enablePolling = false) => {
     const [orders, setOrders] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    // No polling before this time (ms) after the backend answered 503 with Retry-After
+    const pollPausedUntil = useRef(0);
 
     const loadUserOrders = useCallback(async (silent = false) => {
         if (!currentUser) return;
@@ -19,7 +21,13 @@ export const useOrders = (currentUser, enablePolling = false) => {
             setOrders(loadedOrders);
         } catch (err) {
             console.error('Error loading orders:', err);
-            setError(err.message);
+            if (err.retryAfter) {
+                pollPausedUntil.current = Date.now() + err.retryAfter * 1000;
+            }
+            // A failed background refresh keeps showing the orders we have
+            if (!silent) {
+                setError(err.message);
+            }
         } finally {
             if (!silent) {
                 setLoading(false);
@@ -41,6 +49,8 @@ export const useOrders = (currentUser, enablePolling = false) => {
         const POLL_INTERVAL = 3000; // Poll every 3 seconds
 
         const intervalId = setInterval(() => {
+            // Back off while the backend asks us to
+            if (Date.now() < pollPausedUntil.current) return;
             // Silently refresh orders without showing loading state
             loadUserOrders(true);
         }, POLL_INTERVAL);
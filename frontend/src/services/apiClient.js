@@ -18,6 +18,12 @@ class ApiClient {
             },
         };
         
+        // Signed-in requests carry the access token from login
+        const accessToken = sessionStorage.getItem('accessToken');
+        if (accessToken) {
+            config.headers['Authorization'] = `Bearer ${accessToken}`;
+        }
+        
         // Add body if it exists
         if (options.body) {
             config.body = options.body;
@@ -32,6 +38,13 @@ class ApiClient {
             const response = await fetch(url, config);
             
             if (!response.ok) {
+                // Expired or invalid token: drop the session so the user logs in again
+                if (response.status === 401 && accessToken) {
+                    sessionStorage.removeItem('accessToken');
+                    sessionStorage.removeItem('currentUser');
+                    window.location.reload();
+                }
+                
                 let errorData;
                 try {
                     errorData = await response.json();
@@ -40,12 +53,21 @@ class ApiClient {
                 }
                 
                 // Handle FastAPI validation errors
+                let message;
                 if (errorData.detail && Array.isArray(errorData.detail)) {
-                    const messages = errorData.detail.map(err => err.msg || err.message || JSON.stringify(err)).join(', ');
-                    throw new Error(messages);
+                    message = errorData.detail.map(err => err.msg || err.message || JSON.stringify(err)).join(', ');
+                } else {
+                    message = errorData.detail || errorData.message || `HTTP error! status: ${response.status}`;
                 }
                 
-                throw new Error(errorData.detail || errorData.message || `HTTP error! status: ${response.status}`);
+                const error = new Error(message);
+                error.status = response.status;
+                // 503 while storage is unavailable: seconds to wait before trying again
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+                if (!Number.isNaN(retryAfter)) {
+                    error.retryAfter = retryAfter;
+                }
+                throw error;
             }
 
             // Handle 204 No Content responses (common for DELETE)
@@ -89,7 +111,25 @@ class ApiClient {
         return this.request(url, { method: 'GET' });
     }
 
-    post(endpoint, data = {}, params = {}) {
+    // Retry network failures and overload; only safe for requests the server deduplicates
+    async requestWithRetry(endpoint, options, attempts = 3) {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await this.request(endpoint, options);
+            } catch (error) {
+                // No status: the request failed or timed out before a response arrived.
+                // 409: the first attempt with the same Idempotency-Key is still running.
+                const retryable = error.status === undefined || [409, 429, 502, 503, 504].includes(error.status);
+                if (!retryable || attempt >= attempts) {
+                    throw error;
+                }
+                const delay = error.retryAfter ? Math.min(error.retryAfter * 1000, 5000) : 250 * 2 ** (attempt - 1);
+                await new Promise(resolve => setTimeout(resolve, delay));
+            }
+        }
+    }
+
+    post(endpoint, data = {}, params = {}, { idempotent = false } = {}) {
         let finalEndpoint = endpoint;
         if (Object.keys(params).length > 0) {
             const queryString = new URLSearchParams(params).toString();
@@ -107,13 +147,19 @@ class ApiClient {
         // Stringify the data
         const body = JSON.stringify(requestData);
         
-        return this.request(finalEndpoint, {
+        const options = {
             method: 'POST',
             body: body,
             headers: {
                 'Content-Type': 'application/json',
             },
-        });
+        };
+        if (idempotent) {
+            // Every retry sends the same key, so the server creates the order or message only once
+            options.headers['Idempotency-Key'] = crypto.randomUUID();
+            return this.requestWithRetry(finalEndpoint, options);
+        }
+        return this.request(finalEndpoint, options);
     }
 
     put(endpoint, data = {}) {
@@ -100,6 +100,9 @@ export const login = async (email, role = null) => {
 
         // Store in sessionStorage for tab-specific sessions (allows multiple users in different tabs)
         sessionStorage.setItem('currentUser', JSON.stringify(currentUser));
+        if (response.access_token) {
+            sessionStorage.setItem('accessToken', response.access_token);
+        }
         
         return currentUser;
     } catch (error) {
@@ -163,16 +166,8 @@ export const register = async (email, name, role) => {
         }
         roleValue = String(roleValue || '').toLowerCase();
         
-        const currentUser = {
-            email: String(response.email || ''),
-            role: roleValue,
-            name: String(response.name || '')
-        };
-
-        // Store in sessionStorage for tab-specific sessions (allows multiple users in different tabs)
-        sessionStorage.setItem('currentUser', JSON.stringify(currentUser));
-        
-        return currentUser;
+        // Log the new user in to get an access token
+        return await login(String(response.email || registerData.email), roleValue);
     } catch (error) {
         console.error('Registration error:', error);
         // Provide more detailed error messages
@@ -188,4 +183,5 @@ export const register = async (email, name, role) => {
 
 export const logout = () => {
     sessionStorage.removeItem('currentUser');
+    sessionStorage.removeItem('accessToken');
 };
@@ -88,7 +88,8 @@ export const sendMessage = async (orderId, senderEmail, senderRole, senderName,
         const message = await apiClient.post(
             API_ENDPOINTS.CREATE_MESSAGE(orderId),
             { text },
-            queryParams
+            queryParams,
+            { idempotent: true }
         );
         
         return {
@@ -105,6 +106,21 @@ export const sendMessage = async (orderId, senderEmail, senderRole, senderName,
     }
 };
 
+// Mark all messages of a chat room read for the user; returns the remaining unread count
+export const markChatRead = async (orderId, userEmail) => {
+    if (!USE_BACKEND) {
+        return 0;
+    }
+
+    try {
+        const summary = await apiClient.post(API_ENDPOINTS.CHAT_READ(orderId), {}, { user_email: userEmail });
+        return summary.unread;
+    } catch (error) {
+        console.error('Error marking chat read:', error);
+        throw error;
+    }
+};
+
 export const addMessage = (chatRoom, senderEmail, senderRole, senderName, text) => {
     const message = {
         id: Date.now().toString(),
@@ -27,6 +27,7 @@ const transformOrder = (order) => ({
     chatRoom: order.chat_room ? {
         orderId: order.chat_room.order_id,
         participants: order.chat_room.participants || [],
+        messageCount: order.chat_room.message_count,
         messages: order.chat_room.messages?.map(msg => ({
             id: msg.timestamp || Date.now().toString(),
             senderEmail: msg.sender_email,
@@ -37,7 +38,10 @@ const transformOrder = (order) => ({
         })) || [],
         createdAt: new Date(order.chat_room.created_at),
         updatedAt: new Date(order.chat_room.updated_at)
-    } : null
+    } : null,
+    unreadMessages: order.unread_messages || 0,
+    // Archived orders come as stubs in lists; getOrder returns them in full
+    archived: Boolean(order.archived_at)
 });
 
 // Transform frontend order format to backend format
@@ -157,7 +161,8 @@ export const createOrder = async (orderData, createdBy) => {
         const order = await apiClient.post(
             API_ENDPOINTS.ORDERS,
             orderPayload,
-            { created_by: createdBy }
+            { created_by: createdBy },
+            { idempotent: true }
         );
         return transformOrder(order);
     } catch (error) {